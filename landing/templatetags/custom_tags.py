@@ -1,10 +1,45 @@
 from django import template
-from social.models import Notification
+from social.notifications import MENU_SIZE, unread_count, unread_notifications
+from social.reactions import reaction_summary
+from social.summaries import get_user_summaries, get_user_summary
 
 register = template.Library()
 
-@register.inclusion_tag('social/show_notifications.html', takes_context=True)
+@register.inclusion_tag('social/show_notification.html', takes_context=True)
 def show_notifications(context):
-	request_user = context['request'].user
-	notifications = Notification.objects.filter(to_user=request_user).exclude(user_has_seen=True).order_by('-date')
-	return {'notifications': notifications}
\ No newline at end of file
+	request = context['request']
+	# The badge comes from the cached counter; the list is only queried when there is something unread.
+	unread = unread_count(request.user.pk)
+	notifications = []
+	if unread:
+		notifications = unread_notifications(request.user.pk).select_related('from_user', 'comment').order_by('-date')[:MENU_SIZE]
+	return {'notifications': notifications, 'unread': unread, 'request': request}
+
+@register.simple_tag
+def user_summaries(objects, *fields):
+	# {% user_summaries post_list 'author_id' 'repost_of.author_id' as users %}
+	user_ids = set()
+	for obj in objects:
+		for field in fields:
+			value = obj
+			for attr in field.split('.'):
+				value = getattr(value, attr, None)
+			user_ids.add(value)
+	return get_user_summaries(user_ids)
+
+@register.simple_tag(takes_context=True)
+def reactions(context, objects, target='post'):
+	# {% reactions post_list as reactions %} or {% reactions comments 'comment' as reactions %};
+	# a repost is counted under its original post.
+	if hasattr(objects, 'pk'):
+		objects = [objects]
+	obj_ids = [getattr(obj, 'repost_of_id', None) or obj.pk for obj in objects]
+	return reaction_summary(target, obj_ids, context['request'].user)
+
+@register.simple_tag
+def user_summary(user_id):
+	return get_user_summary(user_id)
+
+@register.filter
+def lookup(mapping, key):
+	return mapping.get(key)
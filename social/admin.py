@@ -1,8 +1,160 @@
 from django.contrib import admin
-from .models import Post, UserProfile, Comment, Notification, ThreadModel
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 
-admin.site.register(Post)
-admin.site.register(UserProfile)
-admin.site.register(Comment)
-admin.site.register(Notification)
-admin.site.register(ThreadModel)
\ No newline at end of file
+from .models import Post, UserProfile, Comment, Notification, ThreadModel, MessageModel
+
+# Changelists on the big tables never run an exact COUNT(*) or an OFFSET:
+# counts come from the planner's estimate (PostgreSQL) or stop at COUNT_LIMIT,
+# and pages are walked newest-first with ?before=<pk>.
+COUNT_LIMIT = 10000
+CURSOR_VAR = 'before'
+
+
+def estimated_count(queryset, limit=COUNT_LIMIT):
+    # Exact up to `limit`; limit + 1 means "more than limit" unless the
+    # planner's estimate for a big table is returned instead.
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql' and not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+        if row and row[0] > limit:
+            return int(row[0])
+    return queryset.order_by()[:limit + 1].count()
+
+
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        return estimated_count(self.object_list, COUNT_LIMIT)
+
+
+class KeysetChangeList(ChangeList):
+    keyset = True
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Changing a filter or search starts again from the newest row.
+        return super().get_query_string(new_params, [CURSOR_VAR, *(remove or [])])
+
+    def get_ordering(self, request, queryset):
+        return ['-pk']
+
+    def get_results(self, request):
+        paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        queryset = self.queryset
+        cursor = self.params.get(CURSOR_VAR)
+        if cursor:
+            try:
+                queryset = queryset.filter(pk__lt=int(cursor))
+            except ValueError:
+                raise IncorrectLookupParameters
+
+        rows = list(queryset[:self.list_per_page + 1])
+        self.result_list = rows[:self.list_per_page]
+        self.next_url = None
+        if len(rows) > self.list_per_page:
+            self.next_url = self.get_query_string({CURSOR_VAR: self.result_list[-1].pk})
+        self.first_url = self.get_query_string() if cursor else None
+
+        self.result_count = paginator.count
+        self.count_capped = self.result_count == COUNT_LIMIT + 1
+        if self.count_capped:
+            self.result_count = COUNT_LIMIT
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.can_show_all = False
+        self.multi_page = bool(cursor or self.next_url)
+        self.paginator = paginator
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    # Sorting by arbitrary columns would need an index per column, so the
+    # list is always newest-first; filters are booleans or fixed choices.
+    ordering = ('-pk',)
+    sortable_by = ()
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+    list_per_page = 50
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+
+class NotificationTypeFilter(admin.SimpleListFilter):
+    title = 'type'
+    parameter_name = 'notification_type'
+
+    def lookups(self, request, model_admin):
+        return [(1, 'Like'), (2, 'Comment'), (3, 'Follow'), (4, 'Message')]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(notification_type=self.value())
+        return queryset
+
+
+@admin.register(Post)
+class PostAdmin(LargeTableAdmin):
+    list_display = ('pk', 'author', 'created_on', 'repost_of', 'repost_count', 'is_deleted')
+    list_select_related = ('author', 'repost_of')
+    list_filter = ('is_deleted',)
+    search_fields = ('=author__username',)
+    raw_id_fields = ('author', 'shared_user', 'repost_of', 'likes', 'dislikes', 'tags', 'image')
+
+
+@admin.register(Comment)
+class CommentAdmin(LargeTableAdmin):
+    list_display = ('pk', 'author', 'post', 'parent', 'created_on', 'is_deleted')
+    list_select_related = ('author', 'post', 'parent')
+    list_filter = ('is_deleted',)
+    search_fields = ('=author__username',)
+    raw_id_fields = ('author', 'post', 'parent', 'likes', 'dislikes', 'tags')
+
+
+@admin.register(Notification)
+class NotificationAdmin(LargeTableAdmin):
+    list_display = ('pk', 'notification_type', 'from_user', 'to_user', 'date', 'user_has_seen')
+    list_select_related = ('from_user', 'to_user')
+    list_filter = (NotificationTypeFilter, 'user_has_seen')
+    search_fields = ('=to_user__username',)
+    raw_id_fields = ('to_user', 'from_user', 'post', 'comment', 'thread')
+
+
+@admin.register(MessageModel)
+class MessageAdmin(LargeTableAdmin):
+    list_display = ('pk', 'thread', 'sender_user', 'receiver_user', 'date', 'is_read')
+    list_select_related = ('thread', 'sender_user', 'receiver_user')
+    list_filter = ('is_read',)
+    search_fields = ('=sender_user__username',)
+    raw_id_fields = ('thread', 'sender_user', 'receiver_user')
+
+
+@admin.register(UserProfile)
+class UserProfileAdmin(admin.ModelAdmin):
+    list_display = ('user', 'name', 'location', 'is_deleted')
+    list_select_related = ('user',)
+    list_filter = ('is_deleted',)
+    search_fields = ('=user__username',)
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+    raw_id_fields = ('user', 'followers')
+
+
+@admin.register(ThreadModel)
+class ThreadAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'user', 'receiver')
+    list_select_related = ('user', 'receiver')
+    search_fields = ('=user__username', '=receiver__username')
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+    raw_id_fields = ('user', 'receiver')
@@ -0,0 +1,177 @@
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import JsonResponse
+from django.views import View
+
+from .archive import get_messages
+from .forms import MessageForm
+from .models import Post, Comment, UserProfile, ThreadModel, MessageModel
+from .objectcache import get_objects
+from .follows import bulk_follow, bulk_unfollow, followed_ids, follower_count
+from .ratelimit import RateLimitMixin
+from .reactions import toggle_post_reaction, toggle_comment_reaction, reaction_summary
+from .tasks import create_notification
+from .serializers import POST_FIELDS, COMMENT_FIELDS, MESSAGE_FIELDS, serialize_posts, serialize_comment_tree, serialize_messages
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+MAX_NEW_POSTS = 100
+
+
+def _int_param(request, name, default=None):
+    try:
+        return int(request.GET[name])
+    except (KeyError, ValueError):
+        return default
+
+
+def _page_size(request):
+    return max(1, min(_int_param(request, 'limit', PAGE_SIZE), MAX_PAGE_SIZE))
+
+
+def _not_found():
+    return JsonResponse({'error': 'Not found'}, status=404)
+
+
+def _visible_posts():
+    return Post.objects.filter(is_deleted=False).exclude(repost_of__is_deleted=True)
+
+
+class FeedAPI(LoginRequiredMixin, View):
+    def get(self, request, *args, **kwargs):
+        posts = _visible_posts().filter(author_id__in=followed_ids(request.user)).order_by('-pk')
+
+        before = _int_param(request, 'before')
+        if before:
+            posts = posts.filter(pk__lt=before)
+
+        data = serialize_posts(posts.values(*POST_FIELDS)[:_page_size(request)], request.user)
+        return JsonResponse({'posts': data, 'next': data[-1]['id'] if data else None})
+
+
+class NewPostsAPI(LoginRequiredMixin, View):
+    def get(self, request, *args, **kwargs):
+        since = _int_param(request, 'since', 0)
+        posts = _visible_posts().filter(author_id__in=followed_ids(request.user), pk__gt=since)
+
+        # Bounded so a client that has been away for a week still gets a cheap answer.
+        count = posts.order_by().values('pk')[:MAX_NEW_POSTS].count()
+        data = {'count': count, 'more': count >= MAX_NEW_POSTS}
+
+        if count and request.GET.get('posts'):
+            data['posts'] = serialize_posts(posts.order_by('-pk').values(*POST_FIELDS)[:_page_size(request)], request.user)
+
+        return JsonResponse(data)
+
+
+class PostAPI(LoginRequiredMixin, View):
+    def get(self, request, pk, *args, **kwargs):
+        data = serialize_posts(_visible_posts().filter(pk=pk).values(*POST_FIELDS), request.user)
+        if not data:
+            return _not_found()
+        return JsonResponse(data[0])
+
+
+class CommentsAPI(LoginRequiredMixin, View):
+    def get(self, request, pk, *args, **kwargs):
+        if not _visible_posts().filter(pk=pk).exists():
+            return _not_found()
+
+        comments = Comment.objects.filter(post_id=pk, is_deleted=False).order_by('created_on', 'pk')
+        return JsonResponse({'comments': serialize_comment_tree(comments.values(*COMMENT_FIELDS), request.user)})
+
+
+class PostReactionAPI(LoginRequiredMixin, RateLimitMixin, View):
+    rate_limit_scope = 'like'
+    kind = 'like'
+
+    def post(self, request, pk, *args, **kwargs):
+        post = get_objects(Post, [pk]).get(pk)
+        if post is None or post.is_deleted:
+            return _not_found()
+
+        active = toggle_post_reaction(post, request.user, self.kind)
+        summary = reaction_summary('post', [post.pk], request.user)[post.pk]
+        counts = {'likes': summary['likes'], 'dislikes': summary['dislikes']}
+        return JsonResponse({'id': post.pk, self.kind + 'd': active, **counts})
+
+
+class CommentReactionAPI(LoginRequiredMixin, RateLimitMixin, View):
+    rate_limit_scope = 'like'
+    kind = 'like'
+
+    def post(self, request, pk, *args, **kwargs):
+        comment = Comment.objects.filter(pk=pk, is_deleted=False).only('pk', 'author_id').first()
+        if comment is None:
+            return _not_found()
+
+        active = toggle_comment_reaction(comment, request.user, self.kind)
+        summary = reaction_summary('comment', [comment.pk], request.user)[comment.pk]
+        counts = {'likes': summary['likes'], 'dislikes': summary['dislikes']}
+        return JsonResponse({'id': comment.pk, self.kind + 'd': active, **counts})
+
+
+class FollowAPI(LoginRequiredMixin, RateLimitMixin, View):
+    rate_limit_scope = 'follow'
+    follow = True
+
+    def post(self, request, pk, *args, **kwargs):
+        profile = get_objects(UserProfile, [pk]).get(pk)
+        if profile is None or profile.is_deleted:
+            return _not_found()
+        if pk == request.user.pk:
+            return JsonResponse({'error': 'You cannot follow yourself'}, status=400)
+
+        if self.follow:
+            bulk_follow(request.user, [pk])
+        else:
+            bulk_unfollow(request.user, [pk])
+
+        return JsonResponse({'id': pk, 'following': self.follow, 'followers': follower_count(pk)})
+
+
+class MessagesAPI(LoginRequiredMixin, RateLimitMixin, View):
+    rate_limit_scope = 'message'
+
+    def get_thread(self, request, pk):
+        thread = get_objects(ThreadModel, [pk]).get(pk)
+        if thread is not None and request.user.pk in (thread.user_id, thread.receiver_id):
+            return thread
+        return None
+
+    def get(self, request, pk, *args, **kwargs):
+        if self.get_thread(request, pk) is None:
+            return _not_found()
+
+        after = _int_param(request, 'after')
+        if after:
+            messages = MessageModel.objects.filter(thread_id=pk, pk__gt=after)
+            rows = list(messages.order_by('pk').values(*MESSAGE_FIELDS)[:_page_size(request)])
+        else:
+            rows = get_messages(pk, _int_param(request, 'before'), _page_size(request))
+
+        return JsonResponse({'messages': serialize_messages(rows)})
+
+    def post(self, request, pk, *args, **kwargs):
+        thread = self.get_thread(request, pk)
+        if thread is None:
+            return _not_found()
+
+        form = MessageForm(request.POST, request.FILES)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+
+        receiver_id = thread.user_id if thread.receiver_id == request.user.pk else thread.receiver_id
+        message = form.save(commit=False)
+        message.thread = thread
+        message.sender_user = request.user
+        message.receiver_user_id = receiver_id
+        message.save()
+
+        create_notification.delay(
+            4, request.user.pk, receiver_id, thread_id=thread.pk,
+            idempotency_key=f'notify-message:{message.pk}',
+        )
+
+        row = {field: getattr(message, field) for field in MESSAGE_FIELDS}
+        row['image'] = message.image.name
+        return JsonResponse(serialize_messages([row])[0], status=201)
@@ -0,0 +1,109 @@
+import datetime
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import MessageModel, MessageArchive, ArchivedImage
+from .serializers import MESSAGE_FIELDS
+
+# Newest messages per thread that always stay in MessageModel.
+HOT_MESSAGES = 200
+SEGMENT_SIZE = 500
+
+
+def encode_segment(rows):
+    return zlib.compress(json.dumps(rows, cls=DjangoJSONEncoder, separators=(',', ':')).encode(), 9)
+
+
+def decode_segment(data):
+    rows = json.loads(zlib.decompress(bytes(data)))
+    for row in rows:
+        row['date'] = parse_datetime(row['date'])
+    return rows
+
+
+def archive_thread(thread_id, keep=HOT_MESSAGES, older_than=None, segment_size=SEGMENT_SIZE):
+    # Moves everything but the newest `keep` messages (and, with older_than,
+    # only what was sent before it) into segments. Only full segments are
+    # written, so a thread keeps at most keep + segment_size - 1 hot messages
+    # and the archive never fills up with tiny segments.
+    messages = MessageModel.objects.filter(thread_id=thread_id)
+    boundary = list(messages.order_by('-pk').values_list('pk', flat=True)[keep:keep + 1])
+    if not boundary:
+        return 0
+    candidates = messages.filter(pk__lte=boundary[0])
+    if older_than is not None:
+        candidates = candidates.filter(date__lt=older_than)
+
+    archived = 0
+    while True:
+        rows = list(candidates.order_by('pk').values(*MESSAGE_FIELDS)[:segment_size])
+        if len(rows) < segment_size:
+            return archived
+        with transaction.atomic():
+            archive = MessageArchive.objects.create(
+                thread_id=thread_id,
+                first_message_id=rows[0]['pk'],
+                last_message_id=rows[-1]['pk'],
+                first_date=rows[0]['date'],
+                last_date=rows[-1]['date'],
+                count=len(rows),
+                data=encode_segment(rows),
+            )
+            ArchivedImage.objects.bulk_create([
+                ArchivedImage(archive=archive, name=row['image'], sender_user_id=row['sender_user_id'], receiver_user_id=row['receiver_user_id'])
+                for row in rows if row['image']
+            ])
+            MessageModel.objects.filter(pk__in=[row['pk'] for row in rows]).delete()
+        archived += len(rows)
+
+
+def archive_messages(keep=HOT_MESSAGES, older_than_days=None, segment_size=SEGMENT_SIZE):
+    older_than = None
+    if older_than_days is not None:
+        older_than = timezone.now() - datetime.timedelta(days=older_than_days)
+
+    threads = MessageModel.objects.values('thread_id').annotate(n=Count('pk')).filter(n__gte=keep + segment_size).order_by()
+    archived = 0
+    for thread_id in threads.values_list('thread_id', flat=True).iterator():
+        archived += archive_thread(thread_id, keep, older_than, segment_size)
+    return archived
+
+
+def iter_archived_messages(thread_ids):
+    for segment in MessageArchive.objects.filter(thread_id__in=thread_ids).order_by('thread_id', 'first_message_id').iterator(chunk_size=10):
+        for row in decode_segment(segment.data):
+            row['thread_id'] = segment.thread_id
+            yield row
+
+
+def archived_messages(thread_id, before=None, limit=50):
+    # Newest first, walking back one segment at a time.
+    segments = MessageArchive.objects.filter(thread_id=thread_id).order_by('-first_message_id')
+    rows = []
+    while len(rows) < limit:
+        segment = (segments.filter(first_message_id__lt=before) if before else segments).first()
+        if segment is None:
+            break
+        older = [row for row in decode_segment(segment.data) if before is None or row['pk'] < before]
+        rows.extend(reversed(older[-(limit - len(rows)):]))
+        before = segment.first_message_id
+    return rows
+
+
+def get_messages(thread_id, before=None, limit=50):
+    # The newest `limit` messages older than `before`, oldest first, reading
+    # from the hot table and continuing into the archive when it runs out.
+    messages = MessageModel.objects.filter(thread_id=thread_id)
+    if before:
+        messages = messages.filter(pk__lt=before)
+    rows = list(messages.order_by('-pk').values(*MESSAGE_FIELDS)[:limit])
+    if len(rows) < limit:
+        rows.extend(archived_messages(thread_id, rows[-1]['pk'] if rows else before, limit - len(rows)))
+    rows.reverse()
+    return rows
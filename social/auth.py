@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, load_backend
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser, User
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+from .objectcache import get_object
+
+# request.user is read through the object cache instead of a User query per
+# request. The receiver in models.py drops the cached copy whenever the User
+# is saved (password change, last_login, profile edits in the admin), and
+# anything that changes users with queryset.update() must call
+# invalidate_objects(User, ...) itself. The session auth hash is still checked
+# against the cached password hash, so changing the password logs out other
+# sessions exactly as it does with Django's own middleware.
+
+
+def get_user(request):
+    # django.contrib.auth.get_user() for ModelBackend and its subclasses
+    # (allauth's backend is one); other backends load users themselves.
+    try:
+        user_id = auth._get_user_session_key(request)
+        backend_path = request.session[BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    if backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return AnonymousUser()
+    backend = load_backend(backend_path)
+    if not isinstance(backend, ModelBackend):
+        return auth.get_user(request)
+
+    try:
+        user = get_object(User, user_id)
+    except User.DoesNotExist:
+        return AnonymousUser()
+    if not backend.user_can_authenticate(user):
+        return AnonymousUser()
+
+    session_hash = request.session.get(HASH_SESSION_KEY)
+    if not (session_hash and constant_time_compare(session_hash, user.get_session_auth_hash())):
+        request.session.flush()
+        return AnonymousUser()
+    return user
+
+
+def _cached_user(request):
+    if not hasattr(request, '_cached_user'):
+        request._cached_user = get_user(request)
+    return request._cached_user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: _cached_user(request))
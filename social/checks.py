@@ -0,0 +1,91 @@
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.checks import Warning, register
+from django.utils.module_loading import import_string
+
+
+def _template_loaders_cached(template_settings):
+    options = template_settings.get('OPTIONS', {})
+    loaders = options.get('loaders')
+    if loaders is None:
+        # Django wraps the default loaders in the cached loader when debug is off.
+        return not options.get('debug', settings.DEBUG)
+    return any(isinstance(loader, (list, tuple)) and loader[0] == 'django.template.loaders.cached.Loader' for loader in loaders)
+
+
+@register('performance')
+def check_slow_settings(app_configs, **kwargs):
+    # Only production settings opt in; the development defaults are slow on purpose.
+    if not getattr(settings, 'PRODUCTION', False):
+        return []
+
+    warnings = []
+    if settings.DEBUG:
+        warnings.append(Warning(
+            'DEBUG is on in production.',
+            hint='Every SQL query is kept in memory for the life of the request and templates are not cached.',
+            id='social.W001',
+        ))
+
+    for template_settings in settings.TEMPLATES:
+        if template_settings['BACKEND'] == 'django.template.backends.django.DjangoTemplates' and not _template_loaders_cached(template_settings):
+            warnings.append(Warning(
+                'Templates are loaded and parsed from disk on every render.',
+                hint="Wrap the loaders in 'django.template.loaders.cached.Loader'.",
+                id='social.W002',
+            ))
+
+    if not issubclass(import_string(settings.STATICFILES_STORAGE), ManifestStaticFilesStorage):
+        warnings.append(Warning(
+            'Static files are not stored under hashed names.',
+            hint='Use socialnetwork.storage.CompressedManifestStaticFilesStorage so assets can be cached for a year.',
+            id='social.W003',
+        ))
+
+    for alias, database in settings.DATABASES.items():
+        if not database.get('CONN_MAX_AGE') and database['ENGINE'] != 'social.dbpool':
+            warnings.append(Warning(
+                f"Database '{alias}' opens a new connection for every request.",
+                hint='Set DB_CONN_MAX_AGE or enable the pool with DB_POOL=1.',
+                id='social.W004',
+            ))
+
+    if settings.CACHES['default']['BACKEND'] == 'django.core.cache.backends.locmem.LocMemCache':
+        warnings.append(Warning(
+            'The default cache is local to each process.',
+            hint='Cached summaries, follow lists and version stamps are not shared between workers; point CACHES at memcached or Redis.',
+            id='social.W005',
+        ))
+
+    page_cache = getattr(settings, 'PAGE_CACHE', 'default')
+    if page_cache != 'default' and settings.CACHES[page_cache]['BACKEND'] == 'django.core.cache.backends.locmem.LocMemCache':
+        warnings.append(Warning(
+            f"The page cache '{page_cache}' is local to each process.",
+            hint='A purge in one worker leaves the other workers serving the old page until it expires; use a shared cache.',
+            id='social.W007',
+        ))
+
+    if settings.SESSION_ENGINE in ('django.contrib.sessions.backends.cache', 'django.contrib.sessions.backends.cached_db'):
+        session_cache = settings.SESSION_CACHE_ALIAS
+        if settings.CACHES[session_cache]['BACKEND'] == 'django.core.cache.backends.locmem.LocMemCache':
+            warnings.append(Warning(
+                f"Sessions are cached in '{session_cache}', which is local to each process.",
+                hint='Logging out or changing a password in one worker leaves the session valid in the others; use a shared cache.',
+                id='social.W008',
+            ))
+
+    if getattr(settings, 'REACTION_BUFFER_ENABLED', True) and getattr(settings, 'REACTION_BUFFER_STORE', 'social.reaction_buffer.LocalStore') == 'social.reaction_buffer.LocalStore':
+        warnings.append(Warning(
+            'Buffered likes and dislikes are held in each worker until it flushes them.',
+            hint="A worker that is killed loses its buffer; use 'social.reaction_buffer.CacheStore' and run `manage.py flush_reactions --loop`.",
+            id='social.W009',
+        ))
+
+    if getattr(settings, 'TASKS_EAGER', False):
+        warnings.append(Warning(
+            'Background tasks run inside the request.',
+            hint='Set TASKS_EAGER = False and run `manage.py run_tasks`.',
+            id='social.W006',
+        ))
+
+    return warnings
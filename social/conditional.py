@@ -0,0 +1,97 @@
+import hashlib
+
+from django.db.models import Max
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .models import Post, UserProfile, MessageModel, Tag
+from .versions import get_versions
+from .follows import followed_ids
+from .notifications import unread_count
+
+
+def conditional_view(stamp_func):
+    # stamp_func(request, *args, **kwargs) returns (parts, last_modified). It
+    # runs once per request and its parts are hashed into the ETag, so a
+    # matching If-None-Match returns 304 before the view touches its queries.
+    def get_stamp(request, *args, **kwargs):
+        if not hasattr(request, '_conditional_stamp'):
+            parts, last_modified = stamp_func(request, *args, **kwargs)
+            etag = hashlib.md5(repr(parts).encode()).hexdigest()
+            request._conditional_stamp = (etag, last_modified)
+        return request._conditional_stamp
+
+    def decorator(view_func):
+        conditional = condition(
+            etag_func=lambda request, *args, **kwargs: get_stamp(request, *args, **kwargs)[0],
+            last_modified_func=lambda request, *args, **kwargs: get_stamp(request, *args, **kwargs)[1],
+        )(view_func)
+
+        def wrapper(request, *args, **kwargs):
+            response = conditional(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
+
+
+def _latest(*values):
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+def viewer_stamp(request):
+    # Pages embed the CSRF token and the session's user, so a cached copy must
+    # not outlive either: login rotates the CSRF secret and the session key.
+    csrf = request.META.get('CSRF_COOKIE')
+    user = request.user
+    if not user.is_authenticated:
+        return (None, csrf)
+    # Requests built outside the middleware stack (benchmarks, tests) have no session.
+    session = getattr(request, 'session', None)
+    session = session.session_key if session is not None else None
+    return (user.pk, session, csrf, unread_count(user.pk), get_versions([f'notifications:{user.pk}']))
+
+
+def feed_stamp(request):
+    followed = followed_ids(request.user)
+    posts = Post.objects.filter(author_id__in=followed, is_deleted=False)
+    latest = posts.aggregate(Max('pk'), Max('created_on'))
+    originals = set(posts.filter(repost_of__isnull=False).values_list('repost_of__author_id', flat=True))
+    authors = sorted(set(followed) | originals)
+    versions = get_versions([f'user:{pk}' for pk in authors])
+    parts = (viewer_stamp(request), latest['pk__max'], authors, versions)
+    return parts, latest['created_on__max']
+
+
+def profile_stamp(request, pk):
+    profile = UserProfile.objects.filter(pk=pk).values('updated_on').first()
+    updated_on = profile['updated_on'] if profile else None
+    posts = Post.objects.filter(author_id=pk, is_deleted=False)
+    latest = posts.aggregate(Max('pk'), Max('created_on'))
+    authors = sorted({pk} | set(posts.filter(repost_of__isnull=False).values_list('repost_of__author_id', flat=True)))
+    parts = (viewer_stamp(request), updated_on, latest['pk__max'], authors, get_versions([f'user:{pk}' for pk in authors]))
+    return parts, _latest(updated_on, latest['created_on__max'])
+
+
+def followers_stamp(request, pk):
+    profile = UserProfile.objects.filter(pk=pk).values('updated_on').first()
+    updated_on = profile['updated_on'] if profile else None
+    return (viewer_stamp(request), updated_on, get_versions([f'user:{pk}'])), None
+
+
+def thread_stamp(request, pk):
+    latest = MessageModel.objects.filter(thread_id=pk).aggregate(Max('pk'), Max('date'))
+    return (viewer_stamp(request), request.GET.get('before'), latest['pk__max']), latest['date__max']
+
+
+def explore_stamp(request):
+    query = request.GET.get('query')
+    posts = Post.objects.filter(is_deleted=False)
+    if query:
+        tag = Tag.objects.filter(name=query).values_list('pk', flat=True).first()
+        if tag:
+            posts = posts.filter(tags=tag)
+    latest = posts.aggregate(Max('pk'), Max('created_on'))
+    parts = (viewer_stamp(request), query, latest['pk__max'], get_versions(['content']))
+    return parts, latest['created_on__max']
@@ -0,0 +1,82 @@
+import os
+
+import psycopg2.extras
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+from .pool import ConnectionPool, pools, pools_lock
+
+POOL_DEFAULTS = {
+    'MAX_SIZE': 4,
+    'MIN_SIZE': 0,
+    'TIMEOUT': 10,
+    'MAX_IDLE': 300,
+    'MAX_LIFETIME': 3600,
+    'CHECK_INTERVAL': 30,
+}
+
+
+def _check(conn):
+    with conn.cursor() as cursor:
+        cursor.execute('SELECT 1')
+
+
+def _reset(conn):
+    if conn.closed:
+        return False
+    status = conn.info.transaction_status
+    if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+        return False
+    if status != extensions.TRANSACTION_STATUS_IDLE:
+        conn.rollback()
+    return True
+
+
+def get_pool(wrapper, conn_params):
+    settings_dict = wrapper.settings_dict
+    # Keyed by pid as well so a forked worker never reuses its parent's sockets.
+    key = (os.getpid(), wrapper.alias, settings_dict['NAME'], settings_dict['HOST'], settings_dict['PORT'], settings_dict['USER'])
+    with pools_lock:
+        pool = pools.get(key)
+        if pool is None:
+            options = {**POOL_DEFAULTS, **settings_dict.get('POOL', {})}
+            pool = pools[key] = ConnectionPool(
+                connect=lambda: base.Database.connect(**conn_params),
+                check=_check,
+                reset=_reset,
+                max_size=options['MAX_SIZE'],
+                min_size=options['MIN_SIZE'],
+                timeout=options['TIMEOUT'],
+                max_idle=options['MAX_IDLE'],
+                max_lifetime=options['MAX_LIFETIME'],
+                check_interval=options['CHECK_INTERVAL'],
+            )
+        return pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    # PostgreSQL backend that borrows connections from a per-process pool and
+    # hands them back on close() instead of disconnecting. Use it with
+    # CONN_MAX_AGE = 0 so every request returns its connection when it ends.
+    pool = None
+
+    def get_new_connection(self, conn_params):
+        self.pool = get_pool(self, conn_params)
+        connection = self.pool.get()
+
+        options = self.settings_dict['OPTIONS']
+        try:
+            self.isolation_level = options['isolation_level']
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+        psycopg2.extras.register_default_jsonb(conn_or_curs=connection, loads=lambda x: x)
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.put(self.connection)
+            self.pool.prune()
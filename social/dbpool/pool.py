@@ -0,0 +1,173 @@
+import os
+import threading
+import time
+from collections import deque
+
+
+# (pid, alias, name, host, port, user) -> ConnectionPool, filled in by the backend.
+pools = {}
+pools_lock = threading.Lock()
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    # A small blocking pool of raw DB-API connections for one process. `connect`
+    # opens a new connection, `check` runs a cheap liveness query and `reset`
+    # puts a returned connection back into a clean state (returning False if it
+    # should be thrown away instead).
+    def __init__(self, connect, check, reset, max_size=4, min_size=0, timeout=10,
+                 max_idle=300, max_lifetime=3600, check_interval=30):
+        self.connect = connect
+        self.check = check
+        self.reset = reset
+        self.max_size = max_size
+        self.min_size = min_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.check_interval = check_interval
+
+        self.pid = os.getpid()
+        self.lock = threading.Condition()
+        self.idle = deque()
+        self.created = {}
+        self.size = 0
+        self.counters = {
+            'checkouts': 0,
+            'connects': 0,
+            'discards': 0,
+            'failed_checks': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+        }
+
+    def get(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+        waited = False
+
+        while True:
+            with self.lock:
+                while not self.idle and self.size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.counters['timeouts'] += 1
+                        raise PoolTimeout(f'No database connection available within {self.timeout}s')
+                    waited = True
+                    self.lock.wait(remaining)
+
+                if self.idle:
+                    conn, returned = self.idle.pop()
+                else:
+                    conn, returned = None, None
+                    self.size += 1
+
+            if conn is None:
+                try:
+                    conn = self.connect()
+                except BaseException:
+                    self._release_slot()
+                    raise
+                with self.lock:
+                    self.created[id(conn)] = time.monotonic()
+                    self.counters['connects'] += 1
+            elif not self._usable(conn, returned):
+                continue
+
+            self._record_checkout(time.monotonic() - start, waited)
+            return conn
+
+    def put(self, conn):
+        if os.getpid() != self.pid:
+            return
+        try:
+            keep = self.reset(conn) and not self._expired(conn)
+        except Exception:
+            keep = False
+        if not keep:
+            self._discard(conn)
+            return
+        with self.lock:
+            self.idle.append((conn, time.monotonic()))
+            self.lock.notify()
+
+    def prune(self):
+        # Close connections that sat idle for too long, keeping min_size around.
+        now = time.monotonic()
+        stale = []
+        with self.lock:
+            while len(self.idle) > self.min_size and now - self.idle[0][1] > self.max_idle:
+                stale.append(self.idle.popleft()[0])
+        for conn in stale:
+            self._discard(conn)
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = list(self.idle), deque()
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def stats(self):
+        with self.lock:
+            checkouts = self.counters['checkouts']
+            return {
+                **self.counters,
+                'size': self.size,
+                'idle': len(self.idle),
+                'in_use': self.size - len(self.idle),
+                'max_size': self.max_size,
+                'wait_time_avg': self.counters['wait_time_total'] / checkouts if checkouts else 0.0,
+            }
+
+    def _usable(self, conn, returned):
+        if self._expired(conn) or time.monotonic() - returned > self.max_idle:
+            self._discard(conn)
+            return False
+        if time.monotonic() - returned > self.check_interval:
+            try:
+                self.check(conn)
+            except Exception:
+                with self.lock:
+                    self.counters['failed_checks'] += 1
+                self._discard(conn)
+                return False
+        return True
+
+    def _expired(self, conn):
+        created = self.created.get(id(conn))
+        return created is None or time.monotonic() - created > self.max_lifetime
+
+    def _record_checkout(self, wait, waited):
+        with self.lock:
+            self.counters['checkouts'] += 1
+            if waited:
+                self.counters['waits'] += 1
+            self.counters['wait_time_total'] += wait
+            self.counters['wait_time_max'] = max(self.counters['wait_time_max'], wait)
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self.lock:
+            self.created.pop(id(conn), None)
+            self.counters['discards'] += 1
+        self._release_slot()
+
+    def _release_slot(self):
+        with self.lock:
+            self.size -= 1
+            self.lock.notify()
+
+
+def pool_stats():
+    pid = os.getpid()
+    with pools_lock:
+        current = [(key, pool) for key, pool in pools.items() if key[0] == pid]
+    return {f'{key[1]}:{key[2]}': pool.stats() for key, pool in current}
@@ -0,0 +1,268 @@
+import hashlib
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.db.models import Q
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe
+from django.views import View
+
+STATIC_MAX_AGE = 60 * 60 * 24 * 365
+STATIC_UNHASHED_MAX_AGE = 60 * 5
+MEDIA_MAX_AGE = 60 * 60 * 24
+# Uploads are never overwritten in place (storage picks a fresh name), so
+# public media can be cached as long as static assets.
+PUBLIC_MEDIA_MAX_AGE = STATIC_MAX_AGE
+BLOCK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# Files under these MEDIA_ROOT prefixes are only served to the people who can
+# see them; see MediaFileView.allowed().
+PRIVATE_MEDIA = ('uploads/message_photos/',)
+ACCESS_TIMEOUT = 60 * 60
+DENIED_TIMEOUT = 60
+
+
+class RangeFile:
+    # A file positioned at the start of a byte range that reads no further
+    # than its end. fileno() and tell() are left alone so a WSGI server's
+    # sendfile() path (gunicorn uses the file offset plus Content-Length)
+    # still applies.
+    def __init__(self, f, start, length):
+        f.seek(start)
+        self.f = f
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.f.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.f.fileno()
+
+    def tell(self):
+        return self.f.tell()
+
+    def close(self):
+        self.f.close()
+
+
+def is_clean_path(path):
+    # '//', '/./' and '/../' would give one file several names, and media
+    # privacy is decided by name, so only the plain spelling is served.
+    return all(segment not in ('', '.', '..') for segment in path.split('/'))
+
+
+def parse_range(header, size):
+    # Only a single range is honoured; anything else gets the whole file.
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if not match or not any(match.groups()):
+        return None
+    start, end = match.groups()
+    if not start:
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start, end = int(start), min(int(end), size - 1) if end else size - 1
+    if start > end:
+        return False
+    return start, end
+
+
+class FileView(View):
+    root = None
+    encodings = ()
+
+    def get_root(self):
+        return self.root
+
+    def cache_control(self, path):
+        return 'no-cache'
+
+    def allowed(self, request, path):
+        return True
+
+    def get(self, request, path, *args, **kwargs):
+        if not is_clean_path(path):
+            raise Http404
+        try:
+            fullpath = safe_join(self.get_root(), path)
+        except ValueError:
+            raise Http404
+        if not os.path.isfile(fullpath) or not self.allowed(request, path):
+            raise Http404
+
+        content_type, encoding = mimetypes.guess_type(fullpath)
+        accept = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        served = fullpath
+        for name, suffix in self.encodings:
+            if name in accept and os.path.isfile(fullpath + suffix):
+                served, encoding = fullpath + suffix, name
+                break
+
+        stat = os.stat(served)
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        headers = {'ETag': etag, 'Last-Modified': http_date(stat.st_mtime), 'Cache-Control': self.cache_control(path)}
+        if self.encodings:
+            headers['Vary'] = 'Accept-Encoding'
+
+        response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+        if response is None:
+            response = self.offload(path, served, encoding) or self.file_response(request, served, stat, etag, encoding)
+            response['Content-Type'] = content_type or 'application/octet-stream'
+            if encoding:
+                response['Content-Encoding'] = encoding
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    def offload(self, path, served, encoding):
+        return None
+
+    def file_response(self, request, served, stat, etag, encoding):
+        size = stat.st_size
+        byte_range = None
+        if not encoding and 'HTTP_RANGE' in request.META and self.range_current(request, etag, stat):
+            byte_range = parse_range(request.META['HTTP_RANGE'], size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+        f = open(served, 'rb')
+        if byte_range is None:
+            response = FileResponse(f)
+            response['Content-Length'] = size
+        else:
+            start, end = byte_range
+            response = FileResponse(RangeFile(f, start, end - start + 1), status=206)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = end - start + 1
+        response.block_size = BLOCK_SIZE
+        if not encoding:
+            response['Accept-Ranges'] = 'bytes'
+        return response
+
+    def range_current(self, request, etag, stat):
+        # If-Range: send the range only if the client's copy is still current.
+        if_range = request.META.get('HTTP_IF_RANGE')
+        if not if_range:
+            return True
+        if if_range.startswith('"'):
+            return if_range == etag
+        date = parse_http_date_safe(if_range)
+        return date is not None and int(stat.st_mtime) <= date
+
+
+class StaticFileView(FileView):
+    # Serves collectstatic output, preferring the precompressed copies written
+    # by CompressedManifestStaticFilesStorage. Hashed names never change
+    # content, so they can be cached for a year.
+    encodings = (('br', '.br'), ('gzip', '.gz'))
+
+    def get_root(self):
+        return settings.STATIC_ROOT
+
+    def cache_control(self, path):
+        hashed_files = getattr(staticfiles_storage, 'hashed_files', {})
+        if path in hashed_files.values():
+            return f'public, max-age={STATIC_MAX_AGE}, immutable'
+        return f'public, max-age={STATIC_UNHASHED_MAX_AGE}'
+
+
+def is_private_media(path):
+    # Decided on the resolved file, so a symlink into a private directory is
+    # private too.
+    fullpath = os.path.realpath(os.path.join(settings.MEDIA_ROOT, path))
+    return any(
+        fullpath.startswith(os.path.join(os.path.realpath(os.path.join(settings.MEDIA_ROOT, prefix)), ''))
+        for prefix in PRIVATE_MEDIA
+    )
+
+
+def can_see_message_image(user, name):
+    # The sender or receiver of a live or archived message with this image.
+    if not user.is_authenticated:
+        return False
+    key = f'media-access:{user.pk}:' + hashlib.md5(name.encode()).hexdigest()
+    allowed = cache.get(key)
+    if allowed is not None:
+        return allowed
+
+    from .models import MessageModel, ArchivedImage
+
+    mine = Q(sender_user_id=user.pk) | Q(receiver_user_id=user.pk)
+    allowed = (
+        MessageModel.objects.filter(mine, image=name).exists()
+        or ArchivedImage.objects.filter(mine, name=name).exists()
+    )
+    cache.set(key, allowed, ACCESS_TIMEOUT if allowed else DENIED_TIMEOUT)
+    return allowed
+
+
+class MediaFileView(FileView):
+    # With MEDIA_ACCEL set, the checks run here and the bytes are sent by the
+    # front-end server: 'x-accel-redirect' (nginx, internal location at
+    # MEDIA_ACCEL_PREFIX) or 'x-sendfile' (Apache mod_xsendfile, lighttpd).
+    def get_root(self):
+        return settings.MEDIA_ROOT
+
+    def cache_control(self, path):
+        if is_private_media(path):
+            return f'private, max-age={MEDIA_MAX_AGE}'
+        return f'public, max-age={PUBLIC_MEDIA_MAX_AGE}'
+
+    def allowed(self, request, path):
+        if is_private_media(path):
+            return can_see_message_image(request.user, path)
+        return True
+
+    def get(self, request, path, *args, **kwargs):
+        response = super().get(request, path, *args, **kwargs)
+        if is_private_media(path):
+            patch_vary_headers(response, ('Cookie',))
+        return response
+
+    def offload(self, path, served, encoding):
+        accel = getattr(settings, 'MEDIA_ACCEL', None)
+        if accel == 'x-accel-redirect':
+            response = HttpResponse()
+            response['X-Accel-Redirect'] = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/') + path
+            return response
+        if accel == 'x-sendfile':
+            response = HttpResponse()
+            response['X-Sendfile'] = served
+            return response
+        return None
+
+
+class MediaMiddleware:
+    # Answers public media requests before sessions, auth and CSRF run, so
+    # an image costs no more than the file read. Private media falls through
+    # to the MediaFileView route, which needs request.user.
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.view = MediaFileView.as_view()
+
+    def __call__(self, request):
+        prefix = settings.MEDIA_URL
+        if request.method in ('GET', 'HEAD') and request.path_info.startswith(prefix):
+            path = request.path_info[len(prefix):]
+            if is_clean_path(path) and not is_private_media(path) and serve_media():
+                try:
+                    return self.view(request, path=path)
+                except Http404:
+                    return self.get_response(request)
+        return self.get_response(request)
+
+
+def serve_media():
+    return settings.DEBUG or getattr(settings, 'SERVE_MEDIA', False)
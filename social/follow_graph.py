@@ -0,0 +1,270 @@
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import UserProfile, FollowEvent
+
+# The snapshot is a compressed-sparse-row copy of the follow graph: for each
+# user id, offsets[id]:offsets[id + 1] slices a sorted array of the ids it
+# follows (and, in a second pair of arrays, of its followers). The file is
+# written by `manage.py build_follow_graph` and mmapped read-only, so every
+# worker on the host shares the same pages instead of holding its own copy.
+#
+# Layout: header, following offsets (nodes + 1), following (edges),
+# followers offsets (nodes + 1), followers (edges); all native int64.
+Follow = UserProfile.followers.through
+
+MAGIC = b'SNFGRAPH'
+HEADER = struct.Struct('=8sqqd')
+ITEM = 'q'
+ITEM_SIZE = array(ITEM).itemsize
+
+# Follows written while a snapshot is being built may land in it or not, so
+# the delta log is replayed from a little before the build started. Replaying
+# an event the snapshot already holds is harmless: the newest event for a
+# pair always wins.
+DELTA_OVERLAP = timedelta(minutes=5)
+
+# Workers read only the events after the last id they saw, but an event can
+# commit after one with a higher id, so the last EVENT_SLACK is read again.
+# Each pair remembers the id of the newest event applied to it, so a re-read
+# or late event never overrides a newer one.
+EVENT_SLACK = timedelta(seconds=30)
+
+
+def snapshot_path():
+    return getattr(settings, 'FOLLOW_GRAPH_PATH', os.path.join(settings.BASE_DIR, 'follow_graph.bin'))
+
+
+def _csr(sources, targets, nodes, order):
+    # Counting sort of the edges by source; `order` already lists edges with
+    # ascending targets per source, so each row comes out sorted.
+    offsets = array(ITEM, bytes(ITEM_SIZE * (nodes + 1)))
+    for source in sources:
+        offsets[source + 1] += 1
+    for node in range(nodes):
+        offsets[node + 1] += offsets[node]
+    values = array(ITEM, bytes(ITEM_SIZE * len(targets)))
+    cursor = array(ITEM, offsets[:-1])
+    for index in order:
+        source = sources[index]
+        values[cursor[source]] = targets[index]
+        cursor[source] += 1
+    return offsets, values
+
+
+def build_snapshot(path=None, chunk_size=10000):
+    path = path or snapshot_path()
+    built_at = time.time()
+
+    followers = array(ITEM)
+    followees = array(ITEM)
+    rows = Follow.objects.order_by('user_id', 'userprofile_id').values_list('user_id', 'userprofile_id')
+    for follower_id, followee_id in rows.iterator(chunk_size=chunk_size):
+        followers.append(follower_id)
+        followees.append(followee_id)
+
+    edges = len(followers)
+    nodes = max(max(followers, default=0), max(followees, default=0)) + 1
+    following_offsets, following = _csr(followers, followees, nodes, range(edges))
+    by_followee = sorted(range(edges), key=lambda index: (followees[index], followers[index]))
+    followers_offsets, followers = _csr(followees, followers, nodes, by_followee)
+
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, nodes, edges, built_at))
+        for values in (following_offsets, following, followers_offsets, followers):
+            values.tofile(f)
+    # Workers that still map the old file keep reading it until they notice
+    # the new one; os.replace() never leaves a half-written snapshot behind.
+    os.replace(tmp, path)
+
+    # Workers keep the events they have read in memory until they load the new
+    # snapshot, and then only need the events from around its build time.
+    FollowEvent.objects.filter(created_on__lt=_event_time(built_at)).delete()
+    return nodes, edges
+
+
+def _event_time(built_at):
+    return datetime.fromtimestamp(built_at, tz=dt_timezone.utc) - DELTA_OVERLAP
+
+
+class Snapshot:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.nodes, self.edges, self.built_at = HEADER.unpack_from(self.mm)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a follow graph snapshot')
+
+        view = memoryview(self.mm)
+        offset = HEADER.size
+        arrays = []
+        for length in (self.nodes + 1, self.edges, self.nodes + 1, self.edges):
+            arrays.append(view[offset:offset + length * ITEM_SIZE].cast(ITEM))
+            offset += length * ITEM_SIZE
+        self.following_offsets, self.following, self.followers_offsets, self.followers = arrays
+
+    def _row(self, offsets, values, user_id):
+        if not 0 <= user_id < self.nodes:
+            return values[0:0]
+        return values[offsets[user_id]:offsets[user_id + 1]]
+
+    def following_of(self, user_id):
+        return self._row(self.following_offsets, self.following, user_id)
+
+    def followers_of(self, user_id):
+        return self._row(self.followers_offsets, self.followers, user_id)
+
+
+def _contains(row, value):
+    index = bisect_left(row, value)
+    return index < len(row) and row[index] == value
+
+
+def _merge(row, delta):
+    if not delta:
+        return list(row)
+    ids = set(row)
+    for other_id, followed in delta.items():
+        if followed:
+            ids.add(other_id)
+        else:
+            ids.discard(other_id)
+    return sorted(ids)
+
+
+class FollowGraph:
+    # Lookups go to the mmapped snapshot plus an in-process overlay of the
+    # FollowEvent rows written since it was built. New events are read every
+    # FOLLOW_GRAPH_REFRESH_INTERVAL seconds (one small query per worker, not
+    # per request), and a worker applies its own follows to it as soon as
+    # they commit. Every method returns None when there is no snapshot yet so
+    # callers can fall back to the database.
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.snapshot = None
+        self.stat = None
+        self.checked_at = None
+        # ({follower: {followee: followed}}, {followee: {follower: followed}});
+        # rows are replaced, never edited, so readers never see one change.
+        self.deltas = ({}, {})
+        # (follower, followee) -> id of the newest event applied
+        self.event_ids = {}
+        self.last_event_id = 0
+
+    def refresh(self, force=False):
+        if not getattr(settings, 'FOLLOW_GRAPH_ENABLED', True):
+            return None
+        interval = getattr(settings, 'FOLLOW_GRAPH_REFRESH_INTERVAL', 1.0)
+        if not force and self.checked_at is not None and time.monotonic() - self.checked_at < interval:
+            return self.snapshot
+
+        with self.lock:
+            if not force and self.checked_at is not None and time.monotonic() - self.checked_at < interval:
+                return self.snapshot
+            path = self.path or snapshot_path()
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                self.snapshot = self.stat = None
+            else:
+                key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+                if key != self.stat:
+                    self.snapshot = Snapshot(path)
+                    self.stat = key
+                    self.deltas, self.event_ids, self.last_event_id = ({}, {}), {}, 0
+                    self._read_events(FollowEvent.objects.filter(created_on__gte=_event_time(self.snapshot.built_at)))
+                else:
+                    self._read_events(FollowEvent.objects.filter(
+                        Q(pk__gt=self.last_event_id) | Q(created_on__gte=timezone.now() - EVENT_SLACK),
+                    ))
+            self.checked_at = time.monotonic()
+            return self.snapshot
+
+    def _read_events(self, events):
+        changes = []
+        for event_id, follower_id, followee_id, followed in events.order_by('pk').values_list(
+                'pk', 'follower_id', 'followee_id', 'followed').iterator():
+            self.last_event_id = max(self.last_event_id, event_id)
+            pair = (follower_id, followee_id)
+            if self.event_ids.get(pair, 0) < event_id:
+                self.event_ids[pair] = event_id
+                changes.append((pair, followed))
+        self._publish(changes)
+
+    def _publish(self, changes):
+        # Called with the lock held. Only the changed rows are copied and put
+        # back; storing a row is a single dict assignment, so readers see the
+        # old row or the new one and the rest of the overlay is left alone.
+        if not changes:
+            return
+        by_follower, by_followee = {}, {}
+        for (follower_id, followee_id), followed in changes:
+            by_follower.setdefault(follower_id, {})[followee_id] = followed
+            by_followee.setdefault(followee_id, {})[follower_id] = followed
+        for deltas, rows in zip(self.deltas, (by_follower, by_followee)):
+            for key, row in rows.items():
+                deltas[key] = {**deltas.get(key, {}), **row}
+
+    def apply(self, pairs, followed):
+        with self.lock:
+            self._publish([(pair, followed) for pair in pairs])
+
+    def following(self, user_id):
+        snapshot = self.refresh()
+        if snapshot is None:
+            return None
+        return _merge(snapshot.following_of(user_id), self.deltas[0].get(user_id))
+
+    def followers(self, user_id):
+        snapshot = self.refresh()
+        if snapshot is None:
+            return None
+        return _merge(snapshot.followers_of(user_id), self.deltas[1].get(user_id))
+
+    def follower_count(self, user_id):
+        snapshot = self.refresh()
+        if snapshot is None:
+            return None
+        row = snapshot.followers_of(user_id)
+        count = len(row)
+        for follower_id, followed in self.deltas[1].get(user_id, {}).items():
+            count += followed - _contains(row, follower_id)
+        return count
+
+    def is_following(self, follower_id, followee_id):
+        snapshot = self.refresh()
+        if snapshot is None:
+            return None
+        delta = self.deltas[0].get(follower_id, {})
+        if followee_id in delta:
+            return delta[followee_id]
+        return _contains(snapshot.following_of(follower_id), followee_id)
+
+
+graph = FollowGraph()
+
+
+def record(pairs, followed):
+    # Log (follower_id, followee_id) changes for the snapshot overlay. Call it
+    # in the same transaction as the Follow rows it describes.
+    pairs = list(pairs)
+    if not pairs:
+        return
+    FollowEvent.objects.bulk_create([
+        FollowEvent(follower_id=follower_id, followee_id=followee_id, followed=followed)
+        for follower_id, followee_id in pairs
+    ])
+    transaction.on_commit(lambda: graph.apply(pairs, followed))
@@ -0,0 +1,138 @@
+import csv
+import io
+import json
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import UserProfile, Notification
+from .follow_graph import graph, record
+from .notifications import notify_many
+from .pagecache import purge as purge_pages
+from .versions import bump_versions, get_versions
+
+# profile.followers holds the users following that profile, so a row
+# (userprofile_id=P, user_id=U) in the through table means "U follows P".
+# UserProfile uses the user as its primary key, so P is also a user id.
+Follow = UserProfile.followers.through
+
+BATCH_SIZE = 500
+EXPORT_CHUNK_SIZE = 2000
+FOLLOWING_TIMEOUT = 60 * 60
+
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def resolve_targets(usernames=(), profile_ids=(), batch_size=BATCH_SIZE):
+    ids = set()
+    for chunk in chunked(usernames, batch_size):
+        ids.update(User.objects.filter(username__in=chunk, profile__is_deleted=False).values_list('pk', flat=True))
+    for chunk in chunked(profile_ids, batch_size):
+        ids.update(UserProfile.objects.filter(pk__in=chunk, is_deleted=False).values_list('pk', flat=True))
+    return ids
+
+
+def followed_ids(user):
+    ids = graph.following(user.pk)
+    if ids is not None:
+        return ids
+
+    version = get_versions([f'following:{user.pk}'])[0]
+    key = f'following-ids:{user.pk}:{version}'
+    ids = cache.get(key)
+    if ids is None:
+        ids = list(Follow.objects.filter(user=user).values_list('userprofile_id', flat=True))
+        cache.set(key, ids, FOLLOWING_TIMEOUT)
+    return ids
+
+
+def follower_count(profile_id):
+    count = graph.follower_count(profile_id)
+    if count is None:
+        count = Follow.objects.filter(userprofile_id=profile_id).count()
+    return count
+
+
+def is_following(user, profile_id):
+    if not user.is_authenticated:
+        return False
+    following = graph.is_following(user.pk, profile_id)
+    if following is None:
+        following = Follow.objects.filter(user=user, userprofile_id=profile_id).exists()
+    return following
+
+
+def bulk_follow(user, target_ids, batch_size=BATCH_SIZE, notify=True):
+    target_ids = set(target_ids)
+    target_ids.discard(user.pk)
+    created = 0
+
+    for chunk in chunked(sorted(target_ids), batch_size):
+        # Deleted accounts keep their profile row but cannot gain followers.
+        live = set(UserProfile.objects.filter(pk__in=chunk, is_deleted=False).values_list('pk', flat=True))
+        existing = set(Follow.objects.filter(user=user, userprofile_id__in=chunk).values_list('userprofile_id', flat=True))
+        new_ids = [pk for pk in chunk if pk in live and pk not in existing]
+        if not new_ids:
+            continue
+
+        with transaction.atomic():
+            Follow.objects.bulk_create(
+                [Follow(userprofile_id=pk, user_id=user.pk) for pk in new_ids],
+                ignore_conflicts=True,
+            )
+            record([(user.pk, pk) for pk in new_ids], True)
+            if notify:
+                notify_many([Notification(notification_type=3, from_user_id=user.pk, to_user_id=pk) for pk in new_ids])
+        bump_versions(f'following:{user.pk}', *[f'user:{pk}' for pk in new_ids])
+        purge_pages(*[f'user:{pk}' for pk in new_ids])
+        created += len(new_ids)
+
+    return created
+
+
+def bulk_unfollow(user, target_ids, batch_size=BATCH_SIZE):
+    removed = 0
+    for chunk in chunked(sorted(set(target_ids)), batch_size):
+        with transaction.atomic():
+            removed += Follow.objects.filter(user=user, userprofile_id__in=chunk).delete()[0]
+            record([(user.pk, pk) for pk in chunk], False)
+        bump_versions(f'following:{user.pk}', *[f'user:{pk}' for pk in chunk])
+        purge_pages(*[f'user:{pk}' for pk in chunk])
+    return removed
+
+
+def iter_follow_graph(user, direction='following', chunk_size=EXPORT_CHUNK_SIZE):
+    if direction == 'followers':
+        rows = Follow.objects.filter(userprofile_id=user.pk).order_by('user_id').values_list('user_id', 'user__username')
+    else:
+        rows = Follow.objects.filter(user=user).order_by('userprofile_id').values_list('userprofile_id', 'userprofile__user__username')
+
+    for pk, username in rows.iterator(chunk_size=chunk_size):
+        yield {'profile': pk, 'username': username}
+
+
+def export_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row) + '\n'
+
+
+def export_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['profile', 'username'])
+    for row in rows:
+        writer.writerow([row['profile'], row['username']])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    yield buffer.getvalue()
@@ -47,7 +47,15 @@ class MessageForm(forms.ModelForm):
 class ShareForm(forms.Form):
     body = forms.CharField(
         label='',
+        required=False,
         widget=forms.Textarea(attrs={
             'rows': '3',
             'placeholder': 'Say Something...'
             }))
+
+class ExploreForm(forms.Form):
+    query = forms.CharField(
+        label='',
+        widget=forms.TextInput(attrs={
+            'placeholder': 'Explore tags'
+            }))
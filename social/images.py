@@ -0,0 +1,66 @@
+from django.db.models.signals import post_save, m2m_changed
+from django.dispatch import receiver
+
+from .models import Post, Image
+from .objectcache import invalidate_objects
+from .pagecache import purge as purge_pages
+
+# Post.images is a denormalized copy of the post's Post.image rows, in attach
+# order: [{'id', 'name', 'width', 'height'}, ...]. Pages and the API render
+# galleries from it without touching the M2M, and the stored dimensions let
+# the browser lay a gallery out before the files arrive.
+IMAGE_STORAGE = Image._meta.get_field('image').storage
+
+
+def gallery(manifest):
+    return [{**entry, 'url': IMAGE_STORAGE.url(entry['name'])} for entry in manifest]
+
+
+def refresh_image_manifests(post_ids):
+    post_ids = set(post_ids)
+    if not post_ids:
+        return
+    manifests = {pk: [] for pk in post_ids}
+    rows = Post.image.through.objects.filter(post_id__in=post_ids).order_by('pk').values_list(
+        'post_id', 'image_id', 'image__image', 'image__width', 'image__height',
+    )
+    for post_id, image_id, name, width, height in rows:
+        if name:
+            manifests[post_id].append({'id': image_id, 'name': name, 'width': width, 'height': height})
+
+    for post_id, manifest in manifests.items():
+        Post.objects.filter(pk=post_id).update(images=manifest)
+    invalidate_objects(Post, post_ids)
+    purge_pages(*[f'post:{pk}' for pk in post_ids])
+
+
+def attach_images(post, files):
+    images = []
+    for f in files:
+        image = Image(image=f)
+        image.save()
+        images.append(image)
+    # One add() for the whole upload, so the manifest is rebuilt once.
+    if images:
+        post.image.add(*images)
+    return images
+
+
+@receiver(m2m_changed, sender=Post.image.through)
+def update_image_manifest(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        instance._manifest_post_ids = list(Post.image.through.objects.filter(image_id=instance.pk).values_list('post_id', flat=True))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if not reverse:
+            post_ids = [instance.pk]
+        elif action == 'post_clear':
+            post_ids = getattr(instance, '_manifest_post_ids', [])
+        else:
+            post_ids = pk_set or ()
+        refresh_image_manifests(post_ids)
+
+
+@receiver(post_save, sender=Image)
+def update_image_manifest_on_save(sender, instance, created, **kwargs):
+    if not created:
+        refresh_image_manifests(Post.image.through.objects.filter(image_id=instance.pk).values_list('post_id', flat=True))
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from social.archive import HOT_MESSAGES, SEGMENT_SIZE, archive_messages
+
+
+class Command(BaseCommand):
+    help = 'Move old direct messages out of the hot message table into compressed per-thread segments.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep', type=int, default=HOT_MESSAGES, help='Newest messages per thread to leave in place.')
+        parser.add_argument('--older-than-days', type=int, help='Only archive messages sent before this many days ago.')
+        parser.add_argument('--segment-size', type=int, default=SEGMENT_SIZE)
+        parser.add_argument('--loop', action='store_true', help='Keep running as a background worker.')
+        parser.add_argument('--sleep', type=float, default=3600, help='Seconds to wait between passes.')
+
+    def handle(self, *args, **options):
+        while True:
+            archived = archive_messages(
+                keep=options['keep'],
+                older_than_days=options['older_than_days'],
+                segment_size=options['segment_size'],
+            )
+            if archived:
+                self.stdout.write(f'Archived {archived} messages')
+
+            if not options['loop']:
+                break
+            time.sleep(options['sleep'])
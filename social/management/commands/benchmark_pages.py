@@ -0,0 +1,143 @@
+import statistics
+import time
+import tracemalloc
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.template.loader import get_template
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from social.follows import bulk_follow, followed_ids
+from social.forms import ShareForm
+from social.models import Post, Comment
+from social.rows import post_rows
+from social.views import PostListView, PostDetailView, ProfileView
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Time the feed, post detail and profile pages and feed row loading for a user, optionally against seeded data that is rolled back afterwards.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', nargs='?')
+        parser.add_argument('--post', type=int, help='Post to render for the detail page (default: newest visible post).')
+        parser.add_argument('--pages', default='feed,post,profile,rows', help='"rows" compares feed items as Post instances and as PostRow objects.')
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--seed-posts', type=int, default=0, help='Create this many posts in the feed first.')
+        parser.add_argument('--seed-comments', type=int, default=0, help='Create this many comments (half of them replies) on the detail post.')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        seeding = options['seed_posts'] or options['seed_comments']
+        if options['username']:
+            user = User.objects.filter(username=options['username']).first()
+            if user is None:
+                raise CommandError(f"No user named {options['username']}")
+        elif seeding:
+            user = User.objects.create_user('benchmark-reader')
+        else:
+            raise CommandError('Pass a username or --seed-posts/--seed-comments.')
+
+        if seeding:
+            post = self.seed(user, options['seed_posts'], options['seed_comments'])
+        else:
+            post = Post.objects.filter(is_deleted=False, repost_of__isnull=True).order_by('-pk').first()
+        if options['post']:
+            post = Post.objects.get(pk=options['post'])
+
+        pages = {
+            'feed': (PostListView, reverse('post-list'), {}),
+            'profile': (ProfileView, reverse('profile', args=[user.pk]), {'pk': user.pk}),
+        }
+        if post is not None:
+            pages['post'] = (PostDetailView, reverse('post-detail', args=[post.pk]), {'pk': post.pk})
+
+        factory = RequestFactory()
+        for name in options['pages'].split(','):
+            if name == 'rows':
+                self.compare_rows(factory, user, options['repeat'])
+                continue
+            if name not in pages:
+                self.stderr.write(f'Skipping {name}')
+                continue
+            view, path, kwargs = pages[name]
+            view = view.as_view()
+            timings = []
+            for _ in range(options['repeat']):
+                request = factory.get(path)
+                request.user = user
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    response = view(request, **kwargs)
+                    # Streamed pages do their rendering while being read.
+                    content = b''.join(response) if response.streaming else response.content
+                    timings.append((time.perf_counter() - start) * 1000)
+            self.stdout.write(
+                f'{name:8} status={response.status_code} bytes={len(content)} queries={len(queries)} '
+                f'median={statistics.median(timings):.1f}ms min={min(timings):.1f}ms'
+            )
+
+    def compare_rows(self, factory, user, repeat):
+        posts = Post.objects.filter(
+            author_id__in=followed_ids(user),
+            is_deleted=False,
+        ).exclude(repost_of__is_deleted=True)
+        loaders = {
+            'models': lambda: list(posts.select_related('repost_of')),
+            'rows': lambda: list(post_rows(posts)),
+        }
+        template = get_template('social/post_list_items.html')
+        request = factory.get(reverse('post-list'))
+        request.user = user
+
+        for name, load in loaders.items():
+            # Memory is traced in a separate pass so tracing does not skew the timings.
+            tracemalloc.start()
+            items = load()
+            retained = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            count = max(len(items), 1)
+
+            loads, renders = [], []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                items = load()
+                loads.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                template.render({'post_list': items, 'shareform': ShareForm()}, request)
+                renders.append(time.perf_counter() - start)
+            self.stdout.write(
+                f'{name:8} items={len(items)} bytes/item={retained // count} '
+                f'load/item={statistics.median(loads) / count * 1e6:.0f}us render/item={statistics.median(renders) / count * 1e6:.0f}us'
+            )
+
+    def seed(self, user, posts, comments):
+        author = User.objects.create_user('benchmark-author')
+        bulk_follow(user, [author.pk], notify=False)
+        Post.objects.bulk_create([Post(author=author, body=f'Benchmark post {i} #benchmark') for i in range(posts or 1)])
+        post = Post.objects.filter(author=author).order_by('-pk').first()
+
+        if comments:
+            parents = Comment.objects.bulk_create([
+                Comment(post=post, author=author, comment=f'Benchmark comment {i}') for i in range((comments + 1) // 2)
+            ])
+            if not parents[0].pk:
+                parents = list(Comment.objects.filter(post=post).order_by('pk'))
+            Comment.objects.bulk_create([
+                Comment(post=post, author=user, comment=f'Benchmark reply {i}', parent=parents[i % len(parents)])
+                for i in range(comments // 2)
+            ])
+        return post
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from social.follow_graph import build_snapshot, snapshot_path
+
+
+class Command(BaseCommand):
+    help = 'Write the memory-mapped follow graph snapshot that workers read follows from.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', help='Snapshot file; defaults to FOLLOW_GRAPH_PATH.')
+        parser.add_argument('--loop', action='store_true', help='Keep running as a background worker.')
+        parser.add_argument('--sleep', type=float, default=300, help='Seconds to wait between rebuilds.')
+
+    def handle(self, *args, **options):
+        path = options['path'] or snapshot_path()
+        while True:
+            started = time.monotonic()
+            nodes, edges = build_snapshot(path)
+            self.stdout.write(f'Wrote {edges} follows for {nodes} user ids to {path} in {time.monotonic() - started:.2f}s')
+
+            if not options['loop']:
+                break
+            time.sleep(options['sleep'])
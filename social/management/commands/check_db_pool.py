@@ -0,0 +1,51 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from social.dbpool.pool import pool_stats
+
+
+class Command(BaseCommand):
+    help = 'Run concurrent queries through the configured database connection and report pool metrics.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=100, help='Queries per thread.')
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        errors = []
+
+        def work():
+            # Each iteration is one "request": open, query, close (which returns
+            # the connection to the pool when the pooled backend is in use).
+            connection = connections[alias]
+            try:
+                for _ in range(options['requests']):
+                    with connection.cursor() as cursor:
+                        cursor.execute('SELECT 1')
+                    connection.close()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        start = time.monotonic()
+        threads = [threading.Thread(target=work) for _ in range(options['threads'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - start
+
+        total = options['threads'] * options['requests']
+        self.stdout.write(f"{connections[alias].settings_dict['ENGINE']}: {total} queries in {elapsed:.2f}s, {len(errors)} errors")
+        for error in errors[:5]:
+            self.stderr.write(repr(error))
+        for name, stats in pool_stats().items():
+            self.stdout.write(name)
+            for key, value in stats.items():
+                self.stdout.write(f'  {key}: {value:.4f}' if isinstance(value, float) else f'  {key}: {value}')
@@ -0,0 +1,24 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from social.follows import iter_follow_graph, export_ndjson, export_csv
+
+
+class Command(BaseCommand):
+    help = "Stream a user's follow graph as NDJSON or CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--direction', choices=['following', 'followers'], default='following')
+        parser.add_argument('--format', choices=['ndjson', 'csv'], default='ndjson')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['username']}' does not exist")
+
+        rows = iter_follow_graph(user, direction=options['direction'])
+        export = export_csv if options['format'] == 'csv' else export_ndjson
+        for chunk in export(rows):
+            self.stdout.write(chunk, ending='')
@@ -0,0 +1,21 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from social.takeout import write_takeout
+
+
+class Command(BaseCommand):
+    help = "Write a zip archive of a user's posts, comments, messages, notifications and media."
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('path')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['username']}' does not exist")
+
+        write_takeout(user, options['path'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote takeout for {user.username} to {options['path']}"))
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from social.reaction_buffer import buffer
+
+
+class Command(BaseCommand):
+    help = 'Write buffered likes and dislikes to the database. Only useful with a shared REACTION_BUFFER_STORE.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep running as a background worker.')
+        parser.add_argument('--sleep', type=float, default=1, help='Seconds to wait between flushes.')
+
+    def handle(self, *args, **options):
+        while True:
+            flushed = buffer.flush()
+            if flushed:
+                self.stdout.write(f'Flushed {flushed} reactions')
+
+            if not options['loop']:
+                break
+            time.sleep(options['sleep'])
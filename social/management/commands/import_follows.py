@@ -0,0 +1,47 @@
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from social.follows import BATCH_SIZE, chunked, resolve_targets, bulk_follow, bulk_unfollow
+
+
+class Command(BaseCommand):
+    help = 'Follow (or unfollow) a list of usernames, one per line, on behalf of a user.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('path', help="File with one username per line, or '-' for stdin.")
+        parser.add_argument('--unfollow', action='store_true')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--no-notify', action='store_true')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['username']}' does not exist")
+
+        if options['path'] == '-':
+            source = sys.stdin
+        else:
+            try:
+                source = open(options['path'])
+            except OSError as e:
+                raise CommandError(f"Cannot read {options['path']}: {e.strerror}")
+
+        batch_size = options['batch_size']
+        total = 0
+        seen = 0
+        with source:
+            usernames = (line.strip() for line in source)
+            for chunk in chunked((name for name in usernames if name), batch_size):
+                seen += len(chunk)
+                target_ids = resolve_targets(usernames=chunk, batch_size=batch_size)
+                if options['unfollow']:
+                    total += bulk_unfollow(user, target_ids, batch_size=batch_size)
+                else:
+                    total += bulk_follow(user, target_ids, batch_size=batch_size, notify=not options['no_notify'])
+
+        verb = 'Unfollowed' if options['unfollow'] else 'Followed'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {total} of {seen} listed accounts'))
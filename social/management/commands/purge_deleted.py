@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from social.purge import BATCH_SIZE, purge_deleted
+
+
+class Command(BaseCommand):
+    help = 'Physically remove soft-deleted posts, comments and accounts, along with their media, in small batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help='Keep running as a background worker.')
+        parser.add_argument('--sleep', type=float, default=30, help='Seconds to wait between passes when idle.')
+
+    def handle(self, *args, **options):
+        while True:
+            purged = purge_deleted(batch_size=options['batch_size'])
+            if purged:
+                self.stdout.write(f'Purged {purged} objects')
+
+            if not options['loop']:
+                break
+            if not purged:
+                time.sleep(options['sleep'])
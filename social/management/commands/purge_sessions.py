@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from social.purge import BATCH_SIZE, purge_sessions
+
+
+class Command(BaseCommand):
+    help = 'Delete expired sessions in small batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help='Keep running as a background worker.')
+        parser.add_argument('--sleep', type=float, default=3600, help='Seconds to wait between passes.')
+
+    def handle(self, *args, **options):
+        while True:
+            purged = purge_sessions(batch_size=options['batch_size'])
+            if purged:
+                self.stdout.write(f'Purged {purged} sessions')
+
+            if not options['loop']:
+                break
+            time.sleep(options['sleep'])
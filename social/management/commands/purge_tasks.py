@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from social.purge import BATCH_SIZE, TASK_RETENTION_DAYS, purge_tasks
+
+
+class Command(BaseCommand):
+    help = 'Delete finished and failed background tasks older than --days, in small batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=TASK_RETENTION_DAYS)
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help='Keep running as a background worker.')
+        parser.add_argument('--sleep', type=float, default=3600, help='Seconds to wait between passes.')
+
+    def handle(self, *args, **options):
+        while True:
+            purged = purge_tasks(days=options['days'], batch_size=options['batch_size'])
+            if purged:
+                self.stdout.write(f'Purged {purged} tasks')
+
+            if not options['loop']:
+                break
+            time.sleep(options['sleep'])
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from social.images import refresh_image_manifests
+from social.models import Post, Image
+
+
+class Command(BaseCommand):
+    help = 'Record image dimensions and rebuild the image manifest stored on each post.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        # Images uploaded before dimensions were recorded; reading them opens
+        # the file, so this only happens once per image.
+        field = Image._meta.get_field('image')
+        measured = 0
+        last_pk = 0
+        while True:
+            images = list(Image.objects.filter(pk__gt=last_pk, width=None).exclude(image='').exclude(image=None).order_by('pk')[:batch_size])
+            if not images:
+                break
+            last_pk = images[-1].pk
+            for image in images:
+                try:
+                    field.update_dimension_fields(image, force=True)
+                except (OSError, ValueError):
+                    continue
+            Image.objects.bulk_update(images, ['width', 'height'])
+            measured += len(images)
+
+        rebuilt = 0
+        last_pk = 0
+        while True:
+            post_ids = list(
+                Post.image.through.objects.filter(post_id__gt=last_pk).order_by('post_id')
+                .values_list('post_id', flat=True).distinct()[:batch_size]
+            )
+            if not post_ids:
+                break
+            last_pk = post_ids[-1]
+            refresh_image_manifests(post_ids)
+            rebuilt += len(post_ids)
+
+        self.stdout.write(f'Measured {measured} images, rebuilt {rebuilt} post manifests')
@@ -0,0 +1,43 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+import social.tasks  # noqa: F401 registers the task functions
+from social.queue import claim, run_task
+
+
+def _init_process():
+    # Forked children must not share the parent's database connections.
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Run queued background tasks with a thread or process pool.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--pool', choices=['thread', 'process'], default='thread')
+        parser.add_argument('--sleep', type=float, default=1, help='Seconds to wait when the queue is empty.')
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit.')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        if options['pool'] == 'process':
+            connections.close_all()
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_process)
+        else:
+            executor = ThreadPoolExecutor(max_workers=workers)
+
+        with executor:
+            while True:
+                claimed = claim(workers * 4)
+                if claimed:
+                    results = list(executor.map(run_task, claimed))
+                    self.stdout.write(f'Ran {len(results)} tasks, {results.count(False)} failed')
+                    continue
+
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
@@ -0,0 +1,41 @@
+from django.db import migrations
+
+BATCH_SIZE = 500
+
+
+def backfill_image_manifests(apps, schema_editor):
+    # Fills Post.images for posts that had images before 0021. Dimensions stay
+    # empty here because measuring them opens every file; run
+    # `manage.py rebuild_image_manifests` afterwards to record them.
+    Post = apps.get_model('social', 'Post')
+    Through = Post.image.through
+    last_pk = 0
+    while True:
+        post_ids = list(
+            Through.objects.filter(post_id__gt=last_pk).order_by('post_id')
+            .values_list('post_id', flat=True).distinct()[:BATCH_SIZE]
+        )
+        if not post_ids:
+            break
+        last_pk = post_ids[-1]
+
+        manifests = {pk: [] for pk in post_ids}
+        rows = Through.objects.filter(post_id__in=post_ids).order_by('pk').values_list(
+            'post_id', 'image_id', 'image__image', 'image__width', 'image__height',
+        )
+        for post_id, image_id, name, width, height in rows:
+            if name:
+                manifests[post_id].append({'id': image_id, 'name': name, 'width': width, 'height': height})
+        for post_id, manifest in manifests.items():
+            Post.objects.filter(pk=post_id).update(images=manifest)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0021_post_image_manifest'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_image_manifests, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+import json
+import zlib
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 100
+
+
+def index_archived_images(apps, schema_editor):
+    # Records the photos of segments written before 0023. Segments are read a
+    # batch at a time since each one holds a few hundred messages.
+    MessageArchive = apps.get_model('social', 'MessageArchive')
+    ArchivedImage = apps.get_model('social', 'ArchivedImage')
+    last_pk = 0
+    while True:
+        segments = list(MessageArchive.objects.filter(pk__gt=last_pk).order_by('pk')[:BATCH_SIZE])
+        if not segments:
+            break
+        last_pk = segments[-1].pk
+        ArchivedImage.objects.bulk_create([
+            ArchivedImage(archive_id=segment.pk, name=row['image'], sender_user_id=row['sender_user_id'], receiver_user_id=row['receiver_user_id'])
+            for segment in segments
+            for row in json.loads(zlib.decompress(bytes(segment.data)))
+            if row['image']
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('social', '0022_backfill_image_manifests'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedImage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(db_index=True, max_length=100)),
+                ('archive', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='images', to='social.messagearchive')),
+                ('receiver_user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('sender_user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(index_archived_images, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,12 @@
 from django.db import models
 from django.utils import timezone
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
+from .versions import bump_versions
+from .pagecache import purge as purge_pages
+from .objectcache import invalidate_objects
+from . import checks  # noqa: F401 (registers the startup checks)
 
 
 class Post(models.Model):
@@ -13,9 +17,19 @@ class Post(models.Model):
 	shared_on = models.DateTimeField(blank=True, null=True)
 	author = models.ForeignKey(User, on_delete=models.CASCADE)
 	shared_user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+	repost_of = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='reposts')
+	repost_count = models.PositiveIntegerField(default=0)
 	likes = models.ManyToManyField(User, blank=True, related_name='likes')
 	dislikes = models.ManyToManyField(User, blank=True, related_name='dislikes')
 	tags = models.ManyToManyField('Tag', blank=True)
+	is_deleted = models.BooleanField(default=False, db_index=True)
+	deleted_on = models.DateTimeField(blank=True, null=True)
+	# Denormalized copy of the attached images, kept by social/images.py.
+	images = models.JSONField(default=list, blank=True, editable=False)
+
+	@property
+	def gallery(self):
+		return images.gallery(self.images)
 
 	def create_tags(self):
 		for word in self.body.split():
@@ -43,6 +57,9 @@ class Post(models.Model):
 
 	class Meta:
 		ordering = ['-created_on', '-shared_on']
+		indexes = [
+			models.Index(fields=['author', 'id'], name='social_post_author_id_idx'),
+		]
 
 class Comment(models.Model):
  	comment = models.TextField()
@@ -53,11 +70,13 @@ class Comment(models.Model):
  	dislikes = models.ManyToManyField(User, blank=True, related_name='comment_dislikes')
  	parent = models.ForeignKey('self', on_delete=models.CASCADE, blank=True, null=True, related_name='+')
  	tags = models.ManyToManyField('Tag', blank=True)
+ 	is_deleted = models.BooleanField(default=False, db_index=True)
+ 	deleted_on = models.DateTimeField(blank=True, null=True)
 
  	def create_tags(self):
  		for word in self.comment.split():
  			if (word[0] == '#'):
- 				tag = Tag.objects.get(name=word[1:])
+ 				tag = Tag.objects.filter(name=word[1:]).first()
  				if tag:
  					self.tags.add(tag.pk)
  				else:
@@ -68,7 +87,7 @@ class Comment(models.Model):
 
  	@property
  	def children(self):
- 		return Comment.objects.filter(parent=self).order_by('-created_on').all()
+ 		return Comment.objects.filter(parent=self, is_deleted=False).order_by('-created_on').all()
 
  	@property
  	def is_parent(self):
@@ -84,15 +103,74 @@ class UserProfile(models.Model):
 	location = models.CharField(max_length=100, blank=True, null=True)
 	picture = models.ImageField(upload_to='uploads/profile_pictures', default='uploads/profile_pictures/default.png', blank=True)
 	followers = models.ManyToManyField(User, blank=True, related_name='followers')
+	is_deleted = models.BooleanField(default=False, db_index=True)
+	updated_on = models.DateTimeField(auto_now=True)
+
+def invalidate_user_summary(user_id):
+	# summaries imports this module, so import it when the signal fires.
+	from .summaries import invalidate_user_summary
+	invalidate_user_summary(user_id)
 
 @receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
+def create_user_profile(sender, instance, created, update_fields, **kwargs):
 	if created:
 		UserProfile.objects.create(user=instance)
+	elif update_fields is None or 'username' in update_fields:
+		invalidate_user_summary(instance.pk)
+		purge_pages('users', f'user:{instance.pk}')
 
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-	instance.profile.save()
+@receiver(post_save, sender=UserProfile)
+def bump_profile_version(sender, instance, created, **kwargs):
+	# Covers admin and shell edits as well as ProfileEditView.
+	invalidate_user_summary(instance.pk)
+	bump_versions(f'user:{instance.pk}')
+	purge_pages(f'user:{instance.pk}', *(['users'] if created else []))
+
+@receiver(m2m_changed, sender=UserProfile.followers.through)
+def bump_follow_version(sender, instance, action, reverse, pk_set, **kwargs):
+	if action == 'pre_clear':
+		# post_clear has no pk_set, so remember who is about to be removed.
+		field, column = ('user_id', 'userprofile_id') if reverse else ('userprofile_id', 'user_id')
+		instance._cleared_follow_ids = set(sender.objects.filter(**{field: instance.pk}).values_list(column, flat=True))
+	elif action == 'post_clear':
+		pk_set = instance.__dict__.pop('_cleared_follow_ids', set())
+	if action.startswith('post_'):
+		if reverse:
+			profile_ids, follower_ids = pk_set or (), [instance.pk]
+		else:
+			profile_ids, follower_ids = [instance.pk], pk_set or ()
+		bump_versions(*[f'user:{pk}' for pk in profile_ids], *[f'following:{pk}' for pk in follower_ids])
+		purge_pages(*[f'user:{pk}' for pk in profile_ids])
+
+@receiver(m2m_changed, sender=UserProfile.followers.through)
+def record_follow_events(sender, instance, action, reverse, pk_set, **kwargs):
+	# bulk_follow() and bulk_unfollow() log their own events; this covers
+	# followers.add/remove/clear/set from the admin, forms and the shell.
+	from .follow_graph import record
+	if action in ('post_add', 'post_remove'):
+		pairs = [(instance.pk, pk) for pk in pk_set] if reverse else [(pk, instance.pk) for pk in pk_set]
+		record(pairs, action == 'post_add')
+	elif action == 'pre_clear':
+		follows = sender.objects.filter(**{'user_id' if reverse else 'userprofile_id': instance.pk})
+		record(follows.values_list('user_id', 'userprofile_id'), False)
+
+@receiver(post_save, sender=Post)
+def bump_post_version(sender, instance, created, **kwargs):
+	bump_versions(f'user:{instance.author_id}')
+	purge_pages(f'post:{instance.pk}', *([f'author:{instance.author_id}', 'posts'] if created else []))
+
+@receiver(m2m_changed, sender=Post.likes.through)
+@receiver(m2m_changed, sender=Post.dislikes.through)
+def bump_reaction_version(sender, instance, action, reverse, pk_set, **kwargs):
+	if action.startswith('post_'):
+		if reverse:
+			author_ids = Post.objects.filter(pk__in=pk_set or ()).values_list('author_id', flat=True)
+			post_ids = pk_set or ()
+		else:
+			author_ids = [instance.author_id]
+			post_ids = [instance.pk]
+		bump_versions(*[f'user:{pk}' for pk in set(author_ids)])
+		purge_pages(*[f'post:{pk}' for pk in post_ids])
 
 class Notification(models.Model):
 	# 1 = Like, 2 = Comment, 3 = Follow, #4 = DM
@@ -105,6 +183,12 @@ class Notification(models.Model):
 	date = models.DateTimeField(default=timezone.now)
 	user_has_seen = models.BooleanField(default=False)
 
+	class Meta:
+		indexes = [
+			models.Index(fields=['to_user', 'user_has_seen'], name='social_notif_unread_idx'),
+			models.Index(fields=['user_has_seen', 'date'], name='social_notif_retention_idx'),
+		]
+
 class ThreadModel(models.Model):
 	user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
 	receiver = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
@@ -118,8 +202,103 @@ class MessageModel(models.Model):
 	date = models.DateTimeField(default=timezone.now)
 	is_read = models.BooleanField(default=False)
 
+	class Meta:
+		indexes = [
+			models.Index(fields=['thread', 'id'], name='social_message_thread_id_idx'),
+		]
+
+class MessageArchive(models.Model):
+	# A run of consecutive messages from one thread, moved out of MessageModel
+	# and stored as zlib-compressed JSON rows (see social/archive.py).
+	thread = models.ForeignKey('ThreadModel', related_name='+', on_delete=models.CASCADE)
+	first_message_id = models.PositiveIntegerField()
+	last_message_id = models.PositiveIntegerField()
+	first_date = models.DateTimeField()
+	last_date = models.DateTimeField()
+	count = models.PositiveIntegerField()
+	data = models.BinaryField()
+
+	class Meta:
+		indexes = [
+			models.Index(fields=['thread', 'first_message_id'], name='social_msgarchive_thread_idx'),
+		]
+
+class ArchivedImage(models.Model):
+	# The photos inside a MessageArchive segment, so media access checks and
+	# account purges find them without decompressing the segment.
+	archive = models.ForeignKey('MessageArchive', related_name='images', on_delete=models.CASCADE)
+	name = models.CharField(max_length=100, db_index=True)
+	sender_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+	receiver_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+
 class Image(models.Model):
-	image = models.ImageField(upload_to='uploads/post_photos', blank=True, null=True)
+	image = models.ImageField(upload_to='uploads/post_photos', blank=True, null=True, width_field='width', height_field='height')
+	width = models.PositiveIntegerField(blank=True, null=True)
+	height = models.PositiveIntegerField(blank=True, null=True)
 
 class Tag(models.Model):
-	name = models.CharField(max_length=255)
\ No newline at end of file
+	name = models.CharField(max_length=255)
+
+class Task(models.Model):
+	PENDING = 'pending'
+	RUNNING = 'running'
+	DONE = 'done'
+	FAILED = 'failed'
+	STATUS_CHOICES = [(PENDING, 'Pending'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+	name = models.CharField(max_length=100)
+	args = models.JSONField(default=list, blank=True)
+	kwargs = models.JSONField(default=dict, blank=True)
+	idempotency_key = models.CharField(max_length=255, unique=True, blank=True, null=True)
+	status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+	attempts = models.PositiveIntegerField(default=0)
+	max_attempts = models.PositiveIntegerField(default=3)
+	run_after = models.DateTimeField(default=timezone.now)
+	last_error = models.TextField(blank=True)
+	created_on = models.DateTimeField(default=timezone.now)
+	updated_on = models.DateTimeField(auto_now=True)
+
+	class Meta:
+		indexes = [
+			models.Index(fields=['status', 'run_after'], name='social_task_status_run_idx'),
+		]
+
+class FollowEvent(models.Model):
+	# Append-only log of follows/unfollows since the last follow graph
+	# snapshot (see social/follow_graph.py). Plain ids, so purging an account
+	# keeps the unfollow events that describe it.
+	follower_id = models.PositiveIntegerField()
+	followee_id = models.PositiveIntegerField()
+	followed = models.BooleanField()
+	created_on = models.DateTimeField(default=timezone.now, db_index=True)
+
+@receiver(post_save, sender=Tag)
+def purge_tag_pages(sender, instance, created, **kwargs):
+	if created:
+		purge_pages('tags')
+
+@receiver(m2m_changed, sender=Post.tags.through)
+@receiver(m2m_changed, sender=Post.image.through)
+def purge_post_relation_pages(sender, instance, action, reverse, pk_set, **kwargs):
+	if action.startswith('post_'):
+		if reverse:
+			post_ids, related_ids = pk_set or (), [instance.pk]
+		else:
+			post_ids, related_ids = [instance.pk], pk_set or ()
+		keys = [f'post:{pk}' for pk in post_ids]
+		if sender is Post.tags.through:
+			keys += [f'tag:{pk}' for pk in related_ids]
+		purge_pages(*keys)
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=UserProfile)
+@receiver(post_save, sender=ThreadModel)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=UserProfile)
+@receiver(post_delete, sender=ThreadModel)
+@receiver(post_delete, sender=User)
+def invalidate_cached_object(sender, instance, **kwargs):
+	invalidate_objects(sender, [instance.pk])
+
+from . import images  # noqa: E402 (registers the image manifest receivers)
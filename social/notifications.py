@@ -0,0 +1,82 @@
+import datetime
+from collections import Counter
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Notification
+from .versions import bump_versions, get_versions
+
+UNREAD_TIMEOUT = 60 * 60
+RETENTION_DAYS = 30
+MENU_SIZE = 20
+
+
+def _unread_key(user_id):
+    return f'notifications-unread:{user_id}'
+
+
+def unread_notifications(user_id):
+    return Notification.objects.filter(to_user_id=user_id, user_has_seen=False).exclude(
+        post__is_deleted=True,
+    ).exclude(comment__is_deleted=True)
+
+
+def unread_count(user_id):
+    key = _unread_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        # A notify() or mark_seen() landing while we count finds no counter to
+        # adjust; its version bump tells us this count may be short, so it is
+        # returned but not stored.
+        version = get_versions([f'notifications:{user_id}'])
+        count = unread_notifications(user_id).count()
+        if get_versions([f'notifications:{user_id}']) == version:
+            cache.add(key, count, UNREAD_TIMEOUT)
+    return count
+
+
+def _adjust_unread(counts):
+    # Only counters that are already cached are adjusted; a missing one is
+    # recounted from the table the next time it is read.
+    for user_id, delta in counts.items():
+        key = _unread_key(user_id)
+        try:
+            if cache.incr(key, delta) < 0:
+                cache.delete(key)
+        except ValueError:
+            pass
+        bump_versions(f'notifications:{user_id}', content=False)
+
+
+def reset_unread(user_ids):
+    user_ids = set(user_ids)
+    cache.delete_many([_unread_key(user_id) for user_id in user_ids])
+    for user_id in user_ids:
+        bump_versions(f'notifications:{user_id}', content=False)
+
+
+def notify(**fields):
+    notification = Notification.objects.create(**fields)
+    if notification.to_user_id:
+        _adjust_unread({notification.to_user_id: 1})
+    return notification
+
+
+def notify_many(notifications):
+    Notification.objects.bulk_create(notifications)
+    _adjust_unread(Counter(n.to_user_id for n in notifications if n.to_user_id))
+
+
+def mark_seen(user, notification_ids):
+    if not user.is_authenticated:
+        return 0
+    seen = Notification.objects.filter(pk__in=notification_ids, to_user=user, user_has_seen=False).update(user_has_seen=True)
+    if seen:
+        _adjust_unread({user.pk: -seen})
+    return seen
+
+
+def expired_notifications(days=RETENTION_DAYS):
+    cutoff = timezone.now() - datetime.timedelta(days=days)
+    return Notification.objects.filter(user_has_seen=True, date__lt=cutoff)
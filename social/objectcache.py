@@ -0,0 +1,94 @@
+import time
+
+from django.core.cache import cache
+from django.http import Http404
+
+# Read-through cache of whole model instances by primary key, for the hot
+# Post/UserProfile/ThreadModel lookups at the top of most views. Each object
+# has a version counter; post_save/post_delete receivers in models.py bump it,
+# and so must any queryset.update() that touches cached fields.
+OBJECT_TIMEOUT = 60 * 60
+
+
+def _label(model):
+    return model._meta.label_lower
+
+
+def _version_key(model, pk):
+    return f'object-version:{_label(model)}:{pk}'
+
+
+def _object_key(model, pk, version):
+    return f'object:{_label(model)}:{pk}:{version}'
+
+
+def _new_version():
+    # A missing counter starts from the current time, as in versions.py, so an
+    # evicted counter never falls back to a version whose entries are cached.
+    return int(time.time() * 1000)
+
+
+def read_through(ids, version_key, entry_key, load, timeout):
+    # Versioned read-through shared with the user summaries: each id has a
+    # version counter and its entry is cached under the current version.
+    # load(missing_ids) returns {id: value} for the ids that exist.
+    versions = cache.get_many([version_key(id_) for id_ in ids])
+    for id_ in ids:
+        key = version_key(id_)
+        if key not in versions:
+            cache.add(key, _new_version(), timeout=None)
+            versions[key] = cache.get(key)
+    keys = {id_: entry_key(id_, versions[version_key(id_)]) for id_ in ids}
+    cached = cache.get_many(list(keys.values()))
+
+    values = {id_: cached[key] for id_, key in keys.items() if key in cached}
+    missing = [id_ for id_ in ids if id_ not in values]
+    if missing:
+        fresh = load(missing)
+        values.update(fresh)
+        cache.set_many({keys[id_]: value for id_, value in fresh.items()}, timeout)
+    return values
+
+
+def bump_version(key):
+    # Bumping the version orphans every cached copy, including one a
+    # concurrent reader may be about to write back with stale data.
+    if cache.add(key, _new_version(), timeout=None):
+        return
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_version(), timeout=None)
+
+
+def get_objects(model, pks):
+    pks = {int(pk) for pk in pks if pk is not None}
+    if not pks:
+        return {}
+    return read_through(
+        pks,
+        lambda pk: _version_key(model, pk),
+        lambda pk, version: _object_key(model, pk, version),
+        lambda missing: {obj.pk: obj for obj in model.objects.filter(pk__in=missing)},
+        OBJECT_TIMEOUT,
+    )
+
+
+def get_object(model, pk, **fields):
+    # Like model.objects.get(pk=pk, **fields) for plain field values.
+    obj = next(iter(get_objects(model, [pk]).values()), None)
+    if obj is None or any(getattr(obj, name) != value for name, value in fields.items()):
+        raise model.DoesNotExist(f'{model.__name__} matching query does not exist.')
+    return obj
+
+
+def get_object_or_404(model, pk, **fields):
+    try:
+        return get_object(model, pk, **fields)
+    except model.DoesNotExist:
+        raise Http404(f'No {model._meta.object_name} matches the given query.')
+
+
+def invalidate_objects(model, pks):
+    for pk in set(pks):
+        bump_version(_version_key(model, pk))
@@ -0,0 +1,153 @@
+import hashlib
+import logging
+import re
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from django.utils.module_loading import import_string
+
+# Full responses for logged-out visitors, tagged with surrogate keys:
+#   user:{id}    a profile: username, picture, details and follower count
+#   author:{id}  which posts a user has written or shared
+#   post:{id}    a post's body, images, counters and deletion
+#   tag:{id}     which posts carry a tag
+#   posts, users, tags  "a new one exists", for listings that could gain it
+# purge() stamps each key with the time it was purged, and a cached page is
+# only served while every one of its keys was last purged before the page
+# started rendering, so a change that lands mid-render is never cached for
+# good. Each purge is also handed to the callables in PAGE_CACHE_PURGERS so
+# a reverse proxy can drop the same Surrogate-Key tags.
+CSRF_PLACEHOLDER = '__page_cache_csrf_token__'
+CSRF_INPUT_RE = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]+(")')
+SKIPPED_HEADERS = {'set-cookie', 'x-page-cache'}
+
+logger = logging.getLogger(__name__)
+
+
+def _cache():
+    return caches[getattr(settings, 'PAGE_CACHE', 'default')]
+
+
+def _now():
+    return int(time.time() * 1000)
+
+
+def _mark(key):
+    return f'page-cache-purged:{key}'
+
+
+def add_surrogate_keys(request, *keys):
+    request._surrogate_keys = getattr(request, '_surrogate_keys', set()) | set(keys)
+
+
+def post_keys(posts):
+    # Keys for a page of Post objects or PostRows, including what each repost points at.
+    keys = set()
+    for post in posts:
+        keys.update((f'post:{post.pk}', f'user:{post.author_id}'))
+        if post.repost_of_id:
+            keys.update((f'post:{post.repost_of_id}', f'user:{post.repost_of.author_id}'))
+    return keys
+
+
+def purge(*keys):
+    keys = set(keys)
+    if not keys:
+        return
+    now = _now()
+    _cache().set_many({_mark(key): now for key in keys}, timeout=None)
+    for path in getattr(settings, 'PAGE_CACHE_PURGERS', []):
+        try:
+            import_string(path)(sorted(keys))
+        except Exception:
+            logger.exception('Page cache purger %s failed', path)
+
+
+def _cacheable(request):
+    if not getattr(settings, 'PAGE_CACHE_ENABLED', True):
+        return False
+    if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+        return False
+    # A pending flash message is rendered once and must not be cached.
+    return 'messages' not in request.COOKIES
+
+
+def _entry_key(request):
+    url = request.build_absolute_uri()
+    return 'page-cache:' + hashlib.md5(url.encode()).hexdigest()
+
+
+def _fresh(keys, started):
+    # A mark that was evicted is treated as a purge we cannot date.
+    marks = _cache().get_many([_mark(key) for key in keys])
+    return len(marks) == len(keys) and max(marks.values()) < started
+
+
+def _store(request, response, started):
+    keys = sorted(getattr(request, '_surrogate_keys', ()))
+    if response.status_code != 200 or response.streaming or not keys:
+        return
+    timeout = getattr(settings, 'PAGE_CACHE_TIMEOUT', 600)
+    response['Surrogate-Key'] = ' '.join(keys)
+    response['Surrogate-Control'] = f'max-age={timeout}'
+    cache = _cache()
+    for key in keys:
+        cache.add(_mark(key), started - 1, timeout=None)
+    if not _fresh(keys, started):
+        return
+
+    # The CSRF token belongs to this visitor; the copy gets a placeholder that
+    # is swapped for the next visitor's own token on every hit.
+    content = CSRF_INPUT_RE.sub(rf'\g<1>{CSRF_PLACEHOLDER}\g<2>', response.content.decode(response.charset))
+    entry = {
+        'content': content,
+        'headers': [(name, value) for name, value in response.items() if name.lower() not in SKIPPED_HEADERS],
+        'keys': keys,
+        'started': started,
+    }
+    cache.set(_entry_key(request), entry, timeout)
+
+
+def _fetch(request):
+    entry = _cache().get(_entry_key(request))
+    if entry is None or not _fresh(entry['keys'], entry['started']):
+        return None
+
+    content = entry['content']
+    if CSRF_PLACEHOLDER in content:
+        content = content.replace(CSRF_PLACEHOLDER, get_token(request))
+    response = HttpResponse(content)
+    for name, value in entry['headers']:
+        response[name] = value
+    response['X-Page-Cache'] = 'hit'
+    return get_conditional_response(
+        request,
+        etag=response.get('ETag'),
+        last_modified=parse_http_date_safe(response.get('Last-Modified', '')),
+        response=response,
+    )
+
+
+def anonymous_page_cache(view_func):
+    # Put this outside conditional_view so a hit skips the stamp queries too.
+    # The view reports what it rendered through add_surrogate_keys(); pages
+    # that report nothing are not cached.
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not _cacheable(request):
+            return view_func(request, *args, **kwargs)
+
+        response = _fetch(request)
+        if response is None:
+            started = _now()
+            response = view_func(request, *args, **kwargs)
+            _store(request, response, started)
+            response['X-Page-Cache'] = 'miss'
+        return response
+    return wrapper
@@ -0,0 +1,218 @@
+import datetime
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore as DatabaseSessionStore
+from django.db import transaction
+from django.db.models import Q, F, Count
+from django.utils import timezone
+
+from .models import Post, Comment, UserProfile, Notification, ThreadModel, MessageModel, MessageArchive, ArchivedImage, Image, Task
+from .follow_graph import record as record_follows
+from .pagecache import purge as purge_pages
+from .objectcache import invalidate_objects
+from .notifications import reset_unread, expired_notifications, RETENTION_DAYS
+from .versions import bump_versions
+
+BATCH_SIZE = 500
+TASK_RETENTION_DAYS = 7
+DEFAULT_PICTURE = UserProfile._meta.get_field('picture').default
+
+
+def soft_delete_post(post):
+    updated = Post.objects.filter(pk=post.pk, is_deleted=False).update(is_deleted=True, deleted_on=timezone.now())
+    if updated:
+        reset_unread(Notification.objects.filter(post_id=post.pk, user_has_seen=False).values_list('to_user_id', flat=True))
+    if updated and post.repost_of_id:
+        Post.objects.filter(pk=post.repost_of_id).update(repost_count=F('repost_count') - 1)
+        invalidate_objects(Post, [post.repost_of_id])
+        bump_versions(f'user:{post.repost_of.author_id}')
+    bump_versions(f'user:{post.author_id}')
+    invalidate_objects(Post, [post.pk])
+    purge_pages(f'post:{post.pk}', *([f'post:{post.repost_of_id}'] if post.repost_of_id else []))
+
+
+def _with_replies(comments):
+    # pks of the comments and of every reply below them, at any depth.
+    ids = set(comments.values_list('pk', flat=True))
+    level = ids
+    while level:
+        level = set(Comment.objects.filter(parent_id__in=level).values_list('pk', flat=True)) - ids
+        ids |= level
+    return sorted(ids)
+
+
+def soft_delete_comments(comments, batch_size=BATCH_SIZE):
+    # A deleted comment takes its replies with it, whoever wrote them.
+    now = timezone.now()
+    ids = _with_replies(comments)
+    for start in range(0, len(ids), batch_size):
+        batch = ids[start:start + batch_size]
+        Comment.objects.filter(pk__in=batch, is_deleted=False).update(is_deleted=True, deleted_on=now)
+        reset_unread(Notification.objects.filter(comment_id__in=batch, user_has_seen=False).values_list('to_user_id', flat=True))
+
+
+def soft_delete_comment(comment):
+    soft_delete_comments(Comment.objects.filter(pk=comment.pk))
+
+
+def soft_delete_account(user):
+    now = timezone.now()
+    User.objects.filter(pk=user.pk).update(is_active=False)
+    UserProfile.objects.filter(pk=user.pk).update(is_deleted=True)
+    posts = Post.objects.filter(Q(author=user) | Q(shared_user=user), is_deleted=False)
+    reposted = posts.filter(repost_of__isnull=False).values('repost_of', 'repost_of__author_id').annotate(n=Count('pk')).order_by()
+    for row in reposted:
+        Post.objects.filter(pk=row['repost_of']).update(repost_count=F('repost_count') - row['n'])
+        bump_versions(f"user:{row['repost_of__author_id']}")
+        purge_pages(f"post:{row['repost_of']}")
+        invalidate_objects(Post, [row['repost_of']])
+    post_ids = list(posts.values_list('pk', flat=True))
+    posts.update(is_deleted=True, deleted_on=now)
+    soft_delete_comments(Comment.objects.filter(author=user))
+    unread = Notification.objects.filter(Q(post__author=user) | Q(comment__author=user), user_has_seen=False)
+    reset_unread(unread.values_list('to_user_id', flat=True).distinct())
+    # Their follower lists stop showing this user.
+    followed = list(UserProfile.followers.through.objects.filter(user_id=user.pk).values_list('userprofile_id', flat=True))
+    bump_versions(f'user:{user.pk}', *[f'user:{pk}' for pk in followed])
+    purge_pages('users', f'user:{user.pk}', *[f'user:{pk}' for pk in followed], *[f'post:{pk}' for pk in post_ids])
+    invalidate_objects(User, [user.pk])
+    invalidate_objects(UserProfile, [user.pk])
+    invalidate_objects(Post, post_ids)
+
+
+def delete_in_batches(queryset, batch_size=BATCH_SIZE):
+    model = queryset.model
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += model.objects.filter(pk__in=ids).delete()[0]
+
+
+def _delete_files(field_name, queryset, batch_size=BATCH_SIZE):
+    for name in queryset.values_list(field_name, flat=True).iterator(chunk_size=batch_size):
+        if name and name != DEFAULT_PICTURE:
+            queryset.model._meta.get_field(field_name).storage.delete(name)
+
+
+def purge_comments(comments, batch_size=BATCH_SIZE):
+    # Replies are purged explicitly before their parent, whoever wrote them,
+    # so deleting a parent never cascades into rows we have not cleaned up.
+    while True:
+        ids = list(comments.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            break
+        purge_comments(Comment.objects.filter(parent_id__in=ids), batch_size)
+        delete_in_batches(Notification.objects.filter(comment_id__in=ids), batch_size)
+        for through in (Comment.likes.through, Comment.dislikes.through, Comment.tags.through):
+            through.objects.filter(comment_id__in=ids).delete()
+        Comment.objects.filter(pk__in=ids).delete()
+
+
+def purge_orphan_images(image_ids, batch_size=BATCH_SIZE):
+    orphans = Image.objects.filter(pk__in=image_ids, post__isnull=True)
+    _delete_files('image', orphans, batch_size)
+    delete_in_batches(orphans, batch_size)
+
+
+def purge_post(post_id, batch_size=BATCH_SIZE):
+    while True:
+        reposts = list(Post.objects.filter(repost_of_id=post_id).values_list('pk', flat=True)[:batch_size])
+        if not reposts:
+            break
+        for pk in reposts:
+            purge_post(pk, batch_size)
+
+    purge_comments(Comment.objects.filter(post_id=post_id), batch_size)
+    delete_in_batches(Notification.objects.filter(post_id=post_id), batch_size)
+
+    for through in (Post.likes.through, Post.dislikes.through, Post.tags.through):
+        delete_in_batches(through.objects.filter(post_id=post_id), batch_size)
+
+    image_ids = list(Post.image.through.objects.filter(post_id=post_id).values_list('image_id', flat=True))
+    Post.image.through.objects.filter(post_id=post_id).delete()
+    purge_orphan_images(image_ids, batch_size)
+
+    Post.objects.filter(pk=post_id).delete()
+
+
+def purge_account(user_id, batch_size=BATCH_SIZE):
+    if Post.objects.filter(Q(author_id=user_id) | Q(shared_user_id=user_id)).exists():
+        return False
+
+    purge_comments(Comment.objects.filter(author_id=user_id), batch_size)
+    delete_in_batches(Notification.objects.filter(Q(to_user_id=user_id) | Q(from_user_id=user_id)), batch_size)
+
+    messages = MessageModel.objects.filter(Q(sender_user_id=user_id) | Q(receiver_user_id=user_id))
+    _delete_files('image', messages.exclude(image='').exclude(image=None), batch_size)
+    delete_in_batches(messages, batch_size)
+
+    threads = ThreadModel.objects.filter(Q(user_id=user_id) | Q(receiver_id=user_id))
+    image_storage = MessageModel._meta.get_field('image').storage
+    names = ArchivedImage.objects.filter(archive__thread__in=threads).values_list('name', flat=True)
+    for name in names.iterator(chunk_size=batch_size):
+        image_storage.delete(name)
+    delete_in_batches(MessageArchive.objects.filter(thread__in=threads), batch_size)
+    delete_in_batches(threads, batch_size)
+
+    Follow = UserProfile.followers.through
+    follows = Follow.objects.filter(Q(user_id=user_id) | Q(userprofile_id=user_id))
+    while True:
+        rows = list(follows.values_list('pk', 'user_id', 'userprofile_id')[:batch_size])
+        if not rows:
+            break
+        with transaction.atomic():
+            Follow.objects.filter(pk__in=[pk for pk, _, _ in rows]).delete()
+            record_follows([(follower_id, followee_id) for _, follower_id, followee_id in rows], False)
+    for through in (Post.likes.through, Post.dislikes.through):
+        delete_in_batches(through.objects.filter(user_id=user_id), batch_size)
+    for through in (Comment.likes.through, Comment.dislikes.through):
+        delete_in_batches(through.objects.filter(user_id=user_id), batch_size)
+
+    _delete_files('picture', UserProfile.objects.filter(pk=user_id), batch_size)
+    User.objects.filter(pk=user_id).delete()
+    return True
+
+
+def purge_deleted(batch_size=BATCH_SIZE):
+    purged = 0
+
+    for pk in list(Post.objects.filter(is_deleted=True).values_list('pk', flat=True)[:batch_size]):
+        purge_post(pk, batch_size)
+        purged += 1
+
+    comments = list(Comment.objects.filter(is_deleted=True).values_list('pk', flat=True)[:batch_size])
+    if comments:
+        purge_comments(Comment.objects.filter(pk__in=comments), batch_size)
+        purged += len(comments)
+
+    for pk in list(UserProfile.objects.filter(is_deleted=True).values_list('pk', flat=True)[:batch_size]):
+        if purge_account(pk, batch_size):
+            purged += 1
+
+    return purged
+
+
+def purge_notifications(days=RETENTION_DAYS, batch_size=BATCH_SIZE):
+    return delete_in_batches(expired_notifications(days), batch_size)
+
+
+def purge_tasks(days=TASK_RETENTION_DAYS, batch_size=BATCH_SIZE):
+    # Finished rows only back the idempotency keys; a key older than this is
+    # not going to be enqueued again.
+    cutoff = timezone.now() - datetime.timedelta(days=days)
+    return delete_in_batches(Task.objects.filter(status__in=[Task.DONE, Task.FAILED], updated_on__lt=cutoff), batch_size)
+
+
+def purge_sessions(batch_size=BATCH_SIZE):
+    # Database-backed engines (db, cached_db) are cleared in batches; cached
+    # copies expire on their own. Other engines clean up after themselves or,
+    # like signed cookies, store nothing.
+    store = import_module(settings.SESSION_ENGINE).SessionStore
+    if not issubclass(store, DatabaseSessionStore):
+        store.clear_expired()
+        return 0
+    return delete_in_batches(store.get_model_class().objects.filter(expire_date__lt=timezone.now()), batch_size)
@@ -0,0 +1,91 @@
+import datetime
+import threading
+import traceback
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .models import Task
+
+registry = {}
+
+RETRY_BASE_DELAY = 5
+STALE_AFTER = datetime.timedelta(minutes=15)
+HEARTBEAT_INTERVAL = STALE_AFTER / 3
+
+
+def task(func):
+    registry[func.__name__] = func
+    func.delay = lambda *args, **kwargs: enqueue(func.__name__, *args, **kwargs)
+    return func
+
+
+def enqueue(name, *args, idempotency_key=None, max_attempts=3, **kwargs):
+    if name not in registry:
+        raise KeyError(f"Unknown task '{name}'")
+
+    if getattr(settings, 'TASKS_EAGER', False):
+        return registry[name](*args, **kwargs)
+
+    try:
+        with transaction.atomic():
+            return Task.objects.create(
+                name=name, args=list(args), kwargs=kwargs, idempotency_key=idempotency_key, max_attempts=max_attempts,
+            )
+    except IntegrityError:
+        # Same idempotency key already queued or run.
+        return None
+
+
+def claim(limit):
+    now = timezone.now()
+    Task.objects.filter(status=Task.RUNNING, updated_on__lt=now - STALE_AFTER).update(status=Task.PENDING)
+
+    candidates = Task.objects.filter(status=Task.PENDING, run_after__lte=now).order_by('pk').values_list('pk', flat=True)[:limit]
+    # Claiming is a conditional UPDATE, so competing workers never run the same row.
+    # update() skips auto_now, so updated_on is set here; otherwise a task queued
+    # more than STALE_AFTER ago would be reset by the next claim() while it runs.
+    claimed = Task.objects.filter(status=Task.PENDING)
+    return [pk for pk in candidates if claimed.filter(pk=pk).update(status=Task.RUNNING, updated_on=now) == 1]
+
+
+def _heartbeat(pk, stop):
+    # Keeps a long task's updated_on fresh so claim() does not hand it to
+    # another worker while it is still running.
+    try:
+        while not stop.wait(HEARTBEAT_INTERVAL.total_seconds()):
+            Task.objects.filter(pk=pk, status=Task.RUNNING).update(updated_on=timezone.now())
+    finally:
+        connection.close()
+
+
+def run_task(pk):
+    close_old_connections()
+    stop = None
+    try:
+        job = Task.objects.get(pk=pk)
+        func = registry[job.name]
+        stop = threading.Event()
+        threading.Thread(target=_heartbeat, args=(pk, stop), daemon=True).start()
+        try:
+            func(*job.args, **job.kwargs)
+        except Exception:
+            job.attempts += 1
+            job.last_error = traceback.format_exc()
+            if job.attempts >= job.max_attempts:
+                job.status = Task.FAILED
+            else:
+                job.status = Task.PENDING
+                job.run_after = timezone.now() + datetime.timedelta(seconds=RETRY_BASE_DELAY * 2 ** job.attempts)
+            job.save(update_fields=['attempts', 'last_error', 'status', 'run_after', 'updated_on'])
+            return False
+
+        job.attempts += 1
+        job.status = Task.DONE
+        job.save(update_fields=['attempts', 'status', 'updated_on'])
+        return True
+    finally:
+        if stop is not None:
+            stop.set()
+        close_old_connections()
@@ -0,0 +1,136 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.module_loading import import_string
+
+# scope: (bucket capacity, tokens refilled per second)
+DEFAULT_RATE_LIMITS = {
+    'like': (30, 0.5),
+    'comment': (10, 0.2),
+    'share': (10, 0.1),
+    'message': (20, 0.5),
+    'follow': (20, 0.2),
+}
+
+
+class LocalStore:
+    # Buckets live in this process only, so each worker enforces its own budget.
+    # A bucket that has refilled is the same as a missing one, so every
+    # SWEEP_INTERVAL seconds the full ones are dropped; memory follows the
+    # number of recently active users and IPs, not every one ever seen.
+    SWEEP_INTERVAL = 60
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.counters = {}
+        self.swept_at = 0
+
+    def take(self, key, capacity, rate, now):
+        with self.lock:
+            if now - self.swept_at >= self.SWEEP_INTERVAL:
+                self.sweep(now)
+            tokens, last, _ = self.buckets.get(key, (capacity, now, now))
+            tokens = min(capacity, tokens + (now - last) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self.buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+            return allowed, tokens
+
+    def sweep(self, now):
+        self.buckets = {key: bucket for key, bucket in self.buckets.items() if bucket[2] > now}
+        self.swept_at = now
+
+    def incr(self, counter):
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + 1
+
+    def counts(self, counters):
+        with self.lock:
+            return {counter: self.counters.get(counter, 0) for counter in counters}
+
+
+class CacheStore:
+    # Shares buckets through a Django cache, e.g. a local Redis, so limits hold
+    # across workers. Bucket updates are last-write-wins, which can let a
+    # burst through by a token or two but never blocks on a lock.
+    def __init__(self, alias=None):
+        self.cache = caches[alias or getattr(settings, 'RATE_LIMIT_CACHE', 'default')]
+
+    def take(self, key, capacity, rate, now):
+        tokens, last = self.cache.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - last) * rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self.cache.set(key, (tokens, now), timeout=int(capacity / rate) + 1)
+        return allowed, tokens
+
+    def incr(self, counter):
+        self.cache.add(counter, 0, timeout=None)
+        try:
+            self.cache.incr(counter)
+        except ValueError:
+            self.cache.set(counter, 1, timeout=None)
+
+    def counts(self, counters):
+        values = self.cache.get_many(counters)
+        return {counter: values.get(counter, 0) for counter in counters}
+
+
+class RateLimiter:
+    def __init__(self, store=None, limits=None):
+        self.store = store
+        self.limits = limits
+
+    def get_store(self):
+        if self.store is None:
+            self.store = import_string(getattr(settings, 'RATE_LIMIT_STORE', 'social.ratelimit.LocalStore'))()
+        return self.store
+
+    def get_limits(self):
+        if self.limits is None:
+            self.limits = {**DEFAULT_RATE_LIMITS, **getattr(settings, 'RATE_LIMITS', {})}
+        return self.limits
+
+    def allow(self, scope, ident):
+        capacity, rate = self.get_limits()[scope]
+        store = self.get_store()
+        allowed, tokens = store.take(f'ratelimit:{scope}:{ident}', capacity, rate, time.time())
+        store.incr(f'ratelimit-stats:{scope}:{"hit" if allowed else "deny"}')
+        return allowed, 0 if allowed else int((1 - tokens) / rate) + 1
+
+    def stats(self):
+        counters = [f'ratelimit-stats:{scope}:{kind}' for scope in self.get_limits() for kind in ('hit', 'deny')]
+        counts = self.get_store().counts(counters)
+        return {
+            scope: {kind: counts[f'ratelimit-stats:{scope}:{kind}'] for kind in ('hit', 'deny')}
+            for scope in self.get_limits()
+        }
+
+
+limiter = RateLimiter()
+
+
+class RateLimitMixin:
+    rate_limit_scope = None
+    rate_limit_methods = ('POST',)
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method in self.rate_limit_methods and getattr(settings, 'RATE_LIMIT_ENABLED', True):
+            if request.user.is_authenticated:
+                ident = f'user:{request.user.pk}'
+            else:
+                ident = f"ip:{request.META.get('REMOTE_ADDR')}"
+
+            allowed, retry_after = limiter.allow(self.rate_limit_scope, ident)
+            if not allowed:
+                response = HttpResponse('Too many requests', content_type='text/plain', status=429)
+                response['Retry-After'] = str(retry_after)
+                return response
+
+        return super().dispatch(request, *args, **kwargs)
@@ -0,0 +1,299 @@
+import atexit
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+from .models import Post, Comment, Notification
+from .notifications import notify_many
+from .pagecache import purge as purge_pages
+from .versions import bump_versions
+
+# target: (model, likes through, dislikes through, through field)
+TARGETS = {
+    'post': (Post, Post.likes.through, Post.dislikes.through, 'post_id'),
+    'comment': (Comment, Comment.likes.through, Comment.dislikes.through, 'comment_id'),
+}
+DIRTY_KEY = 'reaction-buffer:dirty'
+
+logger = logging.getLogger(__name__)
+
+
+def _key(target, obj_id):
+    return f'reaction-buffer:{target}:{obj_id}'
+
+
+class LocalStore:
+    # Buffers toggles in this process only; each worker flushes its own, so a
+    # worker that is killed loses up to REACTION_FLUSH_INTERVAL of toggles.
+    # Fine for development; production uses CacheStore plus flush_reactions.
+    def __init__(self):
+        self.mutex = threading.RLock()
+        self.data = {}
+
+    @contextmanager
+    def lock(self, name):
+        with self.mutex:
+            yield
+
+    def get_many(self, keys):
+        with self.mutex:
+            return {key: self.data[key] for key in keys if key in self.data}
+
+    def set(self, key, value):
+        with self.mutex:
+            self.data[key] = value
+
+    def delete(self, key):
+        with self.mutex:
+            self.data.pop(key, None)
+
+
+class CacheStore:
+    # Shares the buffer between workers through a Django cache such as a local
+    # Redis, so a user's toggles collapse no matter which worker served them.
+    # Locks are cache.add() keys that expire on their own if a worker dies.
+    lock_timeout = 5
+
+    def __init__(self, alias=None):
+        self.cache = caches[alias or getattr(settings, 'REACTION_BUFFER_CACHE', 'default')]
+
+    @contextmanager
+    def lock(self, name):
+        key = f'{name}:lock'
+        while not self.cache.add(key, 1, self.lock_timeout):
+            time.sleep(0.001)
+        try:
+            yield
+        finally:
+            self.cache.delete(key)
+
+    def get_many(self, keys):
+        return self.cache.get_many(keys)
+
+    def set(self, key, value):
+        self.cache.set(key, value, timeout=None)
+
+    def delete(self, key):
+        self.cache.delete(key)
+
+
+class ReactionBuffer:
+    # Each buffered object maps user_id -> (base, desired), where base is the
+    # reaction the database holds (or will hold once the in-flight batch
+    # lands) and desired is 'like', 'dislike' or None. Repeated toggles only
+    # rewrite desired, and an entry that returns to its base is dropped, so a
+    # flush writes one net change per (user, object).
+    def __init__(self, store=None):
+        self.store = store
+        self.flusher = None
+        self.flusher_lock = threading.Lock()
+
+    def get_store(self):
+        if self.store is None:
+            self.store = import_string(getattr(settings, 'REACTION_BUFFER_STORE', 'social.reaction_buffer.LocalStore'))()
+        return self.store
+
+    def _db_state(self, target, obj_id, user_id):
+        model, likes, dislikes, field = TARGETS[target]
+        if likes.objects.filter(**{field: obj_id}, user_id=user_id).exists():
+            return 'like'
+        if dislikes.objects.filter(**{field: obj_id}, user_id=user_id).exists():
+            return 'dislike'
+        return None
+
+    def _entries(self, target, obj_ids):
+        keys = [_key(target, obj_id) for obj_id in obj_ids]
+        found = self.get_store().get_many(keys + [key + ':inflight' for key in keys])
+        merged = {}
+        for obj_id, key in zip(obj_ids, keys):
+            entries = {**found.get(key + ':inflight', {}), **found.get(key, {})}
+            if entries:
+                merged[obj_id] = entries
+        return merged
+
+    def _current(self, target, obj_id, user_id):
+        key = _key(target, obj_id)
+        found = self.get_store().get_many([key, key + ':inflight'])
+        if user_id in found.get(key, {}):
+            return found[key][user_id]
+        if user_id in found.get(key + ':inflight', {}):
+            desired = found[key + ':inflight'][user_id][1]
+            return desired, desired
+        return None
+
+    def toggle(self, target, obj, user_id, kind):
+        store = self.get_store()
+        key = _key(target, obj.pk)
+        # Look the database up before taking the lock; it is only needed the
+        # first time a user touches this object within a flush window.
+        db_state = missing = object()
+        if self._current(target, obj.pk, user_id) is None:
+            db_state = self._db_state(target, obj.pk, user_id)
+
+        with store.lock(key):
+            current = self._current(target, obj.pk, user_id)
+            if current is None:
+                if db_state is missing:
+                    db_state = self._db_state(target, obj.pk, user_id)
+                current = (db_state, db_state)
+            base, state = current
+            desired = None if state == kind else kind
+
+            pending = dict(store.get_many([key]).get(key, {}))
+            was_empty = not pending
+            if desired == base:
+                pending.pop(user_id, None)
+            else:
+                pending[user_id] = (base, desired)
+            store.set(key, pending)
+
+        if was_empty and pending:
+            with store.lock(DIRTY_KEY):
+                dirty = store.get_many([DIRTY_KEY]).get(DIRTY_KEY, frozenset())
+                store.set(DIRTY_KEY, dirty | {(target, obj.pk)})
+
+        if target == 'post':
+            bump_versions(f'user:{obj.author_id}')
+            purge_pages(f'post:{obj.pk}')
+        self.start_flusher()
+        return desired
+
+    def state(self, target, obj_ids, user_id):
+        # user_id's buffered reaction per object, for objects that have one.
+        return {
+            obj_id: entries[user_id][1]
+            for obj_id, entries in self._entries(target, obj_ids).items()
+            if user_id in entries
+        }
+
+    def deltas(self, target, obj_ids):
+        # Net (likes, dislikes) still waiting to be written, per object.
+        deltas = {}
+        for obj_id, entries in self._entries(target, obj_ids).items():
+            likes = dislikes = 0
+            for base, desired in entries.values():
+                likes += (desired == 'like') - (base == 'like')
+                dislikes += (desired == 'dislike') - (base == 'dislike')
+            deltas[obj_id] = (likes, dislikes)
+        return deltas
+
+    def flush(self):
+        store = self.get_store()
+        with store.lock(DIRTY_KEY):
+            dirty = store.get_many([DIRTY_KEY]).get(DIRTY_KEY, frozenset())
+            store.delete(DIRTY_KEY)
+
+        batch = {}
+        for target, obj_id in sorted(dirty):
+            key = _key(target, obj_id)
+            with store.lock(key):
+                pending = store.get_many([key]).get(key, {})
+                store.set(key + ':inflight', pending)
+                store.delete(key)
+            if pending:
+                batch.setdefault(target, {})[obj_id] = pending
+
+        if not dirty:
+            return 0
+        try:
+            with transaction.atomic():
+                for target, changes in batch.items():
+                    self._apply(target, changes)
+        except Exception:
+            self._restore(batch)
+            raise
+        finally:
+            for target, obj_id in dirty:
+                store.delete(_key(target, obj_id) + ':inflight')
+
+        return sum(len(pending) for changes in batch.values() for pending in changes.values())
+
+    def _restore(self, batch):
+        # Put a failed batch back under whatever was toggled since.
+        store = self.get_store()
+        for target, changes in batch.items():
+            for obj_id, failed in changes.items():
+                key = _key(target, obj_id)
+                with store.lock(key):
+                    pending = store.get_many([key]).get(key, {})
+                    merged = dict(failed)
+                    for user_id, (base, desired) in pending.items():
+                        merged[user_id] = (failed[user_id][0], desired) if user_id in failed else (base, desired)
+                    store.set(key, {user_id: entry for user_id, entry in merged.items() if entry[0] != entry[1]})
+                with store.lock(DIRTY_KEY):
+                    dirty = store.get_many([DIRTY_KEY]).get(DIRTY_KEY, frozenset())
+                    store.set(DIRTY_KEY, dirty | {(target, obj_id)})
+
+    def _apply(self, target, changes):
+        model, likes, dislikes, field = TARGETS[target]
+        post_field = 'pk' if target == 'post' else 'post_id'
+        objects = model.objects.filter(pk__in=list(changes), is_deleted=False).values_list('pk', 'author_id', post_field)
+        authors, post_ids = {}, set()
+        for obj_id, author_id, post_id in objects:
+            authors[obj_id] = author_id
+            post_ids.add(post_id)
+        rows = {'like': [], 'dislike': []}
+        notifications = []
+
+        for obj_id, entries in changes.items():
+            if obj_id not in authors:
+                continue
+            user_ids = list(entries)
+            likes.objects.filter(**{field: obj_id}, user_id__in=user_ids).delete()
+            dislikes.objects.filter(**{field: obj_id}, user_id__in=user_ids).delete()
+            for user_id, (base, desired) in entries.items():
+                if desired:
+                    rows[desired].append(likes(**{field: obj_id}, user_id=user_id) if desired == 'like' else dislikes(**{field: obj_id}, user_id=user_id))
+                if desired == 'like' and base != 'like':
+                    notifications.append(Notification(notification_type=1, from_user_id=user_id, to_user_id=authors[obj_id], **{field: obj_id}))
+
+        likes.objects.bulk_create(rows['like'], ignore_conflicts=True)
+        dislikes.objects.bulk_create(rows['dislike'], ignore_conflicts=True)
+        if notifications:
+            notify_many(notifications)
+        if target == 'post':
+            bump_versions(*{f'user:{author_id}' for author_id in authors.values()})
+        # toggle() purged the pages too, but a copy cached since then still
+        # shows the counts from before this batch.
+        purge_pages(*[f'post:{post_id}' for post_id in post_ids])
+
+    def start_flusher(self):
+        # Background flush every REACTION_FLUSH_INTERVAL seconds in this
+        # process, plus a final one at exit. `manage.py flush_reactions`
+        # drains a shared CacheStore from outside the web workers.
+        if self.flusher is not None and self.flusher.is_alive():
+            return
+        with self.flusher_lock:
+            if self.flusher is not None and self.flusher.is_alive():
+                return
+            self.flusher = threading.Thread(target=self._flush_loop, name='reaction-buffer-flush', daemon=True)
+            self.flusher.start()
+
+    def _flush_loop(self):
+        interval = getattr(settings, 'REACTION_FLUSH_INTERVAL', 1.0)
+        while True:
+            time.sleep(interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Flushing buffered reactions failed')
+            finally:
+                connection.close()
+
+
+buffer = ReactionBuffer()
+
+
+@atexit.register
+def _flush_at_exit():
+    if buffer.store is not None:
+        try:
+            buffer.flush()
+        except Exception:
+            logger.exception('Flushing buffered reactions at exit failed')
@@ -0,0 +1,86 @@
+from django.conf import settings
+from django.db.models import Count
+
+from .models import Post, Comment
+from .notifications import notify
+from .pagecache import purge as purge_pages
+from .reaction_buffer import TARGETS, buffer
+from .versions import bump_versions
+
+
+def buffering():
+    return getattr(settings, 'REACTION_BUFFER_ENABLED', True)
+
+
+def toggle_reaction(through, field, obj, user, kind):
+    # Works on the through tables directly: one DELETE for the opposite
+    # reaction, one DELETE or INSERT for this one, no m2m instance loading.
+    Likes, Dislikes = through
+    target, opposite = (Likes, Dislikes) if kind == 'like' else (Dislikes, Likes)
+    lookup = {field: obj.pk, 'user_id': user.pk}
+
+    opposite.objects.filter(**lookup).delete()
+    removed = target.objects.filter(**lookup).delete()[0]
+    if not removed:
+        target.objects.create(**lookup)
+    return not removed
+
+
+def toggle_post_reaction(post, user, kind):
+    # With the write-behind buffer on, the toggle is recorded in memory (or
+    # the shared cache) and written, with its notification, on the next flush.
+    if buffering():
+        return buffer.toggle('post', post, user.pk, kind) == kind
+    added = toggle_reaction((Post.likes.through, Post.dislikes.through), 'post_id', post, user, kind)
+    if added and kind == 'like':
+        notify(notification_type=1, from_user=user, to_user_id=post.author_id, post=post)
+    bump_versions(f'user:{post.author_id}')
+    purge_pages(f'post:{post.pk}')
+    return added
+
+
+def toggle_comment_reaction(comment, user, kind):
+    if buffering():
+        return buffer.toggle('comment', comment, user.pk, kind) == kind
+    added = toggle_reaction((Comment.likes.through, Comment.dislikes.through), 'comment_id', comment, user, kind)
+    if added and kind == 'like':
+        notify(notification_type=1, from_user=user, to_user_id=comment.author_id, comment=comment)
+    return added
+
+
+def _counts(through, field, ids):
+    rows = through.objects.filter(**{f'{field}__in': ids}).values(field).annotate(n=Count('pk')).order_by()
+    return {row[field]: row['n'] for row in rows}
+
+
+def reaction_summary(target, obj_ids, user):
+    # Like/dislike counts and the viewer's own reaction for a page of posts or
+    # comments in four queries, with buffered toggles merged in.
+    model, likes, dislikes, field = TARGETS[target]
+    obj_ids = list(set(obj_ids))
+    like_counts = _counts(likes, field, obj_ids)
+    dislike_counts = _counts(dislikes, field, obj_ids)
+
+    mine = {}
+    if user.is_authenticated:
+        for obj_id in dislikes.objects.filter(**{f'{field}__in': obj_ids}, user_id=user.pk).values_list(field, flat=True):
+            mine[obj_id] = 'dislike'
+        for obj_id in likes.objects.filter(**{f'{field}__in': obj_ids}, user_id=user.pk).values_list(field, flat=True):
+            mine[obj_id] = 'like'
+
+    if buffering():
+        for obj_id, (liked, disliked) in buffer.deltas(target, obj_ids).items():
+            like_counts[obj_id] = like_counts.get(obj_id, 0) + liked
+            dislike_counts[obj_id] = dislike_counts.get(obj_id, 0) + disliked
+        if user.is_authenticated:
+            mine.update(buffer.state(target, obj_ids, user.pk))
+
+    return {
+        obj_id: {
+            'likes': like_counts.get(obj_id, 0),
+            'dislikes': dislike_counts.get(obj_id, 0),
+            'liked': mine.get(obj_id) == 'like',
+            'disliked': mine.get(obj_id) == 'dislike',
+        }
+        for obj_id in obj_ids
+    }
@@ -0,0 +1,52 @@
+from .images import gallery
+
+# Post lists (feed, profile, explore) render from PostRow objects built out of
+# a single values_list() query instead of Post instances. A row carries only
+# the columns the list templates read, and a repost carries its original as
+# a second row. Anything else a template asks for resolves to nothing, so
+# add the field here when a list template starts using it.
+POST_FIELDS = (
+    'pk', 'author_id', 'created_on', 'body', 'images', 'repost_count',
+    'repost_of_id', 'shared_user_id', 'shared_body', 'shared_on',
+)
+ORIGINAL_FIELDS = ('author_id', 'created_on', 'body', 'images', 'repost_count')
+
+
+class PostRow:
+    __slots__ = POST_FIELDS + ('repost_of',)
+
+    def __init__(self, pk, author_id, created_on, body, images, repost_count,
+                 repost_of_id=None, shared_user_id=None, shared_body=None, shared_on=None, repost_of=None):
+        self.pk = pk
+        self.author_id = author_id
+        self.created_on = created_on
+        self.body = body
+        self.images = images
+        self.repost_count = repost_count
+        self.repost_of_id = repost_of_id
+        self.shared_user_id = shared_user_id
+        self.shared_body = shared_body
+        self.shared_on = shared_on
+        self.repost_of = repost_of
+
+    @property
+    def gallery(self):
+        return gallery(self.images)
+
+    def __repr__(self):
+        return f'<PostRow {self.pk}>'
+
+
+def post_rows(posts, chunk_size=None):
+    # posts is a Post queryset; with chunk_size the rows are read from a
+    # server-side cursor instead of all at once.
+    rows = posts.values_list(*POST_FIELDS, *[f'repost_of__{name}' for name in ORIGINAL_FIELDS])
+    if chunk_size:
+        rows = rows.iterator(chunk_size=chunk_size)
+    split = len(POST_FIELDS)
+    repost_of_id = POST_FIELDS.index('repost_of_id')
+    for values in rows:
+        repost_of = None
+        if values[repost_of_id]:
+            repost_of = PostRow(values[repost_of_id], *values[split:])
+        yield PostRow(*values[:split], repost_of=repost_of)
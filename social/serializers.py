@@ -0,0 +1,110 @@
+from .images import gallery
+from .models import MessageModel
+from .reactions import reaction_summary
+from .summaries import get_user_summaries
+
+MESSAGE_IMAGE_STORAGE = MessageModel._meta.get_field('image').storage
+
+POST_FIELDS = (
+    'pk', 'body', 'created_on', 'author_id', 'shared_body', 'shared_on', 'repost_of_id', 'repost_count', 'images',
+    'repost_of__body', 'repost_of__created_on', 'repost_of__author_id', 'repost_of__repost_count',
+    'repost_of__images',
+)
+COMMENT_FIELDS = ('pk', 'comment', 'created_on', 'author_id', 'parent_id')
+MESSAGE_FIELDS = ('pk', 'body', 'image', 'date', 'sender_user_id', 'receiver_user_id', 'is_read')
+
+
+def _author(summaries, user_id):
+    summary = summaries.get(user_id)
+    if summary is None:
+        return None
+    return {'id': user_id, 'username': summary['username'], 'picture': summary['picture_url']}
+
+
+def serialize_posts(rows, user):
+    # rows come from Post.objects.values(*POST_FIELDS). Reactions and authors
+    # are looked up for the whole page at once, keyed by the original
+    # post so a repost shows the same counters as what it points at.
+    rows = list(rows)
+    if not rows:
+        return []
+
+    content_ids = [row['repost_of_id'] or row['pk'] for row in rows]
+    reactions = reaction_summary('post', content_ids, user)
+
+    summaries = get_user_summaries([row['author_id'] for row in rows] + [row['repost_of__author_id'] for row in rows])
+
+    data = []
+    for row, content_id in zip(rows, content_ids):
+        if row['repost_of_id']:
+            content = {
+                'id': content_id,
+                'body': row['repost_of__body'],
+                'created_on': row['repost_of__created_on'],
+                'author': _author(summaries, row['repost_of__author_id']),
+                'repost_count': row['repost_of__repost_count'],
+                'images': row['repost_of__images'],
+            }
+        else:
+            content = {
+                'id': content_id,
+                'body': row['body'],
+                'created_on': row['created_on'],
+                'author': _author(summaries, row['author_id']),
+                'repost_count': row['repost_count'],
+                'images': row['images'],
+            }
+        content['images'] = [image['url'] for image in gallery(content['images'] or [])]
+        content.update(reactions[content_id])
+        data.append({
+            'id': row['pk'],
+            'created_on': row['created_on'],
+            'shared_by': _author(summaries, row['author_id']) if row['repost_of_id'] or row['shared_body'] else None,
+            'shared_body': row['shared_body'],
+            'shared_on': row['shared_on'],
+            'post': content,
+        })
+    return data
+
+
+def serialize_comment_tree(rows, user):
+    rows = list(rows)
+    ids = [row['pk'] for row in rows]
+    reactions = reaction_summary('comment', ids, user)
+    summaries = get_user_summaries(row['author_id'] for row in rows)
+
+    nodes = {}
+    roots = []
+    for row in rows:
+        nodes[row['pk']] = {
+            'id': row['pk'],
+            'comment': row['comment'],
+            'created_on': row['created_on'],
+            'author': _author(summaries, row['author_id']),
+            'likes': reactions[row['pk']]['likes'],
+            'dislikes': reactions[row['pk']]['dislikes'],
+            'liked': reactions[row['pk']]['liked'],
+            'replies': [],
+        }
+    for row in rows:
+        parent = nodes.get(row['parent_id'])
+        if parent is not None:
+            parent['replies'].append(nodes[row['pk']])
+        elif row['parent_id'] is None:
+            roots.append(nodes[row['pk']])
+    return roots
+
+
+def serialize_messages(rows):
+    return [
+        {
+            'id': row['pk'],
+            'body': row['body'],
+            'image': MESSAGE_IMAGE_STORAGE.url(row['image']) if row['image'] else None,
+            'date': row['date'],
+            'sender': row['sender_user_id'],
+            'receiver': row['receiver_user_id'],
+            'is_read': row['is_read'],
+        }
+        for row in rows
+    ]
@@ -0,0 +1,93 @@
+import uuid
+import zlib
+from itertools import islice
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.middleware.csrf import get_token
+from django.middleware.gzip import GZipMiddleware, re_accepts_gzip
+from django.template.loader import get_template
+from django.utils.cache import patch_vary_headers
+from django.utils.decorators import decorator_from_middleware
+from django.utils.safestring import mark_safe
+
+# Long pages are sent as a stream: the page template is rendered up front with
+# {{ stream_marker }} where its items go, the part before the marker is sent
+# straight away, then each chunk of items is rendered through a partial
+# template as it is read, then the rest of the page. Only one chunk of model
+# instances is held at a time. Page templates include the same partial for
+# the whole list when streaming is off.
+
+
+def stream_chunk_size():
+    return getattr(settings, 'STREAM_CHUNK_SIZE', 20)
+
+
+def streaming_enabled():
+    return getattr(settings, 'STREAMING_PAGES', True)
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def stream_template(request, template_name, context, partial_name, chunks):
+    # chunks yields context dicts for partial_name, e.g. {'post_list': [...]};
+    # it is only consumed while the response is being sent.
+    marker = mark_safe(f'<!-- stream:{uuid.uuid4().hex} -->')
+    page = get_template(template_name).render({**context, 'stream_marker': marker}, request)
+    head, tail = page.split(marker, 1)
+    # Middleware only sees the response before the first chunk is rendered,
+    # so anything the chunks need from it has to be settled here.
+    get_token(request)
+    partial = get_template(partial_name)
+
+    def render():
+        yield head
+        for chunk in chunks:
+            yield partial.render({**context, **chunk}, request)
+        yield tail
+
+    return StreamingHttpResponse(render())
+
+
+def compress_stream(sequence):
+    # Django's compress_sequence() only yields what zlib lets out, which for a
+    # page is nothing until its buffer fills, so the whole feed would arrive
+    # at once. A sync flush after every chunk sends each one as it is made,
+    # at the cost of a few bytes per chunk.
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for item in sequence:
+        data = compressor.compress(item) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class StreamingGZipMiddleware(GZipMiddleware):
+    def process_response(self, request, response):
+        if not response.streaming:
+            return super().process_response(request, response)
+        if response.has_header('Content-Encoding'):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if not re_accepts_gzip.search(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+            return response
+
+        response.streaming_content = compress_stream(response.streaming_content)
+        del response['Content-Length']
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = 'gzip'
+        return response
+
+
+# gzip_page for views that may stream.
+gzip_stream = decorator_from_middleware(StreamingGZipMiddleware)
@@ -0,0 +1,39 @@
+from .models import UserProfile
+from .objectcache import read_through, bump_version
+
+SUMMARY_TIMEOUT = 60 * 60
+PICTURE_STORAGE = UserProfile._meta.get_field('picture').storage
+
+
+def _version_key(user_id):
+    return f'user-summary-version:{user_id}'
+
+
+def _summary_key(user_id, version):
+    return f'user-summary:{user_id}:{version}'
+
+
+def _load_summaries(user_ids):
+    summaries = {}
+    for row in UserProfile.objects.filter(pk__in=user_ids).values('pk', 'user__username', 'picture'):
+        summaries[row['pk']] = {
+            'profile': row['pk'],
+            'username': row['user__username'],
+            'picture_url': PICTURE_STORAGE.url(row['picture']) if row['picture'] else '',
+        }
+    return summaries
+
+
+def get_user_summaries(user_ids):
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return {}
+    return read_through(user_ids, _version_key, _summary_key, _load_summaries, SUMMARY_TIMEOUT)
+
+
+def get_user_summary(user_id):
+    return get_user_summaries([user_id]).get(user_id)
+
+
+def invalidate_user_summary(user_id):
+    bump_version(_version_key(user_id))
@@ -0,0 +1,119 @@
+import json
+import zipfile
+
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+from .models import Post, Comment, UserProfile, Notification, ThreadModel, MessageModel, Image
+from .archive import iter_archived_messages
+
+CHUNK_SIZE = 500
+FLUSH_SIZE = 64 * 1024
+FILE_CHUNK_SIZE = 64 * 1024
+DEFAULT_PICTURE = UserProfile._meta.get_field('picture').default
+
+
+class ZipStream:
+    # Write-only file object handed to ZipFile. It has no seek(), so ZipFile
+    # writes data descriptors and everything can be sent as it is produced.
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        self.size = 0
+        return data
+
+
+def _sections(user):
+    yield 'profile.ndjson', UserProfile.objects.filter(user=user).values(
+        'user__username', 'user__email', 'user__date_joined', 'name', 'bio', 'birth_date', 'location', 'picture',
+    )
+    yield 'following.ndjson', UserProfile.objects.filter(followers=user).values('pk', 'user__username')
+    yield 'posts.ndjson', Post.objects.filter(Q(author=user) | Q(shared_user=user)).values(
+        'pk', 'body', 'shared_body', 'created_on', 'shared_on', 'author__username', 'shared_user__username',
+    )
+    yield 'comments.ndjson', Comment.objects.filter(author=user).values(
+        'pk', 'post_id', 'parent_id', 'comment', 'created_on',
+    )
+    yield 'messages.ndjson', MessageModel.objects.filter(Q(sender_user=user) | Q(receiver_user=user)).values(
+        'pk', 'thread_id', 'sender_user__username', 'receiver_user__username', 'body', 'image', 'date', 'is_read',
+    )
+    yield 'notifications.ndjson', Notification.objects.filter(to_user=user).values(
+        'pk', 'notification_type', 'from_user__username', 'post_id', 'comment_id', 'thread_id', 'date', 'user_has_seen',
+    )
+
+
+def _media(user):
+    picture = UserProfile.objects.filter(user=user).values_list('picture', flat=True).first()
+    if picture and picture != DEFAULT_PICTURE:
+        yield picture
+
+    images = Image.objects.filter(post__author=user).exclude(image='').exclude(image=None).distinct()
+    yield from images.values_list('image', flat=True).order_by('pk').iterator(chunk_size=CHUNK_SIZE)
+
+    photos = MessageModel.objects.filter(sender_user=user).exclude(image='').exclude(image=None)
+    yield from photos.values_list('image', flat=True).order_by('pk').iterator(chunk_size=CHUNK_SIZE)
+
+    for row in _archived_messages(user):
+        if row['image'] and row['sender_user_id'] == user.pk:
+            yield row['image']
+
+
+def _archived_messages(user):
+    threads = ThreadModel.objects.filter(Q(user=user) | Q(receiver=user)).values_list('pk', flat=True)
+    return iter_archived_messages(threads)
+
+
+def iter_takeout(user, chunk_size=CHUNK_SIZE):
+    stream = ZipStream()
+
+    with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, rows in _sections(user):
+            with archive.open(name, 'w', force_zip64=True) as entry:
+                for row in rows.order_by('pk').iterator(chunk_size=chunk_size):
+                    entry.write((json.dumps(row, cls=DjangoJSONEncoder) + '\n').encode())
+                    if stream.size >= FLUSH_SIZE:
+                        yield stream.pop()
+            yield stream.pop()
+
+        with archive.open('archived_messages.ndjson', 'w', force_zip64=True) as entry:
+            for row in _archived_messages(user):
+                entry.write((json.dumps(row, cls=DjangoJSONEncoder) + '\n').encode())
+                if stream.size >= FLUSH_SIZE:
+                    yield stream.pop()
+        yield stream.pop()
+
+        for name in _media(user):
+            if not default_storage.exists(name):
+                continue
+            with default_storage.open(name) as source, archive.open(f'media/{name}', 'w', force_zip64=True) as entry:
+                for chunk in iter(lambda: source.read(FILE_CHUNK_SIZE), b''):
+                    entry.write(chunk)
+                    if stream.size >= FLUSH_SIZE:
+                        yield stream.pop()
+            yield stream.pop()
+
+    yield stream.pop()
+
+
+def write_takeout(user, path):
+    with open(path, 'wb') as f:
+        for chunk in iter_takeout(user):
+            f.write(chunk)
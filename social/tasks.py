@@ -0,0 +1,29 @@
+from .models import Post, Comment
+from .notifications import notify
+from .queue import task
+
+
+@task
+def create_post_tags(post_id):
+    post = Post.objects.filter(pk=post_id).first()
+    if post is not None:
+        post.create_tags()
+
+
+@task
+def create_comment_tags(comment_id):
+    comment = Comment.objects.filter(pk=comment_id).first()
+    if comment is not None:
+        comment.create_tags()
+
+
+@task
+def create_notification(notification_type, from_user_id, to_user_id, post_id=None, comment_id=None, thread_id=None):
+    notify(
+        notification_type=notification_type,
+        from_user_id=from_user_id,
+        to_user_id=to_user_id,
+        post_id=post_id,
+        comment_id=comment_id,
+        thread_id=thread_id,
+    )
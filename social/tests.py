@@ -0,0 +1,928 @@
+import datetime
+import importlib
+import io
+import json
+import os
+import tempfile
+import time
+import zipfile
+import zlib
+from unittest import mock
+
+from django.apps import apps
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.http import Http404
+from django.urls import reverse
+from django.utils import timezone
+
+from social.admin import estimated_count
+from social.auth import get_user
+from social.api import MAX_NEW_POSTS
+from social.archive import archive_thread, get_messages
+from social.checks import check_slow_settings
+from social.dbpool.pool import ConnectionPool, PoolTimeout
+from social.files import MediaFileView, is_private_media
+from social.follow_graph import FollowGraph, build_snapshot
+from social.follows import followed_ids, bulk_follow, bulk_unfollow
+from social.notifications import notify, mark_seen, unread_count, unread_notifications
+from social.objectcache import get_objects
+from social.models import Post, Comment, Task, ThreadModel, MessageModel, MessageArchive, ArchivedImage, Notification, FollowEvent, Image
+from social.ratelimit import LocalStore, limiter
+from social import reaction_buffer
+from social.purge import soft_delete_account, soft_delete_post, purge_deleted, purge_tasks, purge_notifications, purge_sessions
+from social.queue import claim, run_task, _heartbeat, enqueue, STALE_AFTER
+from social.streaming import compress_stream
+from social.rows import PostRow, post_rows
+from social.summaries import get_user_summaries
+from socialnetwork import settings as base_settings, settings_production
+
+
+def make_users(*usernames):
+    return [User.objects.create_user(username, password='password') for username in usernames]
+
+
+class SocialTestCase(TestCase):
+    # Cached summaries, versions and follow lists are keyed by pk, which the
+    # next test reuses, so every test starts from empty caches.
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+
+
+class BulkFollowTests(SocialTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice, self.bob, self.carol = make_users('alice', 'bob', 'carol')
+        self.client.force_login(self.alice)
+
+    def post_json(self, data):
+        return self.client.post(reverse('bulk-follow'), json.dumps(data), content_type='application/json')
+
+    def test_follow_and_unfollow_by_username_and_profile(self):
+        response = self.post_json({'usernames': ['bob'], 'profiles': [self.carol.pk]})
+        self.assertEqual(response.json(), {'followed': 2})
+        self.assertEqual(sorted(followed_ids(self.alice)), sorted([self.bob.pk, self.carol.pk]))
+
+        response = self.post_json({'usernames': ['bob'], 'action': 'unfollow'})
+        self.assertEqual(response.json(), {'unfollowed': 1})
+        self.assertEqual(list(followed_ids(self.alice)), [self.carol.pk])
+
+    def test_rejects_malformed_bodies(self):
+        for data in ([], 3, {'usernames': 'bob'}, {'usernames': [1]}, {'profiles': 'x'}, {'profiles': [None]}, {'profiles': ['x']}):
+            with self.subTest(data=data):
+                self.assertEqual(self.post_json(data).status_code, 400)
+        self.assertEqual(list(followed_ids(self.alice)), [])
+
+    def test_import_follows_reports_unreadable_file(self):
+        with self.assertRaises(CommandError):
+            call_command('import_follows', 'alice', '/nonexistent/follows.txt')
+
+
+class TakeoutTests(SocialTestCase):
+    def test_archive_contains_only_the_users_data(self):
+        alice, bob = make_users('alice', 'bob')
+        Post.objects.create(author=alice, body='mine')
+        Post.objects.create(author=bob, body='theirs')
+        self.client.force_login(alice)
+
+        response = self.client.get(reverse('takeout'))
+        self.assertTrue(response.streaming)
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        posts = [json.loads(line) for line in archive.read('posts.ndjson').decode().splitlines()]
+        self.assertEqual([post['body'] for post in posts], ['mine'])
+        self.assertIn('profile.ndjson', archive.namelist())
+
+
+class SoftDeleteTests(SocialTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice, self.bob, self.carol = make_users('alice', 'bob', 'carol')
+        self.post = Post.objects.create(author=self.alice, body='hello')
+        self.comment = Comment.objects.create(post=self.post, author=self.alice, comment='first')
+        self.reply = Comment.objects.create(post=self.post, author=self.bob, comment='bob-reply', parent=self.comment)
+        self.answer = Comment.objects.create(post=self.post, author=self.carol, comment='carol-answer', parent=self.reply)
+
+    def test_account_deletion_hides_replies_in_other_threads(self):
+        soft_delete_account(self.bob)
+        self.assertEqual(
+            set(Comment.objects.filter(is_deleted=True).values_list('pk', flat=True)),
+            {self.reply.pk, self.answer.pk},
+        )
+        self.client.force_login(self.alice)
+        page = self.client.get(reverse('post-detail', args=[self.post.pk])).content.decode()
+        self.assertIn('first', page)
+        self.assertNotIn('bob-reply', page)
+        self.assertNotIn('carol-answer', page)
+
+    def test_purge_deletes_reply_trees_explicitly(self):
+        self.answer.likes.add(self.alice)
+        self.client.force_login(self.alice)
+        self.client.post(reverse('comment-delete', args=[self.post.pk, self.comment.pk]))
+        self.assertEqual(Comment.objects.filter(is_deleted=False).count(), 0)
+
+        purge_deleted()
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(Comment.likes.through.objects.exists())
+
+    def test_deleted_posts_cannot_be_edited(self):
+        soft_delete_post(self.post)
+        self.client.force_login(self.alice)
+        response = self.client.post(reverse('post-edit', args=[self.post.pk]), {'body': 'edited'})
+        self.assertEqual(response.status_code, 404)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.body, 'hello')
+
+    def test_deleted_profiles_are_hidden(self):
+        bulk_follow(self.bob, [self.alice.pk])
+        soft_delete_account(self.bob)
+        self.client.force_login(self.carol)
+        for name in ('profile', 'list-followers'):
+            with self.subTest(name=name):
+                self.assertEqual(self.client.get(reverse(name, args=[self.bob.pk])).status_code, 404)
+        search = self.client.get(reverse('profile-search'), {'query': 'bob'})
+        self.assertEqual(list(search.context['profile_list']), [])
+        followers = self.client.get(reverse('list-followers', args=[self.alice.pk]))
+        self.assertEqual(list(followers.context['followers']), [])
+
+    def test_deleted_users_cannot_be_followed(self):
+        soft_delete_account(self.bob)
+        self.client.force_login(self.carol)
+        self.assertEqual(self.client.post(reverse('add-follower', args=[self.bob.pk])).status_code, 404)
+        self.assertEqual(self.client.post(reverse('api-follow', args=[self.bob.pk])).status_code, 404)
+        response = self.client.post(reverse('bulk-follow'), json.dumps({'usernames': ['bob'], 'profiles': [self.bob.pk]}), content_type='application/json')
+        self.assertEqual(response.json(), {'followed': 0})
+        self.assertEqual(bulk_follow(self.carol, [self.bob.pk]), 0)
+        self.assertEqual(list(followed_ids(self.carol)), [])
+
+
+class RateLimitTests(SocialTestCase):
+    def test_bucket_refills_and_denies(self):
+        store = LocalStore()
+        self.assertEqual([store.take('k', 2, 1.0, 100)[0] for _ in range(3)], [True, True, False])
+        self.assertTrue(store.take('k', 2, 1.0, 101.5)[0])
+
+    def test_full_buckets_are_evicted(self):
+        store = LocalStore()
+        for i in range(100):
+            store.take(f'ip:{i}', 10, 1.0, 1000)
+        store.take('ip:late', 10, 1.0, 1005)
+        self.assertEqual(len(store.buckets), 101)
+        # Every early bucket is full again by the next sweep.
+        store.take('ip:last', 10, 1.0, 1000 + store.SWEEP_INTERVAL)
+        self.assertEqual(sorted(store.buckets), ['ip:last'])
+
+    def test_write_endpoints_return_429(self):
+        alice, = make_users('alice')
+        post = Post.objects.create(author=alice, body='x')
+        self.client.force_login(alice)
+        with self.settings(RATE_LIMITS={'comment': (1, 0.001)}):
+            limiter.limits, limiter.store = None, LocalStore()
+            try:
+                codes = [self.client.post(reverse('post-detail', args=[post.pk]), {'comment': 'c'}).status_code for _ in range(2)]
+            finally:
+                limiter.limits = limiter.store = None
+        self.assertEqual(codes[1], 429)
+
+
+class ShareTests(SocialTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice, self.bob, self.carol = make_users('alice', 'bob', 'carol')
+        self.post = Post.objects.create(author=self.alice, body='original')
+
+    def test_plain_share_without_quote_creates_repost(self):
+        self.client.force_login(self.bob)
+        response = self.client.post(reverse('share-post', args=[self.post.pk]), {'body': ''})
+        self.assertRedirects(response, reverse('post-list'), fetch_redirect_response=False)
+        repost = Post.objects.get(repost_of=self.post)
+        self.assertEqual((repost.author, repost.shared_body), (self.bob, None))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.repost_count, 1)
+
+    def test_sharing_a_repost_shares_the_original(self):
+        repost = Post.objects.create(author=self.bob, body='', shared_user=self.bob, repost_of=self.post)
+        self.client.force_login(self.carol)
+        self.client.post(reverse('share-post', args=[repost.pk]), {'body': 'look'})
+        self.assertEqual(Post.objects.get(author=self.carol).repost_of, self.post)
+
+
+class UserSummaryTests(SocialTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice, self.bob = make_users('alice', 'bob')
+
+    def test_batch_lookup_is_cached(self):
+        with self.assertNumQueries(1):
+            summaries = get_user_summaries([self.alice.pk, self.bob.pk, None])
+        self.assertEqual(summaries[self.bob.pk]['username'], 'bob')
+        self.assertEqual(summaries[self.bob.pk]['profile'], self.bob.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_summaries([self.alice.pk, self.bob.pk]), summaries)
+
+    def test_profile_and_username_changes_invalidate(self):
+        get_user_summaries([self.alice.pk])
+        self.alice.username = 'alicia'
+        self.alice.save()
+        self.assertEqual(get_user_summaries([self.alice.pk])[self.alice.pk]['username'], 'alicia')
+
+        self.alice.profile.picture = 'uploads/profile_pictures/alicia.png'
+        self.alice.profile.save()
+        self.assertTrue(get_user_summaries([self.alice.pk])[self.alice.pk]['picture_url'].endswith('alicia.png'))
+
+    def test_login_does_not_rewrite_the_profile(self):
+        updated_on = self.alice.profile.updated_on
+        self.assertTrue(self.client.login(username='alice', password='password'))
+        self.alice.profile.refresh_from_db()
+        self.assertEqual(self.alice.profile.updated_on, updated_on)
+
+
+class ConditionalTests(SocialTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice, = make_users('alice')
+        Post.objects.create(author=self.alice, body='hello')
+        self.url = reverse('profile', args=[self.alice.pk])
+        self.client.force_login(self.alice)
+        # The first render sets the CSRF cookie, which is part of the stamp.
+        self.client.get(self.url)
+
+    def test_unchanged_page_returns_304(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Post.objects.create(author=self.alice, body='again')
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_new_session_changes_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        self.client.logout()
+        self.client.login(username='alice', password='password')
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class APITests(SocialTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice, self.bob = make_users('alice', 'bob')
+        self.post = Post.objects.create(author=self.alice, body='hello')
+        Comment.objects.create(post=self.post, author=self.bob, comment='hi')
+
+    def test_post_and_comments_require_login(self):
+        for name in ('api-post', 'api-comments'):
+            with self.subTest(name=name):
+                self.assertEqual(self.client.get(reverse(name, args=[self.post.pk])).status_code, 302)
+
+    def test_comments_of_deleted_posts_are_hidden(self):
+        self.client.force_login(self.bob)
+        url = reverse('api-comments', args=[self.post.pk])
+        self.assertEqual([c['comment'] for c in self.client.get(url).json()['comments']], ['hi'])
+        soft_delete_post(self.post)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_follow_rejects_self_and_is_rate_limited(self):
+        self.client.force_login(self.alice)
+        self.assertEqual(self.client.post(reverse('api-follow', args=[self.alice.pk])).status_code, 400)
+        with self.settings(RATE_LIMITS={'follow': (1, 0.001)}):
+            limiter.limits, limiter.store = None, LocalStore()
+            try:
+                response = self.client.post(reverse('api-follow', args=[self.bob.pk]))
+                self.assertEqual(response.json(), {'id': self.bob.pk, 'following': True, 'followers': 1})
+                self.assertEqual(self.client.post(reverse('api-unfollow', args=[self.bob.pk])).status_code, 429)
+            finally:
+                limiter.limits = limiter.store = None
+
+
+class NewPostsAPITests(SocialTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice, self.bob, self.carol = make_users('alice', 'bob', 'carol')
+        self.alice.profile.followers.add(self.bob)
+        self.seen = Post.objects.create(author=self.alice, body='seen')
+        self.client.force_login(self.bob)
+
+    def poll(self, **params):
+        return self.client.get(reverse('api-feed-new'), {'since': self.seen.pk, **params}).json()
+
+    def test_counts_only_newer_posts_of_followed_authors(self):
+        self.assertEqual(self.poll(), {'count': 0, 'more': False})
+        Post.objects.create(author=self.carol, body='stranger')
+        newer = Post.objects.create(author=self.alice, body='newer')
+        self.assertEqual(self.poll(), {'count': 1, 'more': False})
+        self.assertEqual([post['id'] for post in self.poll(posts=1)['posts']], [newer.pk])
+
+    def test_count_is_bounded(self):
+        Post.objects.bulk_create([Post(author=self.alice, body=str(i)) for i in range(MAX_NEW_POSTS + 1)])
+        self.assertEqual(self.poll(), {'count': MAX_NEW_POSTS, 'more': True})
+
+
+class TaskQueueTests(SocialTestCase):
+    def setUp(self):
+        super().setUp()
+        self.task = enqueue('create_post_tags', 0, idempotency_key='tags:0')
+        self.long_ago = timezone.now() - 2 * STALE_AFTER
+        Task.objects.filter(pk=self.task.pk).update(created_on=self.long_ago, updated_on=self.long_ago)
+
+    def test_claimed_task_is_not_reset_as_stale(self):
+        self.assertEqual(claim(10), [self.task.pk])
+        self.assertEqual(claim(10), [])
+        self.assertEqual(Task.objects.get(pk=self.task.pk).status, Task.RUNNING)
+
+    def test_running_task_heartbeats_until_stopped(self):
+        claim(10)
+        Task.objects.filter(pk=self.task.pk).update(updated_on=self.long_ago)
+
+        class Stop:
+            # Lets one heartbeat through, then stops.
+            calls = 0
+
+            def wait(self, timeout):
+                self.calls += 1
+                return self.calls > 1
+
+        _heartbeat(self.task.pk, Stop())
+        self.assertEqual(claim(10), [])
+
+    def test_stale_task_is_reclaimed_and_run(self):
+        claim(10)
+        Task.objects.filter(pk=self.task.pk).update(updated_on=self.long_ago)
+        self.assertEqual(claim(10), [self.task.pk])
+        self.assertTrue(run_task(self.task.pk))
+        self.assertEqual(Task.objects.get(pk=self.task.pk).status, Task.DONE)
+
+    def test_purge_keeps_pending_and_recent_tasks(self):
+        old = timezone.now() - datetime.timedelta(days=8)
+        done = Task.objects.create(name='create_post_tags', status=Task.DONE)
+        failed = Task.objects.create(name='create_post_tags', status=Task.FAILED)
+        recent = Task.objects.create(name='create_post_tags', status=Task.DONE)
+        Task.objects.filter(pk__in=[self.task.pk, done.pk, failed.pk]).update(updated_on=old)
+
+        self.assertEqual(purge_tasks(), 2)
+        self.assertEqual(sorted(Task.objects.values_list('pk', flat=True)), [self.task.pk, recent.pk])
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def make_pool(self, check=lambda conn: None, reset=lambda conn: True, **kwargs):
+        return ConnectionPool(FakeConnection, check, reset, **kwargs)
+
+    def test_returned_connections_are_reused(self):
+        pool = self.make_pool()
+        conn = pool.get()
+        pool.put(conn)
+        self.assertIs(pool.get(), conn)
+        stats = pool.stats()
+        self.assertEqual((stats['connects'], stats['checkouts'], stats['in_use']), (1, 2, 1))
+
+    def test_full_pool_times_out(self):
+        pool = self.make_pool(max_size=1, timeout=0.01)
+        pool.get()
+        with self.assertRaises(PoolTimeout):
+            pool.get()
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+    def test_failed_health_check_replaces_connection(self):
+        def check(conn):
+            raise OSError('server closed the connection')
+
+        pool = self.make_pool(check=check, check_interval=0)
+        conn = pool.get()
+        pool.put(conn)
+        self.assertIsNot(pool.get(), conn)
+        self.assertTrue(conn.closed)
+        self.assertEqual((pool.stats()['failed_checks'], pool.stats()['size']), (1, 1))
+
+    def test_connection_that_fails_reset_is_discarded(self):
+        pool = self.make_pool(reset=lambda conn: False)
+        conn = pool.get()
+        pool.put(conn)
+        self.assertTrue(conn.closed)
+        self.assertEqual((pool.stats()['size'], pool.stats()['idle']), (0, 0))
+
+
+class ProductionSettingsTests(SimpleTestCase):
+    def warning_ids(self, **overrides):
+        with self.settings(PRODUCTION=True, **overrides):
+            return {warning.id for warning in check_slow_settings(None)}
+
+    def test_local_caches_are_reported(self):
+        self.assertLessEqual({'social.W005', 'social.W007', 'social.W008'}, self.warning_ids())
+
+    def test_production_settings_share_caches_and_stores(self):
+        names = ('CACHES', 'SESSION_ENGINE', 'SESSION_CACHE_ALIAS', 'REACTION_BUFFER_STORE')
+        shared = {name: getattr(settings_production, name) for name in names}
+        self.assertFalse({'social.W005', 'social.W007', 'social.W008', 'social.W009'} & self.warning_ids(**shared))
+        self.assertEqual(settings_production.RATE_LIMIT_STORE, 'social.ratelimit.CacheStore')
+        self.assertEqual(settings_production.REACTION_BUFFER_STORE, 'social.reaction_buffer.CacheStore')
+
+    def test_production_templates_leave_base_settings_alone(self):
+        self.assertFalse(settings_production.TEMPLATES[0]['APP_DIRS'])
+        self.assertIn('loaders', settings_production.TEMPLATES[0]['OPTIONS'])
+        self.assertTrue(base_settings.TEMPLATES[0]['APP_DIRS'])
+        self.assertNotIn('loaders', base_settings.TEMPLATES[0]['OPTIONS'])
+
+
+def page_content(response):
+    if response.streaming:
+        return b''.join(response.streaming_content).decode()
+    return response.content.decode()
+
+
+class RenderedFormTests(SocialTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice, self.bob = make_users('alice', 'bob')
+        self.alice.profile.followers.add(self.bob)
+        self.posts = [Post.objects.create(author=self.alice, body=f'post {i}') for i in range(2)]
+        self.client.force_login(self.bob)
+
+    def test_feed_has_a_share_form_per_post(self):
+        page = page_content(self.client.get(reverse('post-list')))
+        for post in self.posts:
+            self.assertIn(f'action="{reverse("share-post", args=[post.pk])}" class="d-none" id="{post.pk}"', page)
+
+    def test_post_detail_has_a_reply_form_per_comment(self):
+        post = self.posts[0]
+        comments = [Comment.objects.create(post=post, author=self.alice, comment=f'c{i}') for i in range(2)]
+        page = page_content(self.client.get(reverse('post-detail', args=[post.pk])))
+        for comment in comments:
+            self.assertIn(f'action="{reverse("comment-reply", args=[post.pk, comment.pk])}"', page)
+
+    def test_post_detail_does_not_load_comment_authors(self):
+        post = self.posts[0]
+
+        def count_queries():
+            caches['default'].clear()
+            with CaptureQueriesContext(connection) as queries:
+                page_content(self.client.get(reverse('post-detail', args=[post.pk])))
+            return sum('FROM "auth_user"' in query['sql'] for query in queries)
+
+        Comment.objects.create(post=post, author=self.alice, comment='first')
+        before = count_queries()
+        for i in range(5):
+            Comment.objects.create(post=post, author=self.alice, comment=f'c{i}')
+        self.assertEqual(count_queries(), before)
+
+
+class MessageArchiveTests(SocialTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice, self.bob = make_users('alice', 'bob')
+        self.thread = ThreadModel.objects.create(user=self.alice, receiver=self.bob)
+        self.messages = [
+            MessageModel.objects.create(thread=self.thread, sender_user=self.alice, receiver_user=self.bob, body=f'm{i}')
+            for i in range(7)
+        ]
+
+    def bodies(self, rows):
+        return [row['body'] for row in rows]
+
+    def test_only_full_segments_beyond_the_hot_window_are_archived(self):
+        self.assertEqual(archive_thread(self.thread.pk, keep=2, segment_size=2), 4)
+        self.assertEqual(MessageArchive.objects.filter(thread=self.thread).count(), 2)
+        self.assertEqual(self.bodies(MessageModel.objects.filter(thread=self.thread).order_by('pk').values('body')), ['m4', 'm5', 'm6'])
+
+    def test_paging_continues_into_the_archive(self):
+        archive_thread(self.thread.pk, keep=2, segment_size=2)
+        page = get_messages(self.thread.pk, limit=5)
+        self.assertEqual(self.bodies(page), ['m2', 'm3', 'm4', 'm5', 'm6'])
+        self.assertEqual(self.bodies(get_messages(self.thread.pk, before=page[0]['pk'], limit=5)), ['m0', 'm1'])
+
+    def test_thread_api_pages_back_into_the_archive(self):
+        archive_thread(self.thread.pk, keep=2, segment_size=2)
+        self.client.force_login(self.bob)
+        url = reverse('api-messages', args=[self.thread.pk])
+        response = self.client.get(url, {'before': self.messages[3].pk, 'limit': 2})
+        self.assertEqual([message['body'] for message in response.json()['messages']], ['m1', 'm2'])
+
+
+class NotificationTests(SocialTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice, self.bob = make_users('alice', 'bob')
+
+    def test_unread_count_is_cached_and_kept_in_step(self):
+        first = notify(notification_type=3, from_user=self.alice, to_user=self.bob)
+        self.assertEqual(unread_count(self.bob.pk), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(unread_count(self.bob.pk), 1)
+
+        notify(notification_type=3, from_user=self.alice, to_user=self.bob)
+        mark_seen(self.bob, [first.pk])
+        with self.assertNumQueries(0):
+            self.assertEqual(unread_count(self.bob.pk), 1)
+
+    def test_unread_count_is_not_stored_when_a_notification_lands_mid_count(self):
+        count_before = unread_notifications(self.bob.pk).count()
+
+        def racing(user_id):
+            notify(notification_type=3, from_user=self.alice, to_user=self.bob)
+            return mock.Mock(count=mock.Mock(return_value=count_before))
+
+        with mock.patch('social.notifications.unread_notifications', racing):
+            self.assertEqual(unread_count(self.bob.pk), 0)
+        self.assertEqual(unread_count(self.bob.pk), 1)
+
+    def test_purge_deletes_only_old_seen_notifications(self):
+        old = timezone.now() - datetime.timedelta(days=31)
+        seen = Notification.objects.create(notification_type=3, from_user=self.alice, to_user=self.bob, user_has_seen=True, date=old)
+        unseen = Notification.objects.create(notification_type=3, from_user=self.alice, to_user=self.bob, date=old)
+        recent = Notification.objects.create(notification_type=3, from_user=self.alice, to_user=self.bob, user_has_seen=True)
+
+        self.assertEqual(purge_notifications(), 1)
+        self.assertFalse(Notification.objects.filter(pk=seen.pk).exists())
+        self.assertEqual(sorted(Notification.objects.values_list('pk', flat=True)), [unseen.pk, recent.pk])
+
+
+class ReactionBufferTests(SocialTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice, self.bob = make_users('alice', 'bob')
+        self.post = Post.objects.create(author=self.alice, body='hello')
+        self.comment = Comment.objects.create(post=self.post, author=self.alice, comment='c')
+        self.buffer = reaction_buffer.ReactionBuffer(reaction_buffer.LocalStore())
+        # Flushes are driven by the test, not the background thread.
+        self.buffer.start_flusher = lambda: None
+
+    def test_toggles_collapse_into_one_write(self):
+        for kind in ('like', 'dislike', 'like'):
+            self.buffer.toggle('post', self.post, self.bob.pk, kind)
+        self.assertEqual(self.buffer.deltas('post', [self.post.pk]), {self.post.pk: (1, 0)})
+        self.assertFalse(self.post.likes.exists())
+
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(list(self.post.likes.all()), [self.bob])
+        self.assertFalse(self.post.dislikes.exists())
+        self.assertEqual(self.buffer.deltas('post', [self.post.pk]), {})
+
+    def test_flush_purges_the_pages_it_changed(self):
+        self.buffer.toggle('post', self.post, self.bob.pk, 'like')
+        self.buffer.toggle('comment', self.comment, self.bob.pk, 'like')
+        with mock.patch.object(reaction_buffer, 'purge_pages') as purge_pages:
+            self.buffer.flush()
+        self.assertEqual([call.args for call in purge_pages.call_args_list], [(f'post:{self.post.pk}',)] * 2)
+        self.assertEqual(list(self.comment.likes.all()), [self.bob])
+
+    def test_local_buffer_is_reported_in_production(self):
+        with self.settings(PRODUCTION=True, REACTION_BUFFER_STORE='social.reaction_buffer.LocalStore'):
+            self.assertIn('social.W009', {warning.id for warning in check_slow_settings(None)})
+
+
+class FollowGraphTests(SocialTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice, self.bob, self.carol = make_users('alice', 'bob', 'carol')
+        bulk_follow(self.alice, [self.bob.pk])
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'follow_graph.bin')
+        build_snapshot(self.path)
+        self.graph = FollowGraph(self.path)
+
+    def test_refresh_reads_only_new_events(self):
+        self.assertEqual(self.graph.following(self.alice.pk), [self.bob.pk])
+        bulk_follow(self.alice, [self.carol.pk])
+        bulk_unfollow(self.alice, [self.bob.pk])
+        with self.assertNumQueries(1):
+            self.graph.refresh(force=True)
+        self.assertEqual(self.graph.following(self.alice.pk), [self.carol.pk])
+        self.assertEqual(self.graph.last_event_id, FollowEvent.objects.latest('pk').pk)
+
+    def test_reread_events_never_override_newer_ones(self):
+        bulk_follow(self.alice, [self.carol.pk])
+        self.graph.refresh(force=True)
+        bulk_unfollow(self.alice, [self.carol.pk])
+        # Both events are inside the re-read window.
+        self.graph.refresh(force=True)
+        self.graph.refresh(force=True)
+        self.assertFalse(self.graph.is_following(self.alice.pk, self.carol.pk))
+        self.assertEqual(self.graph.follower_count(self.carol.pk), 0)
+
+    def test_m2m_changes_are_logged(self):
+        self.graph.refresh(force=True)
+        self.carol.profile.followers.add(self.bob)
+        self.graph.refresh(force=True)
+        self.assertEqual(self.graph.followers(self.carol.pk), [self.bob.pk])
+
+        self.bob.profile.followers.clear()
+        self.graph.refresh(force=True)
+        self.assertEqual(self.graph.following(self.alice.pk), [])
+
+    def test_clearing_followers_refreshes_cached_follow_lists(self):
+        self.assertEqual(followed_ids(self.alice), [self.bob.pk])
+        self.bob.profile.followers.clear()
+        self.assertEqual(followed_ids(self.alice), [])
+
+    def test_publish_replaces_only_changed_rows(self):
+        self.graph.apply([(self.alice.pk, self.carol.pk)], True)
+        following, followers = self.graph.deltas
+        alice_row = following[self.alice.pk]
+        self.graph.apply([(self.bob.pk, self.carol.pk)], True)
+        self.assertIs(self.graph.deltas[0], following)
+        self.assertIs(following[self.alice.pk], alice_row)
+        self.assertEqual(followers[self.carol.pk], {self.alice.pk: True, self.bob.pk: True})
+
+    def test_rebuild_truncates_the_log(self):
+        old = FollowEvent.objects.create(follower_id=self.bob.pk, followee_id=self.carol.pk, followed=True)
+        FollowEvent.objects.filter(pk=old.pk).update(created_on=timezone.now() - datetime.timedelta(hours=1))
+        recent = FollowEvent.objects.create(follower_id=self.carol.pk, followee_id=self.bob.pk, followed=True)
+        build_snapshot(self.path)
+        self.assertFalse(FollowEvent.objects.filter(pk=old.pk).exists())
+        self.assertTrue(FollowEvent.objects.filter(pk=recent.pk).exists())
+
+
+class PageCacheTests(SocialTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice, = make_users('alice')
+        self.post = Post.objects.create(author=self.alice, body='hello')
+        self.url = reverse('profile', args=[self.alice.pk])
+        # Purges are stamped in milliseconds; a page that starts rendering in
+        # the same millisecond as the purges above would not be stored.
+        time.sleep(0.002)
+
+    def test_anonymous_pages_are_cached_until_purged(self):
+        self.assertEqual(self.client.get(self.url)['X-Page-Cache'], 'miss')
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertIn(f'post:{self.post.pk}', response['Surrogate-Key'].split())
+
+        self.post.body = 'edited'
+        self.post.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertIn('edited', response.content.decode())
+
+    def test_logged_in_pages_are_not_cached(self):
+        self.client.force_login(self.alice)
+        self.client.get(self.url)
+        self.assertNotIn('X-Page-Cache', self.client.get(self.url))
+
+
+class ObjectCacheTests(SocialTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice, = make_users('alice')
+        self.post = Post.objects.create(author=self.alice, body='hello')
+
+    def test_objects_are_cached_until_saved(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(get_objects(Post, [self.post.pk, self.post.pk + 1]), {self.post.pk: self.post})
+        with self.assertNumQueries(0):
+            self.assertEqual(get_objects(Post, [self.post.pk])[self.post.pk].body, 'hello')
+
+        self.post.body = 'edited'
+        self.post.save()
+        self.assertEqual(get_objects(Post, [self.post.pk])[self.post.pk].body, 'edited')
+
+    def test_evicted_versions_never_serve_an_older_entry(self):
+        version_key = f'object-version:social.post:{self.post.pk}'
+        caches['default'].delete(version_key)
+        get_objects(Post, [self.post.pk])
+        self.post.body = 'edited'
+        self.post.save()
+        # Counters are seeded from the clock in milliseconds.
+        time.sleep(0.002)
+        caches['default'].delete(version_key)
+        self.assertEqual(get_objects(Post, [self.post.pk])[self.post.pk].body, 'edited')
+
+    def test_missing_and_deleted_posts_are_404(self):
+        self.client.force_login(self.alice)
+        self.assertEqual(self.client.get(reverse('post-detail', args=[self.post.pk + 1])).status_code, 404)
+        soft_delete_post(self.post)
+        self.assertEqual(self.client.get(reverse('post-detail', args=[self.post.pk])).status_code, 404)
+        notification = notify(notification_type=1, from_user=self.alice, to_user=self.alice, post=self.post)
+        response = self.client.get(reverse('post-notification', args=[notification.pk, self.post.pk]), follow=True)
+        self.assertEqual(response.status_code, 404)
+
+
+class AdminTests(SocialTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice, = make_users('alice')
+        self.posts = [Post.objects.create(author=self.alice, body=str(i)) for i in range(3)]
+        self.client.force_login(User.objects.create_superuser('admin', password='password'))
+
+    def changelist(self, **params):
+        with mock.patch.object(admin.site._registry[Post], 'list_per_page', 2):
+            response = self.client.get(reverse('admin:social_post_changelist'), params)
+        return response.context['cl']
+
+    def test_changelist_pages_by_keyset(self):
+        first = self.changelist()
+        self.assertEqual(first.result_list, self.posts[:0:-1])
+        self.assertIn(f'before={self.posts[1].pk}', first.next_url)
+
+        second = self.changelist(before=self.posts[1].pk)
+        self.assertEqual(second.result_list, self.posts[:1])
+        self.assertIsNone(second.next_url)
+
+    def test_count_is_capped(self):
+        self.assertEqual(estimated_count(Post.objects.all(), limit=2), 3)
+        self.assertEqual(estimated_count(Post.objects.all(), limit=3), 3)
+        self.assertEqual(estimated_count(Post.objects.all()), 3)
+
+    def test_changelist_marks_only_counts_over_the_limit(self):
+        with mock.patch('social.admin.COUNT_LIMIT', 3):
+            cl = self.changelist()
+        self.assertEqual((cl.result_count, cl.count_capped), (3, False))
+        with mock.patch('social.admin.COUNT_LIMIT', 2):
+            cl = self.changelist()
+        self.assertEqual((cl.result_count, cl.count_capped), (2, True))
+
+
+class ImageManifestTests(SocialTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice, = make_users('alice')
+        self.post = Post.objects.create(author=self.alice, body='photos')
+        self.images = [Image.objects.create(image=f'uploads/post_photos/{name}.png', width=4, height=3) for name in 'ab']
+
+    def manifest(self):
+        return [(entry['id'], entry['name']) for entry in Post.objects.get(pk=self.post.pk).images]
+
+    def test_manifest_follows_the_image_relation(self):
+        self.post.image.add(*self.images)
+        self.assertEqual(self.manifest(), [(image.pk, image.image.name) for image in self.images])
+        self.post.image.remove(self.images[0])
+        self.assertEqual(self.manifest(), [(self.images[1].pk, self.images[1].image.name)])
+
+    def test_migration_backfills_existing_posts(self):
+        # Rows written before 0021 never went through the m2m signal.
+        Post.image.through.objects.bulk_create([Post.image.through(post=self.post, image=image) for image in self.images])
+        self.assertEqual(self.manifest(), [])
+        migration = importlib.import_module('social.migrations.0022_backfill_image_manifests')
+        migration.backfill_image_manifests(apps, None)
+        self.assertEqual(self.manifest(), [(image.pk, image.image.name) for image in self.images])
+
+
+class StreamingGzipTests(SocialTestCase):
+    def test_every_chunk_can_be_decoded_as_it_arrives(self):
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        chunks = [b'<html>', b'<p>one</p>' * 50, b'</html>']
+        stream = compress_stream(iter(chunks))
+        for chunk in chunks:
+            self.assertEqual(decompressor.decompress(next(stream)), chunk)
+        decompressor.decompress(b''.join(stream))
+        self.assertTrue(decompressor.eof)
+
+    def test_feed_is_streamed_gzipped(self):
+        alice, bob = make_users('alice', 'bob')
+        alice.profile.followers.add(bob)
+        for i in range(3):
+            Post.objects.create(author=alice, body=f'post number {i}')
+        self.client.force_login(bob)
+        with self.settings(STREAM_CHUNK_SIZE=1):
+            response = self.client.get(reverse('post-list'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        pieces = [decompressor.decompress(piece).decode() for piece in response.streaming_content]
+        self.assertTrue(pieces[0])
+        self.assertEqual(sum('post number' in piece for piece in pieces), 3)
+
+
+class PostRowTests(SocialTestCase):
+    def test_rows_carry_the_original_of_a_repost(self):
+        alice, bob = make_users('alice', 'bob')
+        original = Post.objects.create(author=alice, body='original')
+        repost = Post.objects.create(author=bob, body='', shared_user=bob, shared_body='look', repost_of=original)
+
+        with self.assertNumQueries(1):
+            rows = {row.pk: row for row in post_rows(Post.objects.filter(pk__in=[original.pk, repost.pk]))}
+        row = rows[repost.pk]
+        self.assertIsInstance(row, PostRow)
+        self.assertEqual((row.shared_user_id, row.shared_body, row.repost_of_id), (bob.pk, 'look', original.pk))
+        self.assertEqual((row.repost_of.pk, row.repost_of.author_id, row.repost_of.body), (original.pk, alice.pk, 'original'))
+        self.assertIsNone(rows[original.pk].repost_of)
+        with self.assertRaises(AttributeError):
+            row.extra = 1
+
+
+class BenchmarkPagesTests(SocialTestCase):
+    def test_benchmark_renders_every_page_and_rolls_back(self):
+        out = io.StringIO()
+        call_command('benchmark_pages', '--seed-posts=3', '--seed-comments=4', '--repeat=1', stdout=out, stderr=io.StringIO())
+        lines = {line.split()[0]: line for line in out.getvalue().splitlines()}
+        for page in ('feed', 'post', 'profile'):
+            self.assertIn('status=200', lines[page])
+        self.assertIn('items=3', lines['rows'])
+        self.assertFalse(User.objects.filter(username__startswith='benchmark-').exists())
+
+
+class CachedAuthTests(SocialTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice, = make_users('alice')
+        self.client.force_login(self.alice)
+
+    def request(self):
+        request = RequestFactory().get('/')
+        request.session = self.client.session
+        return request
+
+    def test_user_is_read_from_the_cache(self):
+        self.assertEqual(get_user(self.request()), self.alice)
+        request = self.request()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user(request), self.alice)
+
+    def test_password_change_and_deletion_log_out(self):
+        get_user(self.request())
+        self.alice.set_password('changed')
+        self.alice.save()
+        self.assertFalse(get_user(self.request()).is_authenticated)
+
+        bob, = make_users('bob')
+        self.client.force_login(bob)
+        get_user(self.request())
+        soft_delete_account(bob)
+        self.assertFalse(get_user(self.request()).is_authenticated)
+
+    def test_expired_sessions_are_purged(self):
+        Session.objects.create(session_key='expired', session_data='', expire_date=timezone.now() - datetime.timedelta(days=1))
+        self.assertEqual(purge_sessions(), 1)
+        self.assertTrue(Session.objects.exists())
+
+
+class MediaTests(SocialTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice, self.bob, self.carol = make_users('alice', 'bob', 'carol')
+        for name in ('uploads/message_photos/secret.png', 'uploads/post_photos/public.png'):
+            fullpath = os.path.join(settings.MEDIA_ROOT, name)
+            os.makedirs(os.path.dirname(fullpath), exist_ok=True)
+            with open(fullpath, 'wb') as f:
+                f.write(b'image bytes')
+        thread = ThreadModel.objects.create(user=self.alice, receiver=self.bob)
+        MessageModel.objects.create(
+            thread=thread, sender_user=self.alice, receiver_user=self.bob, body='', image='uploads/message_photos/secret.png',
+        )
+
+    def view(self, user, path):
+        request = RequestFactory().get(settings.MEDIA_URL + path)
+        request.user = user
+        try:
+            return MediaFileView.as_view()(request, path=path).status_code
+        except Http404:
+            return 404
+
+    def test_public_media_is_served_before_the_auth_stack(self):
+        with self.settings(SERVE_MEDIA=True):
+            response = self.client.get(settings.MEDIA_URL + 'uploads/post_photos/public.png')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('public', response['Cache-Control'])
+
+    def test_message_photos_are_only_sent_to_participants(self):
+        path = 'uploads/message_photos/secret.png'
+        self.assertEqual([self.view(user, path) for user in (self.alice, self.bob, self.carol)], [200, 200, 404])
+
+    def test_archived_photos_are_checked_without_reading_segments(self):
+        path = 'uploads/message_photos/secret.png'
+        thread = ThreadModel.objects.get(user=self.alice)
+        MessageModel.objects.create(thread=thread, sender_user=self.bob, receiver_user=self.alice, body='newer')
+        archive_thread(thread.pk, keep=0, segment_size=2)
+        self.assertFalse(MessageModel.objects.filter(image=path).exists())
+        self.assertEqual(list(ArchivedImage.objects.values_list('name', flat=True)), [path])
+
+        with mock.patch('social.archive.decode_segment') as decode:
+            self.assertEqual([self.view(user, path) for user in (self.alice, self.bob, self.carol)], [200, 200, 404])
+        decode.assert_not_called()
+
+    def test_migration_indexes_existing_archives(self):
+        thread = ThreadModel.objects.get(user=self.alice)
+        MessageModel.objects.create(thread=thread, sender_user=self.bob, receiver_user=self.alice, body='newer')
+        archive_thread(thread.pk, keep=0, segment_size=2)
+        ArchivedImage.objects.all().delete()
+        migration = importlib.import_module('social.migrations.0023_archivedimage')
+        migration.index_archived_images(apps, None)
+        self.assertEqual(
+            list(ArchivedImage.objects.values_list('name', 'sender_user_id', 'receiver_user_id')),
+            [('uploads/message_photos/secret.png', self.alice.pk, self.bob.pk)],
+        )
+
+    def test_other_spellings_of_private_paths_are_rejected(self):
+        for path in (
+            'uploads//message_photos/secret.png',
+            'uploads/./message_photos/secret.png',
+            'uploads/post_photos/../message_photos/secret.png',
+        ):
+            with self.subTest(path=path):
+                self.assertTrue(is_private_media(path))
+                with self.settings(SERVE_MEDIA=True):
+                    self.assertEqual(self.client.get(settings.MEDIA_URL + path).status_code, 404)
+                self.assertEqual(self.view(self.alice, path), 404)
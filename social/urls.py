@@ -0,0 +1,49 @@
+from django.urls import path
+from .api import FeedAPI, NewPostsAPI, PostAPI, CommentsAPI, PostReactionAPI, CommentReactionAPI, FollowAPI, MessagesAPI
+from .views import PostListView, PostDetailView, PostEditView, PostDeleteView, CommentDeleteView, ProfileView, ProfileEditView, AddFollower, RemoveFollower, AddLike, AddDislike, UserSearch, ListFollowers, AddCommentLike, AddCommentDislike, CommentReplyView, PostNotification, FollowNotification, ThreadNotification, RemoveNotification, CreateThread, ListThreads, ThreadView, CreateMessage, SharedPostView, Explore, BulkFollow, ExportFollowGraph, Takeout, AccountDeleteView, RateLimitStats, DatabasePoolStats
+
+urlpatterns = [
+    path('', PostListView.as_view(), name='post-list'),
+    path('post/<int:pk>/', PostDetailView.as_view(), name='post-detail'),
+    path('post/edit/<int:pk>/', PostEditView.as_view(), name='post-edit'),
+    path('post/delete/<int:pk>/', PostDeleteView.as_view(), name='post-delete'),
+    path('post/<int:post_pk>/comment/delete/<int:pk>/', CommentDeleteView.as_view(), name='comment-delete'),
+    path('post/<int:post_pk>/comment/<int:pk>/like', AddCommentLike.as_view(), name='comment-like'),
+    path('post/<int:post_pk>/comment/<int:pk>/dislike', AddCommentDislike.as_view(), name='comment-dislike'),
+    path('post/<int:post_pk>/comment/<int:pk>/reply', CommentReplyView.as_view(), name='comment-reply'),
+    path('post/<int:pk>/like', AddLike.as_view(), name='like'),
+    path('post/<int:pk>/dislike', AddDislike.as_view(), name='dislike'),
+    path('post/<int:pk>/share', SharedPostView.as_view(), name='share-post'),
+    path('profile/<int:pk>/', ProfileView.as_view(), name='profile'),
+    path('profile/edit/<int:pk>/', ProfileEditView.as_view(), name='profile-edit'),
+    path('profile/delete/', AccountDeleteView.as_view(), name='account-delete'),
+    path('profile/<int:pk>/followers/', ListFollowers.as_view(), name='list-followers'),
+    path('profile/<int:pk>/followers/add', AddFollower.as_view(), name='add-follower'),
+    path('profile/<int:pk>/followers/remove', RemoveFollower.as_view(), name='remove-follower'),
+    path('follows/bulk/', BulkFollow.as_view(), name='bulk-follow'),
+    path('follows/export/', ExportFollowGraph.as_view(), name='export-follows'),
+    path('takeout/', Takeout.as_view(), name='takeout'),
+    path('ratelimit/stats/', RateLimitStats.as_view(), name='ratelimit-stats'),
+    path('dbpool/stats/', DatabasePoolStats.as_view(), name='dbpool-stats'),
+    path('search/', UserSearch.as_view(), name='profile-search'),
+    path('notification/<int:notification_pk>/post/<int:post_pk>', PostNotification.as_view(), name='post-notification'),
+    path('notification/<int:notification_pk>/profile/<int:profile_pk>', FollowNotification.as_view(), name='follow-notification'),
+    path('notification/<int:notification_pk>/thread/<int:object_pk>', ThreadNotification.as_view(), name='thread-notification'),
+    path('notification/delete/<int:notification_pk>', RemoveNotification.as_view(), name='notification-delete'),
+    path('inbox/', ListThreads.as_view(), name='inbox'),
+    path('inbox/create-thread/', CreateThread.as_view(), name='create-thread'),
+    path('inbox/<int:pk>/', ThreadView.as_view(), name='thread'),
+    path('inbox/<int:pk>/create-message/', CreateMessage.as_view(), name='create-message'),
+    path('explore/', Explore.as_view(), name='explore'),
+    path('api/feed/', FeedAPI.as_view(), name='api-feed'),
+    path('api/feed/new/', NewPostsAPI.as_view(), name='api-feed-new'),
+    path('api/post/<int:pk>/', PostAPI.as_view(), name='api-post'),
+    path('api/post/<int:pk>/comments/', CommentsAPI.as_view(), name='api-comments'),
+    path('api/post/<int:pk>/like/', PostReactionAPI.as_view(kind='like'), name='api-like'),
+    path('api/post/<int:pk>/dislike/', PostReactionAPI.as_view(kind='dislike'), name='api-dislike'),
+    path('api/comment/<int:pk>/like/', CommentReactionAPI.as_view(kind='like'), name='api-comment-like'),
+    path('api/comment/<int:pk>/dislike/', CommentReactionAPI.as_view(kind='dislike'), name='api-comment-dislike'),
+    path('api/profile/<int:pk>/follow/', FollowAPI.as_view(follow=True), name='api-follow'),
+    path('api/profile/<int:pk>/unfollow/', FollowAPI.as_view(follow=False), name='api-unfollow'),
+    path('api/thread/<int:pk>/messages/', MessagesAPI.as_view(), name='api-messages'),
+]
@@ -0,0 +1,33 @@
+import time
+
+from django.core.cache import cache
+
+# Per-resource version counters kept in the cache. A missing counter starts
+# from the current time rather than 0, so losing the cache can never bring
+# back a stamp that an older page was already rendered with.
+
+
+def _key(name):
+    return f'version:{name}'
+
+
+def bump_versions(*names, content=True):
+    # Everything bumps 'content' too unless it only concerns one viewer's page chrome.
+    for name in names + (('content',) if content else ()):
+        key = _key(name)
+        if cache.add(key, int(time.time() * 1000), timeout=None):
+            continue
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, int(time.time() * 1000), timeout=None)
+
+
+def get_versions(names):
+    keys = [_key(name) for name in names]
+    values = cache.get_many(keys)
+    for key in keys:
+        if key not in values:
+            cache.add(key, int(time.time() * 1000), timeout=None)
+            values[key] = cache.get(key)
+    return [values[key] for key in keys]
@@ -1,27 +1,52 @@
 from django.shortcuts import render, redirect
-from django.db.models import Q
+from django.db.models import Q, F
 from django.utils import timezone
 from django.urls import reverse_lazy
 from django.shortcuts import redirect
 from django.contrib import messages
+from django.contrib.auth import logout
 from django.contrib.auth.models import User
-from django.http import HttpResponseRedirect, HttpResponse
+from django.http import HttpResponseRedirect, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.contrib.auth.mixins import UserPassesTestMixin, LoginRequiredMixin
 from django.views import View
-from .models import Post, Comment, UserProfile, Notification, ThreadModel, MessageModel, Image, Tag
+from django.utils.decorators import method_decorator
+from .models import Post, Comment, UserProfile, ThreadModel, Tag
 from .forms import PostForm, CommentForm, ThreadForm, MessageForm, ShareForm, ExploreForm
+from .takeout import iter_takeout
+from .ratelimit import RateLimitMixin, limiter
+from .dbpool.pool import pool_stats
+from .purge import soft_delete_post, soft_delete_comment, soft_delete_account
+from .conditional import conditional_view, feed_stamp, profile_stamp, followers_stamp, thread_stamp, explore_stamp
+from .versions import bump_versions
+from .objectcache import get_object_or_404, invalidate_objects
+from .images import attach_images
+from .rows import post_rows
+from .streaming import stream_template, streaming_enabled, stream_chunk_size, chunked, gzip_stream
+from .pagecache import anonymous_page_cache, add_surrogate_keys, post_keys, purge as purge_pages
+from .notifications import mark_seen
+from .reactions import toggle_post_reaction, toggle_comment_reaction
+from .tasks import create_post_tags, create_comment_tags, create_notification
+from .archive import get_messages
+from .serializers import serialize_messages
+from .follows import resolve_targets, bulk_follow, bulk_unfollow, iter_follow_graph, export_ndjson, export_csv, followed_ids, follower_count, is_following
+import os
+import json
 from django.views.generic.edit import UpdateView, DeleteView
 
+THREAD_PAGE_SIZE = 50
 
+
+@method_decorator(gzip_stream, name='get')
+@method_decorator(conditional_view(feed_stamp), name='get')
 class PostListView(LoginRequiredMixin, View):
     def get(self, request, *args, **kwargs):
         
         logged_in_user = request.user
        
         posts = Post.objects.filter( 
-            author__profile__followers__in=[logged_in_user.id]
-           
-        )
+            author_id__in=followed_ids(logged_in_user),
+            is_deleted=False,
+        ).exclude(repost_of__is_deleted=True)
 
         form = PostForm()
 
@@ -29,16 +54,27 @@ class PostListView(LoginRequiredMixin, View):
 
         context = { 
            
-            'post_list': posts, 
             'shareform': share_form, 
             'form': form,
         }
+        if streaming_enabled():
+            size = stream_chunk_size()
+            # crispy adds its classes to the widgets it renders, so each chunk
+            # gets its own share form.
+            chunks = (
+                {'post_list': chunk, 'shareform': ShareForm()}
+                for chunk in chunked(post_rows(posts, chunk_size=size), size)
+            )
+            return stream_template(request, 'social/post_list.html', context, 'social/post_list_items.html', chunks)
+
+        context['post_list'] = list(post_rows(posts))
         return render(request, 'social/post_list.html', context) 
     def post(self, request, *args, **kwargs):
         logged_in_user = request.user
         posts = Post.objects.filter(
-            author__profile__followers__in=[logged_in_user.id]
-        )
+            author_id__in=followed_ids(logged_in_user),
+            is_deleted=False,
+        ).exclude(repost_of__is_deleted=True)
         form = PostForm(request.POST, request.FILES)
         
         files = request.FILES.getlist('image') 
@@ -49,16 +85,11 @@ class PostListView(LoginRequiredMixin, View):
             new_post.author = request.user
             new_post.save()
             
-            new_post.create_tags() 
-            for f in files:
-                img = Image(image=f)
-                img.save()
-                new_post.image.add(img)
-                
-            new_post.save() 
+            create_post_tags.delay(new_post.pk, idempotency_key=f'post-tags:{new_post.pk}')
+            attach_images(new_post, files)
 
         context = {
-            'post_list': posts,
+            'post_list': list(post_rows(posts)),
             'shareform': share_form,
             'form': form,
         }
@@ -70,12 +101,16 @@ class PostListView(LoginRequiredMixin, View):
 # ***************************************************************************************************************** #
 
 
-class PostDetailView(LoginRequiredMixin, View):
+class PostDetailView(LoginRequiredMixin, RateLimitMixin, View):
+    rate_limit_scope = 'comment'
+
     def get(self, request, pk, *args, **kwargs):
-        post = Post.objects.get(pk=pk)
+        post = get_object_or_404(Post, pk, is_deleted=False)
+        if post.repost_of_id:
+            return redirect('post-detail', pk=post.repost_of_id)
         form = CommentForm()
 
-        comments = Comment.objects.filter(post=post)
+        comments = Comment.objects.filter(post=post, is_deleted=False)
 
         context = {
             'post': post,
@@ -85,7 +120,7 @@ class PostDetailView(LoginRequiredMixin, View):
 
         return render(request, 'social/post_detail.html', context)
     def post(self, request, pk, *args, **kwargs):
-        post = Post.objects.get(pk=pk)
+        post = get_object_or_404(Post, pk, is_deleted=False)
 
         form = CommentForm(request.POST)
 
@@ -95,11 +130,13 @@ class PostDetailView(LoginRequiredMixin, View):
             new_comment.post = post
             new_comment.save()
 
-            new_comment.create_tags() 
+            create_comment_tags.delay(new_comment.pk, idempotency_key=f'comment-tags:{new_comment.pk}')
+            create_notification.delay(
+                2, request.user.pk, post.author_id, post_id=post.pk,
+                idempotency_key=f'notify-comment:{new_comment.pk}',
+            )
 
-        comments = Comment.objects.filter(post=post)
-        
-        notification = Notification.objects.create(notification_type=2, from_user=request.user, to_user=post.author, post=post)
+        comments = Comment.objects.filter(post=post, is_deleted=False)
 
         context = {
             'post': post,
@@ -113,10 +150,12 @@ class PostDetailView(LoginRequiredMixin, View):
 # ***************************************************************************************************************** #
 
 
-class CommentReplyView(LoginRequiredMixin, View):
+class CommentReplyView(LoginRequiredMixin, RateLimitMixin, View):
+    rate_limit_scope = 'comment'
+
     def post(self, request, post_pk, pk, *args, **kwargs):
-        post = Post.objects.get(pk=post_pk)
-        parent_comment = Comment.objects.get(pk=pk)
+        post = get_object_or_404(Post, post_pk, is_deleted=False)
+        parent_comment = Comment.objects.get(pk=pk, is_deleted=False)
         form = CommentForm(request.POST)
 
         if form.is_valid():
@@ -126,7 +165,11 @@ class CommentReplyView(LoginRequiredMixin, View):
             new_comment.parent = parent_comment
             new_comment.save()
 
-        notification = Notification.objects.create(notification_type=2, from_user=request.user, to_user=parent_comment.author, comment=new_comment)
+            create_comment_tags.delay(new_comment.pk, idempotency_key=f'comment-tags:{new_comment.pk}')
+            create_notification.delay(
+                2, request.user.pk, parent_comment.author_id, comment_id=new_comment.pk,
+                idempotency_key=f'notify-comment:{new_comment.pk}',
+            )
 
         return redirect('post-detail', pk=post_pk)
     
@@ -135,6 +178,7 @@ class CommentReplyView(LoginRequiredMixin, View):
 # start from here.
 class PostEditView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     model = Post
+    queryset = Post.objects.filter(is_deleted=False)
     fields = ['body']
     
 
@@ -158,6 +202,11 @@ class PostDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
     def test_func(self):
         post = self.get_object()
         return self.request.user == post.author
+
+    def delete(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        soft_delete_post(self.object)
+        return HttpResponseRedirect(self.get_success_url())
     
 
 # ***************************************************************************************************************** #
@@ -174,39 +223,34 @@ class CommentDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
     def test_func(self):
         post = self.get_object()
         return self.request.user == post.author
+
+    def delete(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        soft_delete_comment(self.object)
+        return HttpResponseRedirect(self.get_success_url())
     
 # ***************************************************************************************************************** #
 
+@method_decorator(anonymous_page_cache, name='get')
+@method_decorator(conditional_view(profile_stamp), name='get')
 class ProfileView(View):
     def get(self, request, pk, *args, **kwargs):
-        profile = UserProfile.objects.get(pk=pk) 
+        profile = get_object_or_404(UserProfile, pk, is_deleted=False)
         user = profile.user 
-        posts = Post.objects.filter(author=user) 
-
-        followers = profile.followers.all() 
-
-
-       
-        if len(followers) == 0:             
-            is_following = False
-
-        for follower in followers:
-            if follower == request.user:
-                is_following = True
-                break
-            else:
-                is_following = False
-
-        number_of_followers = len(followers)
-
+        posts = list(post_rows(Post.objects.filter(author=user, is_deleted=False).exclude(
+            repost_of__is_deleted=True,
+        )))
 
+        number_of_followers = follower_count(profile.pk)
+        following = is_following(request.user, profile.pk)
+        add_surrogate_keys(request, f'user:{profile.pk}', f'author:{profile.pk}', *post_keys(posts))
 
         context = {
             'user': user,
             'profile': profile,
             'posts': posts,
             'number_of_followers': number_of_followers,
-            'is_following': is_following,
+            'is_following': following,
         }
         
         return render(request, 'social/profile.html', context)
@@ -233,217 +277,239 @@ class ProfileEditView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
 # ***************************************************************************************************************** #
 
 
-class AddFollower(LoginRequiredMixin, View):
-    def post(self, request, pk, *args, **kwargs):
-        profile = UserProfile.objects.get(pk=pk)
-        profile.followers.add(request.user) 
+class AccountDeleteView(LoginRequiredMixin, View):
+    def get(self, request, *args, **kwargs):
+        return render(request, 'social/account_delete.html')
 
-        notification = Notification.objects.create(notification_type=3, from_user=request.user, to_user=profile.user)
+    def post(self, request, *args, **kwargs):
+        soft_delete_account(request.user)
+        logout(request)
+        return redirect('index')
 
-        return redirect('profile', pk=profile.pk)
-    
 
 # ***************************************************************************************************************** #
 
 
-class RemoveFollower(LoginRequiredMixin, View):
+class AddFollower(LoginRequiredMixin, RateLimitMixin, View):
+    rate_limit_scope = 'follow'
+
     def post(self, request, pk, *args, **kwargs):
-        profile = UserProfile.objects.get(pk=pk)
-        profile.followers.remove(request.user) 
+        profile = get_object_or_404(UserProfile, pk, is_deleted=False)
+        if bulk_follow(request.user, [profile.pk], notify=False):
+            create_notification.delay(3, request.user.pk, profile.pk)
 
         return redirect('profile', pk=profile.pk)
     
 
-
 # ***************************************************************************************************************** #
 
 
-class AddLike(LoginRequiredMixin, View):
-    
+class RemoveFollower(LoginRequiredMixin, RateLimitMixin, View):
+    rate_limit_scope = 'follow'
+
     def post(self, request, pk, *args, **kwargs):
-        post = Post.objects.get(pk=pk) 
+        profile = get_object_or_404(UserProfile, pk)
+        bulk_unfollow(request.user, [profile.pk])
 
-        is_dislike = False
+        return redirect('profile', pk=profile.pk)
+    
 
-        for dislike in post.dislikes.all():
-            if dislike == request.user:
-                is_dislike = True
-                break
 
-        if is_dislike:
-            post.dislikes.remove(request.user)
+# ***************************************************************************************************************** #
 
-        is_like = False
 
-        for like in post.likes.all():
-            if like == request.user:
-                is_like = True
-                break
+class BulkFollow(LoginRequiredMixin, View):
+    def post(self, request, *args, **kwargs):
+        if request.content_type == 'application/json':
+            try:
+                data = json.loads(request.body)
+            except ValueError:
+                return JsonResponse({'error': 'Invalid JSON'}, status=400)
+            if not isinstance(data, dict):
+                return JsonResponse({'error': 'Expected a JSON object'}, status=400)
+            usernames = data.get('usernames', [])
+            profiles = data.get('profiles', [])
+            action = data.get('action', 'follow')
+            if not isinstance(usernames, list) or not all(isinstance(name, str) for name in usernames):
+                return JsonResponse({'error': 'usernames must be a list of strings'}, status=400)
+            if not isinstance(profiles, list) or not all(isinstance(pk, (int, str)) and not isinstance(pk, bool) for pk in profiles):
+                return JsonResponse({'error': 'profiles must be a list of ids'}, status=400)
+        else:
+            usernames = request.POST.getlist('usernames')
+            profiles = request.POST.getlist('profiles')
+            action = request.POST.get('action', 'follow')
 
-        if not is_like:
-            post.likes.add(request.user)
-            notification = Notification.objects.create(notification_type=1, from_user=request.user, to_user=post.author, post=post)
+        try:
+            profiles = [int(pk) for pk in profiles]
+        except (TypeError, ValueError):
+            return JsonResponse({'error': 'Invalid profile id'}, status=400)
 
-        if is_like:
-            post.likes.remove(request.user)
+        target_ids = resolve_targets(usernames=usernames, profile_ids=profiles)
 
+        if action == 'unfollow':
+            return JsonResponse({'unfollowed': bulk_unfollow(request.user, target_ids)})
 
-        
+        return JsonResponse({'followed': bulk_follow(request.user, target_ids)})
 
-        next = request.POST.get('next', '/')
-       
-        return HttpResponseRedirect(next)
-    
 
+# ***************************************************************************************************************** #
 
 
-# ***************************************************************************************************************** #
+class ExportFollowGraph(LoginRequiredMixin, View):
+    def get(self, request, *args, **kwargs):
+        direction = 'followers' if request.GET.get('direction') == 'followers' else 'following'
+        rows = iter_follow_graph(request.user, direction=direction)
 
+        if request.GET.get('format') == 'csv':
+            response = StreamingHttpResponse(export_csv(rows), content_type='text/csv')
+            extension = 'csv'
+        else:
+            response = StreamingHttpResponse(export_ndjson(rows), content_type='application/x-ndjson')
+            extension = 'ndjson'
 
-class AddDislike(LoginRequiredMixin, View):
-    
-    def post(self, request, pk, *args, **kwargs):
-        post = Post.objects.get(pk=pk)
+        response['Content-Disposition'] = f'attachment; filename="{direction}.{extension}"'
+        return response
+
+
+# ***************************************************************************************************************** #
 
-        is_like = False
 
-        for like in post.likes.all():
-            if like == request.user:
-                is_like = True
-                break
+class Takeout(LoginRequiredMixin, View):
+    def get(self, request, *args, **kwargs):
+        response = StreamingHttpResponse(iter_takeout(request.user), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="{request.user.username}-takeout.zip"'
+        return response
 
-        if is_like:
-            post.likes.remove(request.user)
 
-        is_dislike = False
+# ***************************************************************************************************************** #
 
-        for dislike in post.dislikes.all():
-            if dislike == request.user:
-                is_dislike = True
-                break
 
-        if not is_dislike:
-            post.dislikes.add(request.user)
+class AddLike(LoginRequiredMixin, RateLimitMixin, View):
+    rate_limit_scope = 'like'
+    
+    def post(self, request, pk, *args, **kwargs):
+        post = get_object_or_404(Post, pk)
 
-        if is_dislike:
-            post.dislikes.remove(request.user)
+        toggle_post_reaction(post, request.user, 'like')
 
-        next = request.POST.get('next', '/') 
+        next = request.POST.get('next', '/')
+       
         return HttpResponseRedirect(next)
     
 
 # ***************************************************************************************************************** #
 
 
-class AddCommentLike(LoginRequiredMixin, View):
+class AddDislike(LoginRequiredMixin, RateLimitMixin, View):
+    rate_limit_scope = 'like'
     
     def post(self, request, pk, *args, **kwargs):
-        comment = Comment.objects.get(pk=pk)
-
-        is_dislike = False
+        post = get_object_or_404(Post, pk)
 
-        for dislike in comment.dislikes.all():
-            if dislike == request.user:
-                is_dislike = True
-                break
+        toggle_post_reaction(post, request.user, 'dislike')
 
-        if is_dislike:
-            comment.dislikes.remove(request.user)
+        next = request.POST.get('next', '/') 
+        return HttpResponseRedirect(next)
+    
 
-        is_like = False
+# ***************************************************************************************************************** #
 
-        for like in comment.likes.all():
-            if like == request.user:
-                is_like = True
-                break
 
-        if not is_like:
-            comment.likes.add(request.user)
-            notification = Notification.objects.create(notification_type=1, from_user=request.user, to_user=comment.author, comment=comment)
+class AddCommentLike(LoginRequiredMixin, RateLimitMixin, View):
+    rate_limit_scope = 'like'
+    
+    def post(self, request, pk, *args, **kwargs):
+        comment = Comment.objects.only('pk', 'author_id').get(pk=pk)
 
-        if is_like:
-            comment.likes.remove(request.user)
+        toggle_comment_reaction(comment, request.user, 'like')
 
         next = request.POST.get('next', '/')
         return HttpResponseRedirect(next)
     
 
-
 # ***************************************************************************************************************** #
 
 
-class AddCommentDislike(LoginRequiredMixin, View):
+class AddCommentDislike(LoginRequiredMixin, RateLimitMixin, View):
+    rate_limit_scope = 'like'
     
     def post(self, request, pk, *args, **kwargs):
-        comment = Comment.objects.get(pk=pk)
+        comment = Comment.objects.only('pk', 'author_id').get(pk=pk)
 
-        is_like = False
+        toggle_comment_reaction(comment, request.user, 'dislike')
 
-        for like in comment.likes.all():
-            if like == request.user:
-                is_like = True
-                break
+        next = request.POST.get('next', '/')
+        return HttpResponseRedirect(next)
+    
 
-        if is_like:
-            comment.likes.remove(request.user)
 
-        is_dislike = False
+# ***************************************************************************************************************** #
 
-        for dislike in comment.dislikes.all():
-            if dislike == request.user:
-                is_dislike = True
-                break
 
-        if not is_dislike:
-            comment.dislikes.add(request.user)
+class SharedPostView(LoginRequiredMixin, RateLimitMixin, View):
+    rate_limit_scope = 'share'
 
-        if is_dislike:
-            comment.dislikes.remove(request.user)
+    def post(self, request, pk, *args, **kwargs):
+        original_post = get_object_or_404(Post, pk, is_deleted=False)
+        if original_post.repost_of_id:
+            original_post = get_object_or_404(Post, original_post.repost_of_id)
+
+        # The quote is optional; a plain share stores no shared_body.
+        form = ShareForm(request.POST)
+        if not form.is_valid():
+            return HttpResponse(form.errors.as_text(), content_type='text/plain', status=400)
+
+        new_post = Post(
+            shared_body=form.cleaned_data['body'] or None,
+            body='',
+            author=request.user,
+            shared_user=request.user,
+            shared_on=timezone.now(),
+            repost_of=original_post,
+        )
+        new_post.save()
+        create_post_tags.delay(new_post.pk, idempotency_key=f'post-tags:{new_post.pk}')
 
-        next = request.POST.get('next', '/')
-        return HttpResponseRedirect(next)
-    
+        Post.objects.filter(pk=original_post.pk).update(repost_count=F('repost_count') + 1)
+        invalidate_objects(Post, [original_post.pk])
+        bump_versions(f'user:{original_post.author_id}')
+        purge_pages(f'post:{original_post.pk}')
+
+        return redirect('post-list')
 
 
 # ***************************************************************************************************************** #
 
 
-class SharedPostView(View):
-    def post(self, request, pk, *args, **kwargs):
-       original_post = Post.objects.get(pk=pk) 
-       
-       form = ShareForm(request.POST)
-    
+class RateLimitStats(LoginRequiredMixin, UserPassesTestMixin, View):
+    def get(self, request, *args, **kwargs):
+        return JsonResponse(limiter.stats())
 
-       if form.is_valid():
-            new_post = Post(
-                shared_body=self.request.POST.get('body'),
-                body=original_post.body,
-                author=original_post.author,
-                created_on=original_post.created_on,
-                shared_user=request.user,
-                shared_on=timezone.now(),
-            )
-            new_post.save()
+    def test_func(self):
+        return self.request.user.is_staff
 
-            for img in original_post.image.all():
-                new_post.image.add(img)
 
-            new_post.save()
+class DatabasePoolStats(LoginRequiredMixin, UserPassesTestMixin, View):
+    # Metrics are per process; each worker reports its own pool.
+    def get(self, request, *args, **kwargs):
+        return JsonResponse({'pid': os.getpid(), 'pools': pool_stats()})
 
-       return redirect('post-list')
+    def test_func(self):
+        return self.request.user.is_staff
 
 
 # ***************************************************************************************************************** #
 
 
+@method_decorator(anonymous_page_cache, name='get')
 class UserSearch(View):
     def get(self, request, *args, **kwargs):
         query = self.request.GET.get('query')
         profile_list = UserProfile.objects.filter(
-            Q(user__username__icontains=query) 
-   
+            Q(user__username__icontains=query),
+            is_deleted=False,
         )
+        add_surrogate_keys(request, 'users', *[f'user:{profile.pk}' for profile in profile_list])
 
         context = {
             'profile_list': profile_list,
@@ -456,10 +522,13 @@ class UserSearch(View):
 # ***************************************************************************************************************** #
 
 
+@method_decorator(anonymous_page_cache, name='get')
+@method_decorator(conditional_view(followers_stamp), name='get')
 class ListFollowers(View):
     def get(self, request, pk, *args, **kwargs):
-        profile = UserProfile.objects.get(pk=pk)
-        followers = profile.followers.all()
+        profile = get_object_or_404(UserProfile, pk, is_deleted=False)
+        followers = profile.followers.filter(profile__is_deleted=False)
+        add_surrogate_keys(request, f'user:{pk}', *[f'user:{follower.pk}' for follower in followers])
 
         context = {
             'profile': profile,
@@ -474,14 +543,7 @@ class ListFollowers(View):
 
 class PostNotification(View):
     def get(self, request, notification_pk, post_pk, *args, **kwargs):
-        notification = Notification.objects.get(pk=notification_pk)
-       
-        post = Post.objects.get(pk=post_pk)
-
-        
-
-        notification.user_has_seen = True
-        notification.save()
+        mark_seen(request.user, [notification_pk])
 
         return redirect('post-detail', pk=post_pk)
     
@@ -491,11 +553,7 @@ class PostNotification(View):
 
 class FollowNotification(View):
     def get(self, request, notification_pk, profile_pk, *args, **kwargs):
-        notification = Notification.objects.get(pk=notification_pk)
-        profile = UserProfile.objects.get(pk=profile_pk)
-
-        notification.user_has_seen = True
-        notification.save()
+        mark_seen(request.user, [notification_pk])
 
         return redirect('profile', pk=profile_pk)
     
@@ -505,11 +563,7 @@ class FollowNotification(View):
 
 class ThreadNotification(View):
     def get(self, request, notification_pk, object_pk, *args, **kwargs):
-        notification = Notification.objects.get(pk=notification_pk)
-        thread = ThreadModel.objects.get(pk=object_pk)
-
-        notification.user_has_seen = True
-        notification.save()
+        mark_seen(request.user, [notification_pk])
 
         return redirect('thread', pk=object_pk)
     
@@ -520,10 +574,7 @@ class ThreadNotification(View):
 
 class RemoveNotification(View):
     def delete(self, request, notification_pk, *args, **kwargs):
-        notification = Notification.objects.get(pk=notification_pk)
-
-        notification.user_has_seen = True
-        notification.save()
+        mark_seen(request.user, [notification_pk])
 
         return HttpResponse('Success', content_type='text/plain')
     
@@ -589,56 +640,72 @@ class CreateThread(View):
 # ***************************************************************************************************************** #
 
 
+@method_decorator(gzip_stream, name='get')
+@method_decorator(conditional_view(thread_stamp), name='get')
 class ThreadView(View):
     def get(self, request, pk, *args, **kwargs):
         form = MessageForm()
-        thread = ThreadModel.objects.get(pk=pk)
-
-        message_list = MessageModel.objects.filter(thread__pk__contains=pk) 
-
+        thread = get_object_or_404(ThreadModel, pk)
 
+        try:
+            before = int(request.GET.get('before', ''))
+        except ValueError:
+            before = None
+
+        def message_chunks():
+            # A page is at most THREAD_PAGE_SIZE messages, so it is a single
+            # chunk, read once the thread header has been sent.
+            message_list = serialize_messages(get_messages(thread.pk, before, THREAD_PAGE_SIZE))
+            yield {
+                'message_list': message_list,
+                'older': message_list[0]['id'] if len(message_list) == THREAD_PAGE_SIZE else None,
+            }
 
         context = {
             'thread': thread,
             'form': form,
-            'message_list': message_list
         }
+        if streaming_enabled():
+            return stream_template(request, 'social/thread.html', context, 'social/thread_messages.html', message_chunks())
 
+        context.update(next(message_chunks()))
         return render(request, 'social/thread.html', context)
     
     
 # ***************************************************************************************************************** #
 
 
-class CreateMessage(View):
+class CreateMessage(RateLimitMixin, View):
+    rate_limit_scope = 'message'
+
     def post(self, request, pk, *args, **kwargs):
         form = MessageForm(request.POST, request.FILES)
         
        
-        thread = ThreadModel.objects.get(pk=pk)
+        thread = get_object_or_404(ThreadModel, pk)
         
-        if thread.receiver == request.user:
-            receiver = thread.user
+        if thread.receiver_id == request.user.pk:
+            receiver_id = thread.user_id
         else:
-            receiver = thread.receiver
+            receiver_id = thread.receiver_id
             
 
         if form.is_valid():
             message = form.save(commit=False)
             message.thread = thread
             message.sender_user = request.user
-            message.receiver_user = receiver
+            message.receiver_user_id = receiver_id
             message.save()
 
-        notification = Notification.objects.create(
-            notification_type=4,
-            from_user=request.user,
-            to_user=receiver,
-            thread=thread
-        )
+            create_notification.delay(
+                4, request.user.pk, receiver_id, thread_id=thread.pk,
+                idempotency_key=f'notify-message:{message.pk}',
+            )
         return redirect('thread', pk=pk)
 
 
+@method_decorator(anonymous_page_cache, name='get')
+@method_decorator(conditional_view(explore_stamp), name='get')
 class Explore(View):
     def get(self, request, *args, **kwargs):
         explore_form = ExploreForm()
@@ -646,9 +713,11 @@ class Explore(View):
         tag = Tag.objects.filter(name = query).first()
 
         if tag:
-            posts = Post.objects.filter(tags__in = [tag])
+            posts = Post.objects.filter(tags__in = [tag], is_deleted=False)
         else: 
-            posts = Post.objects.all()
+            posts = Post.objects.filter(is_deleted=False)
+        posts = list(post_rows(posts.exclude(repost_of__is_deleted=True)))
+        add_surrogate_keys(request, f'tag:{tag.pk}' if tag else 'tags' if query else 'posts', *post_keys(posts))
         
         context = {
             'tag' : tag, 
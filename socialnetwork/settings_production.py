@@ -0,0 +1,70 @@
+"""
+Production settings for socialnetwork.
+
+Use with DJANGO_SETTINGS_MODULE=socialnetwork.settings_production and run
+`manage.py collectstatic` on deploy. The caches live in Redis (REDIS_CACHE_URL,
+REDIS_PAGE_CACHE_URL). `manage.py check` warns about settings that are known
+to be slow or unsafe with several workers (see social/checks.py).
+"""
+
+import copy
+import os
+
+from .settings import *  # noqa: F401,F403
+
+PRODUCTION = True
+
+DEBUG = os.environ.get('DEBUG') == '1'
+
+SECRET_KEY = os.environ.get('SECRET_KEY', SECRET_KEY)
+
+ALLOWED_HOSTS = [host for host in os.environ.get('ALLOWED_HOSTS', '').split(',') if host]
+
+# The site is served over HTTPS behind a proxy that sets X-Forwarded-Proto.
+# Set HTTPS=0 only for a deployment that terminates plain HTTP on purpose.
+HTTPS = os.environ.get('HTTPS', '1') == '1'
+SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
+SECURE_SSL_REDIRECT = HTTPS
+SESSION_COOKIE_SECURE = HTTPS
+CSRF_COOKIE_SECURE = HTTPS
+SECURE_HSTS_SECONDS = int(os.environ.get('SECURE_HSTS_SECONDS', 3600 if HTTPS else 0))
+
+# Parse each template once per process instead of on every render. Copy the
+# list first: it is the same object socialnetwork.settings exports.
+TEMPLATES = copy.deepcopy(TEMPLATES)
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS']['debug'] = False
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+
+# collectstatic writes hashed names plus .gz/.br copies; the static handler
+# serves those with a one year Cache-Control. Turn SERVE_STATIC off when a
+# front-end server takes over STATIC_ROOT. Media stays routed through Django
+# for the message photo access check; set MEDIA_ACCEL to let the front-end
+# server send the bytes.
+STATIC_ROOT = os.environ.get('STATIC_ROOT', os.path.join(BASE_DIR, 'staticfiles'))
+STATICFILES_STORAGE = 'socialnetwork.storage.CompressedManifestStaticFilesStorage'
+SERVE_STATIC = os.environ.get('SERVE_STATIC', '1') == '1'
+SERVE_MEDIA = os.environ.get('SERVE_MEDIA', '1') == '1'
+
+# Every worker has to see the same cache: version stamps, page purges,
+# sessions, rate limit buckets and buffered reactions all live there. Both
+# aliases default to databases on a local Redis; point REDIS_CACHE_URL and
+# REDIS_PAGE_CACHE_URL elsewhere to move them.
+CACHES = {
+    'default': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': os.environ.get('REDIS_CACHE_URL', 'redis://127.0.0.1:6379/1'),
+    },
+    'pages': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': os.environ.get('REDIS_PAGE_CACHE_URL', 'redis://127.0.0.1:6379/2'),
+    },
+}
+
+RATE_LIMIT_STORE = 'social.ratelimit.CacheStore'
+REACTION_BUFFER_STORE = 'social.reaction_buffer.CacheStore'
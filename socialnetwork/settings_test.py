@@ -0,0 +1,19 @@
+"""
+Test settings for socialnetwork.
+
+Run with `python manage.py test social --settings=socialnetwork.settings_test`.
+The social migration history has two 0011 leaves and cannot be replayed on
+an empty database, so the test database is created from the current models.
+"""
+
+import os
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+
+MIGRATION_MODULES = {'social': None}
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+MEDIA_ROOT = tempfile.mkdtemp(prefix='socialnetwork-media-')
+FOLLOW_GRAPH_PATH = os.path.join(MEDIA_ROOT, 'follow_graph.bin')
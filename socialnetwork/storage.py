@@ -0,0 +1,47 @@
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.map', '.svg', '.txt', '.html', '.json', '.xml', '.ico', '.eot', '.ttf', '.otf')
+MIN_COMPRESS_SIZE = 256
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    # Writes .gz (and .br when the brotli package is installed) next to every
+    # text asset during collectstatic, so the static handler never compresses
+    # on the fly.
+    def post_process(self, *args, **kwargs):
+        names = set()
+        for name, hashed_name, processed in super().post_process(*args, **kwargs):
+            yield name, hashed_name, processed
+            if not isinstance(processed, Exception):
+                names.add(name)
+
+        if not kwargs.get('dry_run'):
+            # Intermediate passes yield hashed names that get replaced, so only
+            # the final ones recorded in the manifest are compressed.
+            names.update(self.hashed_files.values())
+            for name in sorted(names):
+                if name.endswith(COMPRESSIBLE_EXTENSIONS) and self.exists(name):
+                    self.compress(name)
+
+    def compress(self, name):
+        with self.open(name) as f:
+            data = f.read()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return
+
+        variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(data)))
+        for suffix, compressed in variants:
+            if len(compressed) < len(data):
+                if self.exists(name + suffix):
+                    self.delete(name + suffix)
+                self._save(name + suffix, ContentFile(compressed))